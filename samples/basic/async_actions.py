@@ -29,6 +29,10 @@ class AsyncFruitRetriever(async_model_actions.AsyncModelRetriever):
 
 class AsyncFruitsRetriever(async_model_actions.AsyncModelsRetriever):
 
+    # each request to the service creates a new retriever
+    # so there's no point prefetching the next page
+    prefetch_next_page = False
+
     def __init__(self, async_state=None):
         async_model_actions.AsyncModelsRetriever.__init__(
             self,
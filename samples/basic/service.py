@@ -8,6 +8,7 @@ import json
 import logging
 import optparse
 import time
+import urllib
 
 import tornado.httpserver
 import tornado.web
@@ -55,15 +56,29 @@ class MultipleResourcesRequestHandler(RequestHandler):
 
     @tornado.web.asynchronous
     def get(self):
+        cursor = self.get_argument("cursor", None)
         afr = AsyncFruitsRetriever()
-        afr.fetch(self._get_on_fetch_done)
+        try:
+            afr.fetch_page(self._get_on_fetch_page_done, cursor)
+        except async_model_actions.InvalidCursorException:
+            self.set_status(httplib.BAD_REQUEST)
+            self.finish()
 
-    def _get_on_fetch_done(self, is_ok, fruits, afr):
+    def _get_on_fetch_page_done(self, is_ok, fruits, next_cursor, afr):
         if not is_ok:
             self.set_status(httplib.INTERNAL_SERVER_ERROR)
             self.finish()
             return
 
+        if next_cursor is not None:
+            next_url = "%s://%s%s?%s" % (
+                self.request.protocol,
+                self.request.host,
+                self.request.path,
+                urllib.urlencode({"cursor": next_cursor}),
+            )
+            self.set_header("Link", '<%s>; rel="next"' % next_url)
+
         dicts = [self.fruit_as_dict_for_response_body(fruit) for fruit in fruits]
         self.write(json.dumps(dicts))
         self.set_status(httplib.OK)
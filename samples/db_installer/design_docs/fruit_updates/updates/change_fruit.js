@@ -0,0 +1,9 @@
+function(doc, req) {
+    if (!doc || !doc.type.match(/^fruit_v\d+.\d+/i)) {
+        return [null, {"code": 404, "json": {"error": "not_found"}}];
+    }
+    var delta = JSON.parse(req.body);
+    doc.fruit = delta.fruit;
+    doc.updated_on = delta.updated_on;
+    return [doc, {"code": 201, "json": doc}];
+}
@@ -46,9 +46,9 @@ class HealthRequestHandler(tornado.web.RequestHandler):
         acdbhc.check(self._get_on_acdbhc_check_done)
 
     def _get_on_acdbhc_check_done(self, is_ok, acdbhc):
-        self._write_response(is_ok)
+        self._write_response(is_ok, acdbhc.circuit_breaker_state)
 
-    def _write_response(self, is_ok):
+    def _write_response(self, is_ok, circuit_breaker_state=None):
         location = "%s://%s%s" % (
             self.request.protocol,
             self.request.host,
@@ -64,6 +64,9 @@ class HealthRequestHandler(tornado.web.RequestHandler):
             },
         }
 
+        if circuit_breaker_state is not None:
+            body["couchdb_circuit_breaker"] = circuit_breaker_state
+
         self.write(body)
 
         self.set_header("location", location)
@@ -12,10 +12,17 @@ import tornado.httpserver
 import tornado.web
 
 from tor_async_couchdb import async_model_actions
-from tor_async_couchdb.async_model_actions import AsyncDatabaseMetricsRetriever
+from tor_async_couchdb import metrics
+from tor_async_couchdb.async_model_actions import CachedDatabaseMetricsProvider
 
 _logger = logging.getLogger(__name__)
 
+"""```database_metrics_provider``` is created in the mainline and
+refreshes database metrics in the background so requests to the
+```/_metrics``` endpoint don't make any requests to CouchDB.
+"""
+database_metrics_provider = None
+
 
 class MetricsRequestHandler(tornado.web.RequestHandler):
 
@@ -23,10 +30,18 @@ class MetricsRequestHandler(tornado.web.RequestHandler):
 
     @tornado.web.asynchronous
     def get(self):
-        adbmr = AsyncDatabaseMetricsRetriever()
-        adbmr.fetch(self._on_adbmr_fetch_done)
-
-    def _on_adbmr_fetch_done(self, is_ok, database_metrics, adbmr):
+        if self.get_argument("format", None) == "prometheus":
+            # CouchDB response time histograms are recorded in-process
+            # so no requests to CouchDB are required
+            self.set_header("Content-Type", "text/plain; version=0.0.4")
+            self.write(async_model_actions.metrics_registry.render_text())
+            self.set_status(httplib.OK)
+            self.finish()
+            return
+
+        database_metrics_provider.fetch(self._on_cdmp_fetch_done)
+
+    def _on_cdmp_fetch_done(self, is_ok, database_metrics, cdmp):
         location = "%s://%s%s" % (
             self.request.protocol,
             self.request.host,
@@ -46,6 +61,8 @@ class MetricsRequestHandler(tornado.web.RequestHandler):
                 "dataSize": database_metrics.data_size,
                 "diskSize": database_metrics.disk_size,
                 "fragmentation": database_metrics.fragmentation,
+                "snapshotAgeInMs": int(cdmp.snapshot_age_in_ms),
+                "failedViews": database_metrics.failed_design_docs,
                 "views": {
                 }
             }
@@ -106,6 +123,16 @@ class CommandLineParser(optparse.OptionParser):
             type="string",
             help=help)
 
+        default = 30 * 1000
+        help = "ms between database metrics refreshes - default = %s" % default
+        self.add_option(
+            "--refresh",
+            action="store",
+            dest="refresh_interval_in_ms",
+            default=default,
+            type="int",
+            help=help)
+
 
 if __name__ == "__main__":
     clp = CommandLineParser()
@@ -118,6 +145,13 @@ if __name__ == "__main__":
         format="%(asctime)s.%(msecs)03d+00:00 %(levelname)s %(module)s %(message)s")
 
     async_model_actions.database = clo.database
+    async_model_actions.metrics_registry = metrics.MetricsRegistry()
+
+    database_metrics_provider = CachedDatabaseMetricsProvider(
+        clo.refresh_interval_in_ms,
+        max_view_concurrency=10,
+        partial_view_results=True)
+    database_metrics_provider.start()
 
     handlers = [
         (
@@ -39,6 +39,29 @@ class AsyncFruitsRetriever(async_model_actions.AsyncModelsRetriever):
         return Fruit(doc=doc)
 
 
+class AsyncFruitChanger(async_model_actions.AsyncUpdateHandlerInvoker):
+    """Change a fruit in a single round trip using the ```change_fruit```
+    update handler rather than ```AsyncFruitUpdater```'s retrieve, change,
+    persist and on conflict start over loop.
+    """
+
+    def __init__(self, fruit_doc_id, new_fruit, async_state=None):
+        delta = {
+            "fruit": new_fruit,
+            "updated_on": Fruit._utc_now().isoformat(),
+        }
+        async_model_actions.AsyncUpdateHandlerInvoker.__init__(
+            self,
+            "fruit_updates",
+            "change_fruit",
+            fruit_doc_id,
+            delta,
+            async_state)
+
+    def create_model_from_doc(self, doc):
+        return Fruit(doc=doc)
+
+
 class AsyncAction(object):
 
     def __init__(self, async_state):
@@ -132,6 +155,52 @@ class AsyncFruitUpdater(AsyncAction):
         self._callback = None
 
 
+class AsyncFruitUpdaterUsingUpdateHandler(AsyncAction):
+    """Like ```AsyncFruitUpdater``` but the fruit is changed by
+    ```AsyncFruitChanger``` so there's no retry on conflict.
+    """
+
+    def __init__(self, fruit_id, async_state=None):
+        AsyncAction.__init__(self, async_state)
+
+        self.fruit_id = fruit_id
+
+        self._callback = None
+
+    def update(self, callback):
+        assert callback is not None
+        self._callback = callback
+
+        afr = AsyncFruitRetriever(self.fruit_id)
+        afr.fetch(self._on_fetch_done)
+
+    def _on_fetch_done(self, is_ok, fruit, afr):
+        if not is_ok:
+            self._call_callback(False)
+            return
+
+        if fruit is None:
+            self._call_callback(True)
+            return
+
+        # the update handler is addressed by document ID rather than fruit ID
+        new_fruit = Fruit.get_random_fruit(but_not_this_fruit=fruit.fruit)
+        afc = AsyncFruitChanger(fruit._id, new_fruit)
+        afc.invoke(self._on_invoke_done)
+
+    def _on_invoke_done(self, is_ok, is_conflict, fruit, afc):
+        # CouchDB applies the change to the current revision
+        # so there's no conflict to retry
+        assert not is_conflict
+
+        self._call_callback(is_ok, fruit)
+
+    def _call_callback(self, is_ok, fruit=None):
+        assert self._callback is not None
+        self._callback(is_ok, fruit, self)
+        self._callback = None
+
+
 class AsyncFruitDeleter(AsyncAction):
 
     def __init__(self, fruit_id, async_state=None):
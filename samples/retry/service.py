@@ -18,6 +18,7 @@ from async_actions import AsyncFruitRetriever
 from async_actions import AsyncFruitCreator
 from async_actions import AsyncFruitDeleter
 from async_actions import AsyncFruitUpdater
+from async_actions import AsyncFruitUpdaterUsingUpdateHandler
 
 _logger = logging.getLogger(__name__)
 
@@ -74,6 +75,9 @@ class SingleResourceRequestHandler(RequestHandler):
 
     url_spec = r"/v1.0/fruits/([^/]+)"
 
+    # if True PUTs change fruits using the change_fruit update handler
+    use_update_handler = False
+
     @tornado.web.asynchronous
     def get(self, fruit_id):
         afr = AsyncFruitRetriever(fruit_id)
@@ -96,7 +100,10 @@ class SingleResourceRequestHandler(RequestHandler):
 
     @tornado.web.asynchronous
     def put(self, fruit_id):
-        afu = AsyncFruitUpdater(fruit_id)
+        if type(self).use_update_handler:
+            afu = AsyncFruitUpdaterUsingUpdateHandler(fruit_id)
+        else:
+            afu = AsyncFruitUpdater(fruit_id)
         afu.update(self._put_on_update_done)
 
     def _put_on_update_done(self, is_ok, fruit, afu):
@@ -177,6 +184,15 @@ class CommandLineParser(optparse.OptionParser):
             type="string",
             help=help)
 
+        default = False
+        help = "use the change_fruit update handler for PUTs - default = %s" % default
+        self.add_option(
+            "--update_handler",
+            action="store_true",
+            dest="update_handler",
+            default=default,
+            help=help)
+
 
 if __name__ == "__main__":
     clp = CommandLineParser()
@@ -190,6 +206,8 @@ if __name__ == "__main__":
 
     async_model_actions.database = clo.database
 
+    SingleResourceRequestHandler.use_update_handler = clo.update_handler
+
     handlers = [
         (
             MultipleResourcesRequestHandler.url_spec,
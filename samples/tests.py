@@ -15,10 +15,14 @@ _base_url = "http://127.0.0.1:8445"
 class TheTestCase(unittest.TestCase):
 
     def _get_all(self):
+        fruits = []
         url = "%s/v1.0/fruits" % _base_url
-        response = requests.get(url)
-        self.assertEqual(response.status_code, httplib.OK)
-        return response.json()
+        while url:
+            response = requests.get(url)
+            self.assertEqual(response.status_code, httplib.OK)
+            fruits.extend(response.json())
+            url = response.links.get("next", {}).get("url")
+        return fruits
 
     def setUp(self):
         fruits = self._get_all()
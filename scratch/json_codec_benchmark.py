@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+"""Measure the per document cost of each of the JSON codecs in
+```tor_async_couchdb.json_codec``` that can be created in the
+current environment. Codecs whose underlying library isn't
+installed are skipped.
+
+    python scratch/json_codec_benchmark.py [number of docs]
+"""
+
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tor_async_couchdb import json_codec  # noqa
+
+
+def create_doc():
+    return {
+        "_id": uuid.uuid4().hex,
+        "_rev": "1-%s" % uuid.uuid4().hex,
+        "type": "fruit_v1.0",
+        "fruit": "apple",
+        "colors": ["red", "green", "yellow"],
+        "description": u"a crisp, sweet fruit \u2014 " * 8,
+        "created_on": "2016-01-13T17:05:34.123456+00:00",
+        "updated_on": "2016-01-14T09:10:11.654321+00:00",
+        "nutrition": {
+            "calories": 52,
+            "carbohydrates": 13.8,
+            "fiber": 2.4,
+            "vitamins": {"c": 4.6, "k": 2.2, "b6": 0.041},
+        },
+    }
+
+
+def create_codecs():
+    codecs = []
+    for codec_class in [json_codec.JSONCodec, json_codec.SimpleJSONCodec, json_codec.UJSONCodec]:
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            print "%-12s not installed - skipping" % codec_class.name
+    return codecs
+
+
+def time_per_doc_in_us(fn, docs, repeat=5):
+    def run():
+        for doc in docs:
+            fn(doc)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best * 1000 * 1000 / len(docs)
+
+
+def main(number_docs):
+    docs = [create_doc() for i in range(0, number_docs)]
+    encoded_docs = [json_codec.JSONCodec().dumps(doc) for doc in docs]
+    canonical_docs = [json_codec.JSONCodec().dumps_canonical(doc) for doc in docs]
+
+    print "%d docs, average of %d bytes per doc" % (
+        number_docs,
+        sum([len(encoded_doc) for encoded_doc in encoded_docs]) / number_docs)
+    print ""
+    print "%-12s %12s %12s %16s %10s" % ("codec", "dumps (us)", "loads (us)", "canonical (us)", "speedup")
+
+    baseline = None
+    for codec in create_codecs():
+        # canonical encoding must match the stdlib or existing
+        # tamper signatures won't verify
+        for (doc, canonical_doc) in zip(docs, canonical_docs):
+            assert codec.dumps_canonical(doc) == canonical_doc
+
+        dumps = time_per_doc_in_us(codec.dumps, docs)
+        loads = time_per_doc_in_us(codec.loads, encoded_docs)
+        canonical = time_per_doc_in_us(codec.dumps_canonical, docs)
+
+        total = dumps + loads + canonical
+        if baseline is None:
+            baseline = total
+
+        print "%-12s %12.2f %12.2f %16.2f %9.2fx" % (
+            codec.name,
+            dumps,
+            loads,
+            canonical,
+            baseline / total)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if 1 < len(sys.argv) else 10000)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""Compare the per document cost of signing and verifying documents
+using a ```keyczar.Signer``` and a ```tamper.HMACSigner```.
+
+    python scratch/tamper_signer_benchmark.py [number of docs]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+import uuid
+
+from keyczar import keyczar
+from keyczar import keyczart
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from tor_async_couchdb import tamper  # noqa
+
+
+def create_doc():
+    return {
+        "_id": uuid.uuid4().hex,
+        "_rev": "1-%s" % uuid.uuid4().hex,
+        "type": "fruit_v1.0",
+        "fruit": "apple",
+        "colors": ["red", "green", "yellow"],
+        "created_on": "2016-01-13T17:05:34.123456+00:00",
+        "updated_on": "2016-01-14T09:10:11.654321+00:00",
+    }
+
+
+def create_keyczar_signer(dir_name):
+    keyczart.Create(dir_name, "benchmark", keyczart.keyinfo.SIGN_AND_VERIFY)
+    keyczart.AddKey(dir_name, keyczart.keyinfo.PRIMARY)
+    return keyczar.Signer.Read(dir_name)
+
+
+def time_per_doc_in_us(fn, docs, repeat=5):
+    def run():
+        for doc in docs:
+            fn(doc)
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return best * 1000 * 1000 / len(docs)
+
+
+def main(number_docs):
+    docs = [create_doc() for i in range(0, number_docs)]
+
+    dir_name = tempfile.mkdtemp()
+    try:
+        signers = [
+            ("keyczar", create_keyczar_signer(dir_name)),
+            ("hmac", tamper.HMACSigner({"1": os.urandom(32)}, "1")),
+        ]
+    finally:
+        shutil.rmtree(dir_name, ignore_errors=True)
+
+    print "%d docs" % number_docs
+    print ""
+    print "%-10s %12s %12s %10s" % ("signer", "sign (us)", "verify (us)", "speedup")
+
+    baseline = None
+    for (name, signer) in signers:
+        signed_docs = [tamper.sign(signer, dict(doc)) for doc in docs]
+        assert all([tamper.verify(signer, signed_doc) for signed_doc in signed_docs])
+
+        sign = time_per_doc_in_us(lambda doc: tamper.sign(signer, doc), [dict(doc) for doc in docs])
+        verify = time_per_doc_in_us(lambda doc: tamper.verify(signer, doc), signed_docs)
+
+        total = sign + verify
+        if baseline is None:
+            baseline = total
+
+        print "%-10s %12.2f %12.2f %9.2fx" % (name, sign, verify, baseline / total)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if 1 < len(sys.argv) else 10000)
@@ -2,16 +2,28 @@
 Tornado async actions against CouchDB.
 """
 
+import base64
+import collections
+import copy
+import datetime
+import functools
+import heapq
 import httplib
+import itertools
 import json
 import logging
+import os
+import random
 import re
+import time
 import urllib
 
 import tornado.httputil
 import tornado.httpclient
 import tornado.ioloop
 
+from json_codec import JSONCodec
+import metrics
 import tamper
 
 
@@ -23,11 +35,26 @@ service's mainline will update this configuration.
 """
 database = "http://127.0.0.1:5984/database"
 
+"""If not None, ```endpoint_pool``` is an ```EndpointPool``` and
+requests are routed to one of the pool's databases rather than
+to ```database```. Use an ```EndpointPool``` when CouchDB is
+a cluster (ex CouchDB 2.x) and any node can coordinate requests.
+"""
+endpoint_pool = None
+
 """If not None, ```tampering_signer``` is the keyczar signer
-used to enforce tampering proofing of the CouchDB database.
+or ```tamper.HMACSigner``` used to enforce tampering proofing
+of the CouchDB database.
 """
 tampering_signer = None
 
+"""If not None, ```tampering_verification_cache``` is a
+```tamper.VerificationCache``` used to avoid verifying the signature
+of a document revision that has already been verified. Only used
+when ```tampering_signer``` is not None.
+"""
+tampering_verification_cache = None
+
 """If CouchDB requires basic authentication in order
 to access it then set ```username``` and ```password``` to
 appropriate non-None values.
@@ -42,6 +69,116 @@ This config option is very useful when CouchDB self-signed certs.
 """
 validate_cert = True
 
+"""```json_codec``` is the ```json_codec.JSONCodec``` used to encode
+request bodies, decode response bodies and canonically encode documents
+for tamper signing and verification. The service's mainline can replace
+the default standard library codec with a faster codec such as
+```json_codec.UJSONCodec```.
+"""
+json_codec = JSONCodec()
+
+"""If ```coalesce_gets``` is ```True``` then concurrent GETs against
+the same URL are coalesced into a single request to CouchDB ("single
+flight"). The response is parsed once and delivered to every waiting
+```CouchDBAsyncHTTPClient``` - each waiter still creates its own
+models using its own ```create_model_from_doc```. Since the parsed
+documents are shared between waiters ```create_model_from_doc```
+implementations must treat documents as read-only. A GET only waits
+for an identical in flight GET whose deadline is no earlier than its
+own deadline - otherwise the in flight GET could time out or be shed
+on behalf of a caller which would have waited longer.
+"""
+coalesce_gets = False
+
+"""If not None, ```document_cache``` is a ```cache.DocumentCache```
+used by ```AsyncModelRetrieverByDocumentID``` to avoid transferring
+and decoding documents that haven't changed since they were last read.
+```AsyncPersister``` and ```AsyncDeleter``` keep ```document_cache```
+up to date as they write to CouchDB. In multi-process deployments
+use ```AsyncChangesFollower``` to keep ```document_cache``` up to
+date with writes made by other processes.
+"""
+document_cache = None
+
+"""If ```batch_fetches_by_document_id``` is ```True``` then all
+```AsyncModelRetrieverByDocumentID.fetch()``` calls issued during a
+single IOLoop iteration are merged into a single ```_all_docs``` request
+(see ```AsyncModelsRetrieverByDocumentIDs```). Batched fetches don't use
+```document_cache``` to avoid transferring documents but do use the
+documents they retrieve to invalidate stale documents in ```document_cache```.
+Like an unbatched fetch a batched fetch of a document that doesn't exist
+or fails the tampering check calls back with ```is_ok``` = ```False```.
+Batches are admitted with ```AdmissionQueue.PRIORITY_READ```.
+"""
+batch_fetches_by_document_id = False
+
+"""If not None, ```response_processing_executor``` is a
+```concurrent.futures.Executor``` used to decode response bodies,
+verify signatures and create models for responses whose bodies
+are at least ```response_processing_executor_threshold_in_bytes```
+in size. This keeps the IOLoop responsive while large view responses
+are processed. Use a ```concurrent.futures.ThreadPoolExecutor```
+(on Python 2 ```concurrent.futures``` is provided by the ```futures```
+package) - ```create_model_from_doc``` implementations and the models
+they create usually can't be pickled so a ```ProcessPoolExecutor```
+won't work. When using an executor ```create_model_from_doc```
+implementations must be thread safe.
+"""
+response_processing_executor = None
+response_processing_executor_threshold_in_bytes = 1024 * 1024
+
+"""If not None, ```admission_queue``` is an ```AdmissionQueue```
+which bounds the number of requests in flight to CouchDB. Requests
+beyond the bound wait in a priority queue.
+"""
+admission_queue = None
+
+"""If not None, ```circuit_breakers``` is a ```CircuitBreakers``` and
+requests to CouchDB fail immediately, rather than waiting for a
+connect timeout, while the circuit breaker for the request's
+endpoint (and optionally design doc) is open.
+"""
+circuit_breakers = None
+
+"""```CouchDBAsyncHTTPClient``` writes a timing log message at INFO level
+describing how long CouchDB took to respond to each request. Only
+```timing_log_sample_rate``` (between 0.0 and 1.0) of responses are
+logged. No work is done formatting messages which won't be logged.
+"""
+timing_log_sample_rate = 1.0
+
+"""If not None, responses which took at least ```slow_request_threshold_in_ms```
+are always logged, regardless of ```timing_log_sample_rate```, at WARNING level.
+"""
+slow_request_threshold_in_ms = None
+
+"""```timing_log_format``` is either ```TIMING_LOG_FORMAT_TEXT``` (an English
+sentence) or ```TIMING_LOG_FORMAT_JSON``` (a single line JSON object which
+is easier for machines to parse).
+"""
+TIMING_LOG_FORMAT_TEXT = "text"
+TIMING_LOG_FORMAT_JSON = "json"
+timing_log_format = TIMING_LOG_FORMAT_TEXT
+
+"""If not None, ```metrics_registry``` is a ```metrics.MetricsRegistry```
+which records histograms of the time CouchDB takes to respond.
+"""
+metrics_registry = None
+
+"""If not None, ```read_hedger``` is a ```ReadHedger``` used by
+```AsyncModelRetrieverByDocumentID``` and ```AsyncModelRetriever```
+to hedge GETs - if the response to a GET hasn't arrived within the
+observed p95 latency an identical GET is sent and whichever response
+arrives first is used.
+"""
+read_hedger = None
+
+"""```_in_flight_gets``` maps each in flight GET to the list
+of ```CouchDBAsyncHTTPClient``` instances waiting for the GET's response.
+```_in_flight_gets``` is only used when ```coalesce_gets``` is ```True```.
+"""
+_in_flight_gets = {}
+
 
 def _fragmentation(data_size, disk_size):
     """Think of the fragmentation metric is that it's
@@ -60,15 +197,104 @@ def _fragmentation(data_size, disk_size):
     return int(round(fragmentation, 0))
 
 
+def _is_failure_response_code(http_response_code):
+    """Returns ```True``` if ```http_response_code``` indicates CouchDB
+    (rather than the request) is having a problem.
+    599 = tornado's code for connection errors and timeouts.
+    """
+    return http_response_code == 599 or httplib.INTERNAL_SERVER_ERROR <= http_response_code
+
+
+def _split_deadline(deadline, number_parts):
+    """Returns the deadline for the first of ```number_parts``` sequential
+    requests which must all complete by ```deadline``` - the time remaining
+    until ```deadline``` is split evenly between the requests. Returns
+    ```None``` if ```deadline``` is ```None```.
+    """
+    if deadline is None:
+        return None
+    now = time.time()
+    return now + max(0.0, deadline - now) / number_parts
+
+
+def _process_responses(cacs, response):
+    """Process ```response``` on behalf of each ```CouchDBAsyncHTTPClient```
+    in ```cacs``` parsing the response's body at most once. Returns a list
+    containing the arguments for each ```CouchDBAsyncHTTPClient```'s
+    ```_call_callback()```.
+    """
+    callbacks_args = []
+    response_body = None
+    for cac in cacs:
+        (response_body, callback_args) = cac._process_response(response, response_body)
+        callbacks_args.append(callback_args)
+    return callbacks_args
+
+
+def _check_doc_for_tampering_and_if_ok_create_model(doc, create_model_from_doc):
+    if tampering_signer:
+        if tampering_verification_cache is not None:
+            is_verified = tampering_verification_cache.verify(tampering_signer, doc, json_codec)
+        else:
+            is_verified = tamper.verify(tampering_signer, doc, json_codec)
+        if not is_verified:
+            _logger.error(
+                "tampering detected in doc '%s'",
+                doc["_id"])
+            return None
+    return create_model_from_doc(doc)
+
+
 class CouchDBAsyncHTTPRequest(tornado.httpclient.HTTPRequest):
     """```CouchDBAsyncHTTPRequest``` extends ```tornado.httpclient.HTTPRequest```
     adding ...
+
+    If ```endpoint``` is not None the request is sent to ```endpoint```'s
+    database otherwise if ```endpoint_pool``` is not None the request is
+    sent to the database of the endpoint selected by ```endpoint_pool```
+    otherwise the request is sent to ```database```. An endpoint selected
+    by ```endpoint_pool``` is selected again when ```CouchDBAsyncHTTPClient```
+    sends the request since the request may have waited in ```admission_queue```
+    long enough for the endpoint to have been ejected.
+
+    ```priority``` is the request's ```AdmissionQueue``` priority
+    and defaults to ```AdmissionQueue.PRIORITY_READ``` for GETs and
+    ```AdmissionQueue.PRIORITY_WRITE``` for everything else. A priority
+    of ```None``` means the request bypasses ```admission_queue```.
+
+    If not None, ```deadline``` is the time (as returned by ```time.time()```)
+    by which the request must complete. The request's ```request_timeout```
+    and ```connect_timeout``` are derived from ```deadline``` and
+    ```CouchDBAsyncHTTPClient``` won't send the request if ```deadline```
+    has passed.
+
+    ```operation``` is the logical operation label ```metrics_registry```
+    uses for the request. If ```operation``` is None the operation is
+    derived from ```path```.
     """
 
-    def __init__(self, path, method, body_as_dict):
+    def __init__(self, path, method, body_as_dict, sign_body_as_dict=True, endpoint=None, deadline=None):
         assert not path.startswith('/')
 
-        url = "%s/%s" % (database, path)
+        self.path = path
+        self.operation = None
+
+        self.is_endpoint_selected = endpoint is None and endpoint_pool is not None
+        if self.is_endpoint_selected:
+            endpoint = endpoint_pool.select()
+        self.endpoint = endpoint
+
+        # requests which are expected to be slow (ex long polls)
+        # set track_latency to False so they don't skew the
+        # endpoint's latency
+        self.track_latency = True
+
+        if method == "GET":
+            self.priority = AdmissionQueue.PRIORITY_READ
+        else:
+            self.priority = AdmissionQueue.PRIORITY_WRITE
+
+        url = "%s/%s" % (endpoint.database if endpoint else database, path)
 
         headers = {
             "Accept": "application/json",
@@ -76,9 +302,9 @@ class CouchDBAsyncHTTPRequest(tornado.httpclient.HTTPRequest):
         }
 
         if body_as_dict is not None:
-            if tampering_signer:
-                tamper.sign(tampering_signer, body_as_dict)
-            body = json.dumps(body_as_dict)
+            if tampering_signer and sign_body_as_dict:
+                tamper.sign(tampering_signer, body_as_dict, json_codec)
+            body = json_codec.dumps(body_as_dict)
             headers["Content-Type"] = "application/json; charset=utf8"
         else:
             body = None
@@ -96,6 +322,30 @@ class CouchDBAsyncHTTPRequest(tornado.httpclient.HTTPRequest):
             auth_username=username,
             auth_password=password)
 
+        self.deadline = deadline
+        self._max_connect_timeout = self.connect_timeout or tornado.httpclient.HTTPRequest._DEFAULTS["connect_timeout"]
+        self._set_timeouts_from_deadline()
+
+    def _bind_endpoint(self, endpoint):
+        """Send the request to ```endpoint``` rather than to the
+        request's current endpoint.
+        """
+        self.url = endpoint.database + self.url[len(self.endpoint.database):]
+        self.endpoint = endpoint
+
+    def _set_timeouts_from_deadline(self):
+        """Derive the request's timeouts from the time remaining until
+        ```deadline```. Called when the request is created and again
+        just before it's sent since the request may have waited in
+        ```admission_queue``` in between.
+        """
+        if self.deadline is None:
+            return
+        # tornado requires timeouts to be positive
+        timeout = max(0.001, self.deadline - time.time())
+        self.request_timeout = timeout
+        self.connect_timeout = min(timeout, self._max_connect_timeout)
+
 
 class CouchDBAsyncHTTPClient(object):
     """```CouchDBAsyncHTTPClient``` wraps
@@ -104,17 +354,66 @@ class CouchDBAsyncHTTPClient(object):
     for subsequent use in performance analysis and health monitoring.
     """
 
+    """A 599 response which arrives within ```_deadline_timeout_tolerance```
+    seconds of the request's deadline is assumed to be a timeout caused
+    by the deadline.
+    """
+    _deadline_timeout_tolerance = 0.01
+
     def __init__(self,
                  expected_response_code,
                  create_model_from_doc,
-                 expect_one_document=False):
+                 expect_one_document=False,
+                 cached_doc=None,
+                 hedge=False):
         object.__init__(self)
 
         self.expected_response_code = expected_response_code
         self.create_model_from_doc = create_model_from_doc
         self.expect_one_document = expect_one_document
 
+        # if hedge is True and read_hedger is not None then GETs
+        # are hedged - only idempotent requests should be hedged
+        self.hedge = hedge
+        self.is_hedge_sent = False
+        self.is_hedge_winner = False
+
+        # if the request is a conditional GET, cached_doc is the
+        # document to use if CouchDB responds with a 304 Not Modified
+        self.cached_doc = cached_doc
+        self.not_modified = False
+
+        # http_response_code is None if the request wasn't sent
+        # or no response was received from CouchDB
+        self.http_response_code = None
+        self.response_body_size = None
+        self.response_headers = None
+
+        # is_shed is True if the request wasn't sent because the
+        # request's deadline passed or admission_queue decided the
+        # request would have waited too long to be sent
+        self.is_shed = False
+
+        # circuit_breaker is the CircuitBreaker guarding the request
+        # (None if circuit_breakers is None) and is_circuit_open is
+        # True if the request wasn't sent because circuit_breaker was open
+        self.circuit_breaker = None
+        self.is_circuit_open = False
+
         self._callback = None
+        self._deadline = None
+        self._is_circuit_breaker_trial = False
+        self._coalescing_key = None
+        self._endpoint = None
+        self._track_latency = True
+        self._admission_queue = None
+        self._hedger = None
+        self._hedge_timeout = None
+        self._hedge_endpoint = None
+        self._hedge_circuit_breaker = None
+        self._is_hedge_circuit_breaker_trial = False
+        self._hedge_admission_queue = None
+        self._is_responded = False
 
     def fetch(self, request, callback):
         """fetch() is perhaps not the best name but it matches
@@ -123,16 +422,327 @@ class CouchDBAsyncHTTPClient(object):
         assert self._callback is None
         self._callback = callback
 
+        if isinstance(request, CouchDBAsyncHTTPRequest):
+            priority = request.priority
+            deadline = request.deadline
+        else:
+            priority = AdmissionQueue.PRIORITY_READ
+            deadline = None
+        self._deadline = deadline
+
+        if coalesce_gets and request.method == "GET" and request.streaming_callback is None:
+            # conditional GETs are only identical if they're
+            # conditional on the same ETag
+            coalescing_key = (request.url, request.headers.get("If-None-Match"))
+            waiting_cacs = _in_flight_gets.get(coalescing_key)
+            if waiting_cacs is None:
+                self._coalescing_key = coalescing_key
+                _in_flight_gets[coalescing_key] = [self]
+            elif type(self)._is_deadline_no_later(deadline, waiting_cacs[0]._deadline):
+                # an identical GET is already in flight so just
+                # wait for it to respond
+                self._coalescing_key = coalescing_key
+                waiting_cacs.append(self)
+                return
+
+        if deadline is not None and deadline <= time.time():
+            # no point sending a request that's already too late
+            self._on_shed(request)
+            return
+
+        if circuit_breakers is not None and isinstance(request, CouchDBAsyncHTTPRequest):
+            self.circuit_breaker = circuit_breakers.circuit_breaker_for(request)
+            if not self.circuit_breaker.allow_request():
+                self._on_circuit_open(request)
+                return
+            self._is_circuit_breaker_trial = self.circuit_breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+        if admission_queue is not None and priority is not None:
+            self._admission_queue = admission_queue
+            self._admission_queue.admit(
+                priority,
+                functools.partial(self._send, request),
+                functools.partial(self._on_shed, request),
+                deadline)
+            return
+
+        self._send(request)
+
+    @classmethod
+    def _is_deadline_no_later(cls, deadline, other_deadline):
+        """Returns ```True``` if ```deadline``` is no later than
+        ```other_deadline``` - ```None``` means no deadline.
+        """
+        if other_deadline is None:
+            return True
+        return deadline is not None and deadline <= other_deadline
+
+    def _send(self, request):
+        if isinstance(request, CouchDBAsyncHTTPRequest):
+            if request.is_endpoint_selected and not self._select_endpoint(request):
+                return
+            request._set_timeouts_from_deadline()
+
+        if isinstance(request, CouchDBAsyncHTTPRequest) and request.endpoint is not None:
+            self._endpoint = request.endpoint
+            self._track_latency = request.track_latency
+            self._endpoint.on_request_sent()
+
         http_client = tornado.httpclient.AsyncHTTPClient()
         http_client.fetch(
             request,
             callback=self._on_http_client_fetch_done)
 
+        if self.hedge and read_hedger is not None and request.method == "GET":
+            self._hedger = read_hedger
+            self._hedger.on_request()
+            hedge_delay_in_ms = self._hedger.hedge_delay_in_ms()
+            if hedge_delay_in_ms is not None:
+                self._hedge_timeout = tornado.ioloop.IOLoop.current().add_timeout(
+                    datetime.timedelta(milliseconds=hedge_delay_in_ms),
+                    functools.partial(self._on_hedge_timeout, request))
+
+    def _select_endpoint(self, request):
+        """Select ```request```'s endpoint just before ```request``` is
+        sent - the endpoint selected when ```request``` was created may
+        have been ejected (or become less attractive) while ```request```
+        waited in ```admission_queue```. Returns ```False``` if ```request```
+        can't be sent because the new endpoint's circuit breaker is open.
+        """
+        endpoint = request.endpoint.pool.select()
+        if endpoint is request.endpoint:
+            return True
+        request._bind_endpoint(endpoint)
+
+        if self.circuit_breaker is None:
+            return True
+
+        circuit_breaker = circuit_breakers.circuit_breaker_for(request)
+        if circuit_breaker is self.circuit_breaker:
+            return True
+
+        self.circuit_breaker.on_abandoned(self._is_circuit_breaker_trial)
+        self.circuit_breaker = circuit_breaker
+        if not circuit_breaker.allow_request():
+            self._is_circuit_breaker_trial = False
+            if self._admission_queue is not None:
+                self._admission_queue.release()
+            self._on_circuit_open(request)
+            return False
+        self._is_circuit_breaker_trial = circuit_breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+        return True
+
+    def _on_hedge_timeout(self, request):
+        self._hedge_timeout = None
+
+        if self._is_responded:
+            return
+
+        deadline = request.deadline if isinstance(request, CouchDBAsyncHTTPRequest) else None
+        if deadline is not None and deadline <= time.time():
+            return
+
+        hedge_request = self._create_hedge_request(request)
+
+        # the hedge is guarded by circuit_breakers and counted by
+        # admission_queue just like any other request but a hedge
+        # is only worth sending if it can be sent right now
+        hedge_circuit_breaker = None
+        if circuit_breakers is not None and isinstance(hedge_request, CouchDBAsyncHTTPRequest):
+            hedge_circuit_breaker = circuit_breakers.circuit_breaker_for(hedge_request)
+            if not hedge_circuit_breaker.allow_request():
+                return
+            self._is_hedge_circuit_breaker_trial = hedge_circuit_breaker.state == CircuitBreaker.STATE_HALF_OPEN
+
+        hedge_admission_queue = None
+        priority = hedge_request.priority if isinstance(hedge_request, CouchDBAsyncHTTPRequest) else None
+        if admission_queue is not None and priority is not None:
+            if not admission_queue.try_admit():
+                if hedge_circuit_breaker is not None:
+                    hedge_circuit_breaker.on_abandoned(self._is_hedge_circuit_breaker_trial)
+                return
+            hedge_admission_queue = admission_queue
+
+        if not self._hedger.acquire_hedge():
+            if hedge_circuit_breaker is not None:
+                hedge_circuit_breaker.on_abandoned(self._is_hedge_circuit_breaker_trial)
+            if hedge_admission_queue is not None:
+                hedge_admission_queue.release()
+            return
+
+        self.is_hedge_sent = True
+        self._hedge_circuit_breaker = hedge_circuit_breaker
+        self._hedge_admission_queue = hedge_admission_queue
+
+        if isinstance(hedge_request, CouchDBAsyncHTTPRequest) and hedge_request.endpoint is not None:
+            self._hedge_endpoint = hedge_request.endpoint
+            self._hedge_endpoint.on_request_sent()
+
+        if deadline is not None:
+            hedge_request._set_timeouts_from_deadline()
+
+        http_client = tornado.httpclient.AsyncHTTPClient()
+        http_client.fetch(
+            hedge_request,
+            callback=self._on_hedge_fetch_done)
+
+    def _create_hedge_request(self, request):
+        hedge_request = copy.copy(request)
+
+        if not isinstance(request, CouchDBAsyncHTTPRequest) or request.endpoint is None:
+            return hedge_request
+
+        # the original request's endpoint might be the reason the
+        # original request is slow (ex the node is paused in GC) so
+        # if possible send the hedge to a different endpoint
+        endpoint = request.endpoint.pool.select(exclude=request.endpoint)
+        if endpoint is not None:
+            hedge_request._bind_endpoint(endpoint)
+
+        return hedge_request
+
+    def _on_hedge_fetch_done(self, response):
+        self._log_response(response)
+        self._record_metrics(response)
+
+        is_deadline_timeout = self._is_deadline_timeout(response)
+
+        if self._hedge_endpoint is not None:
+            self._hedge_endpoint.on_response(
+                response.code,
+                response.request_time * 1000 if self._track_latency else None,
+                is_deadline_timeout)
+
+        if self._hedge_admission_queue is not None:
+            self._hedge_admission_queue.release(response.request_time * 1000)
+
+        if self._hedge_circuit_breaker is not None:
+            if is_deadline_timeout:
+                self._hedge_circuit_breaker.on_abandoned(self._is_hedge_circuit_breaker_trial)
+            else:
+                self._hedge_circuit_breaker.on_response(
+                    _is_failure_response_code(response.code),
+                    self._is_hedge_circuit_breaker_trial)
+
+        if self._is_responded:
+            return
+
+        if _is_failure_response_code(response.code):
+            # a hedge that fails fast mustn't beat an original
+            # request that might succeed so keep waiting for the
+            # original request's response
+            return
+
+        self._is_responded = True
+
+        self.is_hedge_winner = True
+        self._hedger.number_hedge_wins += 1
+
+        self._dispatch_response(response)
+
+    def _on_shed(self, request):
+        _logger.error(
+            "Shed %s on %s - deadline passed or request would have waited too long to be sent to CouchDB",
+            request.method,
+            request.url)
+
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.on_abandoned(self._is_circuit_breaker_trial)
+
+        for cac in self._pop_waiting_cacs():
+            cac.is_shed = True
+            cac._call_callback(False, False)
+
+    def _on_circuit_open(self, request):
+        _logger.error(
+            "Failed %s on %s without sending to CouchDB - circuit breaker '%s' is open",
+            request.method,
+            request.url,
+            self.circuit_breaker.name)
+
+        for cac in self._pop_waiting_cacs():
+            cac.circuit_breaker = self.circuit_breaker
+            cac.is_circuit_open = True
+            cac._call_callback(False, False)
+
+    def _pop_waiting_cacs(self):
+        if self._coalescing_key is None:
+            return [self]
+        return _in_flight_gets.pop(self._coalescing_key, [self])
+
     def _on_http_client_fetch_done(self, response):
+        self._log_response(response)
+        self._record_metrics(response)
+
+        is_deadline_timeout = self._is_deadline_timeout(response)
+
+        if self._endpoint is not None:
+            self._endpoint.on_response(
+                response.code,
+                response.request_time * 1000 if self._track_latency else None,
+                is_deadline_timeout)
+
+        if self._admission_queue is not None:
+            self._admission_queue.release(response.request_time * 1000)
+
+        if self.circuit_breaker is not None:
+            if is_deadline_timeout:
+                self.circuit_breaker.on_abandoned(self._is_circuit_breaker_trial)
+            else:
+                self.circuit_breaker.on_response(
+                    _is_failure_response_code(response.code),
+                    self._is_circuit_breaker_trial)
+
+        if self._hedger is not None:
+            self._hedger.on_response(response.request_time * 1000)
+            if self._hedge_timeout is not None:
+                tornado.ioloop.IOLoop.current().remove_timeout(self._hedge_timeout)
+                self._hedge_timeout = None
+
+        if self._is_responded:
+            # the hedged request won the race
+            return
+        self._is_responded = True
+
+        self._dispatch_response(response)
+
+    def _is_deadline_timeout(self, response):
+        """Returns ```True``` if ```response``` is a timeout caused by
+        the request's own deadline rather than by CouchDB. A caller's
+        tight deadline says nothing about CouchDB's health so such
+        timeouts aren't failures for circuit breakers and endpoints.
+        """
+        if response.code != 599 or self._deadline is None:
+            return False
+        # timers can fire a little early
+        return self._deadline <= time.time() + type(self)._deadline_timeout_tolerance
+
+    def _log_response(self, response):
         #
         # write a message to the log which can be easily parsed
         # by performance analysis tools and used to understand
         # performance bottlenecks.
+        #
+        # at high request rates formatting the message is measurable
+        # so nothing is formatted unless the message will be logged
+        #
+        request_time_in_ms = response.request_time * 1000
+
+        if slow_request_threshold_in_ms is not None and slow_request_threshold_in_ms <= request_time_in_ms:
+            if _logger.isEnabledFor(logging.WARNING):
+                _logger.warning(self._timing_log_msg(response, request_time_in_ms))
+            return
+
+        if not _logger.isEnabledFor(logging.INFO):
+            return
+
+        if timing_log_sample_rate < 1.0 and timing_log_sample_rate <= random.random():
+            return
+
+        _logger.info(self._timing_log_msg(response, request_time_in_ms))
+
+    def _timing_log_msg(self, response, request_time_in_ms):
         #
         # http://tornado.readthedocs.org/en/latest/httpclient.html#response-objects
         # explains that the time_info attribute of a tornado response
@@ -141,6 +751,19 @@ class CouchDBAsyncHTTPClient(object):
         # of these timing details can be found at
         # http://curl.haxx.se/libcurl/c/curl_easy_getinfo.html#TIMES
         #
+        time_info = response.time_info
+
+        if timing_log_format == TIMING_LOG_FORMAT_JSON:
+            msg_as_dict = {
+                "request_time_in_ms": request_time_in_ms,
+                "http_response_code": response.code,
+                "http_method": response.request.method,
+                "url": response.effective_url,
+            }
+            for key in metrics._time_info_phases:
+                msg_as_dict["%s_in_ms" % key] = time_info.get(key, 0) * 1000
+            return json_codec.dumps(msg_as_dict)
+
         fmt = (
             "CouchDB took {request_time:.2f} ms to respond "
             "with {http_response_code:d} to '{http_method}' "
@@ -150,34 +773,105 @@ class CouchDBAsyncHTTPClient(object):
             "s={starttransfer:.2f} ms t={total:.2f} ms r={redirect:.2f} ms"
         )
         msg_format_args = {
-            "request_time": response.request_time * 1000,
+            "request_time": request_time_in_ms,
             "http_response_code": response.code,
             "http_method": response.request.method,
             "url": response.effective_url,
         }
+        for key in metrics._time_info_phases:
+            msg_format_args[key] = time_info.get(key, 0) * 1000
+
+        return fmt.format(**msg_format_args)
+
+    def _record_metrics(self, response):
+        if metrics_registry is None:
+            return
+
+        request = response.request
+        operation = getattr(request, "operation", None)
+        if operation is None:
+            path = getattr(request, "path", None)
+            operation = metrics.operation_for_path(request.method, path) if path is not None else "unknown"
 
-        def add_time_info_to_msg_format_args(key):
-            msg_format_args[key] = response.time_info.get(key, 0) * 1000
+        metrics_registry.observe_response(
+            operation,
+            request.method,
+            response.code,
+            response.request_time,
+            response.time_info)
+
+    def _dispatch_response(self, response):
+        #
+        # if this was a coalesced GET then everyone that was waiting
+        # for the GET to respond gets the response. the response body
+        # is parsed at most once regardless of the number of waiters.
+        #
+        if self._coalescing_key is None:
+            cacs = [self]
+        else:
+            cacs = _in_flight_gets.pop(self._coalescing_key, [self])
 
-        add_time_info_to_msg_format_args("queue")
-        add_time_info_to_msg_format_args("namelookup")
-        add_time_info_to_msg_format_args("connect")
-        add_time_info_to_msg_format_args("pretransfer")
-        add_time_info_to_msg_format_args("starttransfer")
-        add_time_info_to_msg_format_args("total")
-        add_time_info_to_msg_format_args("redirect")
+        #
+        # for large response bodies, decoding the body, verifying
+        # signatures and creating models can take long enough to stall
+        # every other request on the IOLoop so do that work on
+        # response_processing_executor
+        #
+        if response_processing_executor is not None and \
+           response.body and \
+           response_processing_executor_threshold_in_bytes <= len(response.body):
+            future = response_processing_executor.submit(_process_responses, cacs, response)
+            tornado.ioloop.IOLoop.current().add_future(
+                future,
+                functools.partial(self._on_process_responses_done, cacs))
+            return
 
-        msg = fmt.format(**msg_format_args)
+        for (cac, callback_args) in zip(cacs, _process_responses(cacs, response)):
+            cac._call_callback(*callback_args)
 
-        _logger.info(msg)
+    def _on_process_responses_done(self, cacs, future):
+        try:
+            callbacks_args = future.result()
+        except Exception as ex:
+            _logger.error(
+                "Error processing response from CouchDB - %s",
+                ex)
+            callbacks_args = [(False, False)] * len(cacs)
+
+        for (cac, callback_args) in zip(cacs, callbacks_args):
+            cac._call_callback(*callback_args)
+
+    def _process_response(self, response, response_body):
+        """Check ```response``` for errors and convert the response's body
+        to models (if appropriate). ```response_body``` is the already
+        parsed response body or ```None``` if the body has not yet been
+        parsed. Returns a tuple of the parsed response body (or ```None```
+        if the body wasn't parsed) and the arguments for ```_call_callback()```.
+        """
+        self.http_response_code = response.code
+        self.response_headers = response.headers
+
+        if response.code == httplib.NOT_MODIFIED and self.cached_doc is not None:
+            #
+            # the cached doc was either signed by us or verified when
+            # it was added to the cache so no need to check for
+            # tampering again
+            #
+            self.not_modified = True
+            model = self.create_model_from_doc(self.cached_doc)
+            callback_args = (
+                model is not None,
+                False,              # is_conflict
+                model,
+            )
+            return (response_body, callback_args)
 
         #
         # check for errors ...
         #
         if response.code != self.expected_response_code:
             if response.code == httplib.CONFLICT:
-                self._call_callback(False, True)
-                return
+                return (response_body, (False, True))
 
             fmt = (
                 "CouchDB responded to %s on %s "
@@ -189,8 +883,7 @@ class CouchDBAsyncHTTPClient(object):
                 response.effective_url,
                 response.code,
                 self.expected_response_code)
-            self._call_callback(False, False)
-            return
+            return (response_body, (False, False))
 
         if response.error:
             _logger.error(
@@ -198,8 +891,7 @@ class CouchDBAsyncHTTPClient(object):
                 response.request.method,
                 response.effective_url,
                 response.error)
-            self._call_callback(False, False)
-            return
+            return (response_body, (False, False))
 
         #
         # process response body ...
@@ -209,28 +901,38 @@ class CouchDBAsyncHTTPClient(object):
         # CouchDB always returns response.body (a string) - let's convert the
         # body to a dict so we can operate on it more effectively
         #
-        response_body = json.loads(response.body) if response.body else {}
+        self.response_body_size = len(response.body) if response.body else 0
+
+        if response_body is None:
+            response_body = json_codec.loads(response.body) if response.body else {}
 
+        return (response_body, self._process_response_body(response_body))
+
+    def _process_response_body(self, response_body):
+        """Returns the arguments for ```_call_callback()```."""
         #
         # the response body either contains a bunch of documents that
         # need to be converted to model objects or a single document
         #
         if not self.create_model_from_doc:
-            self._call_callback(
+            # some CouchDB endpoints (ex _bulk_docs) respond with
+            # a list rather than a dict
+            is_dict = isinstance(response_body, dict)
+            return (
                 True,               # is_ok
                 False,              # is_conflict
                 response_body,
-                response_body.get("id", None),
-                response_body.get("rev", None))
-            return
+                response_body.get("id", None) if is_dict else None,
+                response_body.get("rev", None) if is_dict else None,
+            )
 
         if self.expect_one_document:
             model = self._check_doc_for_tampering_and_if_ok_create_model(response_body)
-            self._call_callback(
+            return (
                 model is not None,
                 False,              # is_conflict
-                model)
-            return
+                model,
+            )
 
         models = []
         for row in response_body.get("rows", []):
@@ -239,19 +941,14 @@ class CouchDBAsyncHTTPClient(object):
             if model is not None:
                 models.append(model)
 
-        self._call_callback(
+        return (
             True,                   # is_ok
             False,                  # is_conflict
-            models)
+            models,
+        )
 
     def _check_doc_for_tampering_and_if_ok_create_model(self, doc):
-        if tampering_signer:
-            if not tamper.verify(tampering_signer, doc):
-                _logger.error(
-                    "tampering detected in doc '%s'",
-                    doc["_id"])
-                return None
-        return self.create_model_from_doc(doc)
+        return _check_doc_for_tampering_and_if_ok_create_model(doc, self.create_model_from_doc)
 
     def _call_callback(self,
                        is_ok,
@@ -271,12 +968,38 @@ class CouchDBAsyncHTTPClient(object):
 
 
 class AsyncAction(object):
-    """Abstract base class for all async actions."""
+    """Abstract base class for all async actions.
+
+    If not None, ```deadline``` is the time (as returned by ```time.time()```)
+    by which the action must complete. The deadline flows into the action's
+    requests to CouchDB (see ```CouchDBAsyncHTTPRequest```) so an action
+    doesn't keep working on behalf of a caller that has already given up.
+    Actions which make several sequential requests split the time remaining
+    until ```deadline``` across the requests.
+
+    When an action fails because one of its requests was never sent
+    to CouchDB ```is_shed``` is ```True``` if the request was shed (its
+    deadline passed or ```admission_queue``` shed it) and ```is_circuit_open```
+    is ```True``` if ```circuit_breakers``` rejected the request. Callers
+    can use these to tell overload apart from CouchDB errors (ex to
+    respond with a 503 rather than a 500).
+    """
 
-    def __init__(self, async_state):
+    def __init__(self, async_state, deadline=None):
         object.__init__(self)
 
         self.async_state = async_state
+        self.deadline = deadline
+
+        self.is_shed = False
+        self.is_circuit_open = False
+
+    def _record_unsent_request(self, source):
+        """```source``` is a ```CouchDBAsyncHTTPClient``` (or an action
+        this action delegated to) which has just called back.
+        """
+        self.is_shed = self.is_shed or source.is_shed
+        self.is_circuit_open = self.is_circuit_open or source.is_circuit_open
 
 
 class AsyncModelRetrieverByDocumentID(AsyncAction):
@@ -284,29 +1007,79 @@ class AsyncModelRetrieverByDocumentID(AsyncAction):
     by document ID.
     """
 
-    def __init__(self, document_id, async_state):
-        AsyncAction.__init__(self, async_state)
+    def __init__(self, document_id, async_state, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
 
         self.document_id = document_id
 
+        self._doc = None
         self._callback = None
 
     def fetch(self, callback):
         assert self._callback is None
         self._callback = callback
 
-        request = CouchDBAsyncHTTPRequest(self.document_id, 'GET', None)
+        if batch_fetches_by_document_id:
+            _DocumentIDFetchBatch.add(self)
+            return
+
+        request = CouchDBAsyncHTTPRequest(self.document_id, 'GET', None, deadline=self.deadline)
+
+        cached_doc = document_cache.get(self.document_id) if document_cache is not None else None
+        if cached_doc is not None:
+            request.headers["If-None-Match"] = '"%s"' % cached_doc["_rev"]
 
         cac = CouchDBAsyncHTTPClient(
             httplib.OK,                     # expected_response_code
-            self.create_model_from_doc,
-            True)                           # expect_one_document
+            self._create_model_from_doc,
+            True,                           # expect_one_document
+            cached_doc,
+            hedge=True)
         cac.fetch(request, self._on_cac_fetch_done)
 
+    def _create_model_from_doc(self, doc):
+        self._doc = doc
+        return self.create_model_from_doc(doc)
+
     def _on_cac_fetch_done(self, is_ok, is_conflict, model, _id, _rev, cac):
         assert is_conflict is False
+
+        self._record_unsent_request(cac)
+
+        if document_cache is not None:
+            if not is_ok:
+                # only evict when CouchDB answered - a request which was
+                # shed, rejected by an open circuit breaker, failed to reach
+                # CouchDB (599) or hit a CouchDB error (5xx) says nothing
+                # about the cached document and evicting would empty the
+                # cache exactly when CouchDB is overloaded or down
+                if cac.http_response_code in [httplib.OK, httplib.NOT_MODIFIED, httplib.NOT_FOUND]:
+                    document_cache.remove(self.document_id)
+            elif cac.not_modified:
+                document_cache.not_modified(self.document_id)
+            else:
+                document_cache.put(self._doc, cac.response_body_size)
+
+        self._doc = None
+
         self._call_callback(is_ok, model)
 
+    def _on_batch_fetch_done(self, is_ok, doc):
+        """Called by ```_DocumentIDFetchBatch``` when the batch which
+        included this retriever is done. ```doc``` has already been
+        checked for tampering and is ```None``` if the document
+        was not found or failed the tampering check - like the unbatched
+        GET both are reported to the callback as failures.
+        """
+        if not is_ok or doc is None:
+            self._call_callback(False)
+            return
+
+        if document_cache is not None:
+            document_cache.on_change(self.document_id, doc.get("_rev"), False)
+
+        self._call_callback(True, self.create_model_from_doc(doc))
+
     def create_model_from_doc(self, doc):
         """Concrete classes derived from this class must implement
         this method which takes a dictionary (```doc```) and creates
@@ -322,8 +1095,12 @@ class AsyncModelRetrieverByDocumentID(AsyncAction):
 
 class BaseAsyncModelRetriever(AsyncAction):
 
-    def __init__(self, async_state):
-        AsyncAction.__init__(self, async_state)
+    # if hedge_reads is True then fetch() hedges its GET
+    # using read_hedger (if read_hedger is not None)
+    hedge_reads = False
+
+    def __init__(self, async_state, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
 
         self._callback = None
 
@@ -331,6 +1108,16 @@ class BaseAsyncModelRetriever(AsyncAction):
         assert self._callback is None
         self._callback = callback
 
+        request = self._create_request()
+
+        cac = CouchDBAsyncHTTPClient(httplib.OK, self.create_model_from_doc, hedge=type(self).hedge_reads)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, models, _id, _rev, cac):
+        self._record_unsent_request(cac)
+        self.on_cac_fetch_done(is_ok, is_conflict, models, _id, _rev, cac)
+
+    def _create_request(self):
         #
         # useful when trying to figure out URL encodings
         #
@@ -347,10 +1134,7 @@ class BaseAsyncModelRetriever(AsyncAction):
         # ie one view per design doc
         path = path_fmt % (self.design_doc, self.design_doc, query_string)
 
-        request = CouchDBAsyncHTTPRequest(path, "GET", None)
-
-        cac = CouchDBAsyncHTTPClient(httplib.OK, self.create_model_from_doc)
-        cac.fetch(request, self.on_cac_fetch_done)
+        return CouchDBAsyncHTTPRequest(path, "GET", None, deadline=self.deadline)
 
     def get_query_string_key_value_pairs(self):
         """This method is only called by ```fetch()``` to get the key value
@@ -412,8 +1196,10 @@ class BaseAsyncModelRetriever(AsyncAction):
 class AsyncModelRetriever(BaseAsyncModelRetriever):
     """Async'ly retrieve a model from the CouchDB database."""
 
-    def __init__(self, design_doc, key, async_state):
-        BaseAsyncModelRetriever.__init__(self, async_state)
+    hedge_reads = True
+
+    def __init__(self, design_doc, key, async_state, deadline=None):
+        BaseAsyncModelRetriever.__init__(self, async_state, deadline)
 
         self.design_doc = design_doc
         self.key = key
@@ -440,8 +1226,24 @@ class AsyncModelRetriever(BaseAsyncModelRetriever):
 class AsyncModelsRetriever(BaseAsyncModelRetriever):
     """Async'ly retrieve a collection of models from CouchDB."""
 
-    def __init__(self, design_doc, start_key=None, end_key=None, async_state=None):
-        BaseAsyncModelRetriever.__init__(self, async_state)
+    """```stream()``` calls back with batches of at most
+    ```stream_batch_size``` models.
+    """
+    stream_batch_size = 100
+
+    """```fetch_page()``` calls back with pages of at most
+    ```page_size``` models.
+    """
+    page_size = 100
+
+    """If ```prefetch_next_page``` is ```True``` then as soon as
+    ```fetch_page()``` delivers a page the next page is fetched
+    so it's ready when the next ```fetch_page()``` asks for it.
+    """
+    prefetch_next_page = True
+
+    def __init__(self, design_doc, start_key=None, end_key=None, async_state=None, deadline=None):
+        BaseAsyncModelRetriever.__init__(self, async_state, deadline)
 
         self.design_doc = design_doc
         self.start_key = start_key
@@ -449,6 +1251,17 @@ class AsyncModelsRetriever(BaseAsyncModelRetriever):
 
         self._callback = None
 
+        self._stream = None
+        self._stream_callback = None
+        self._batch_callback = None
+
+        self._prefetched_page = None
+
+    def _create_request(self):
+        request = BaseAsyncModelRetriever._create_request(self)
+        request.priority = AdmissionQueue.PRIORITY_BULK_READ
+        return request
+
     def get_query_string_key_value_pairs(self):
         query_params = {
             "include_docs": "true",
@@ -486,148 +1299,1907 @@ class AsyncModelsRetriever(BaseAsyncModelRetriever):
         self._callback(is_ok, self.transform_models(models), self)
         self._callback = None
 
+    def stream(self, batch_callback, callback):
+        """```stream()``` is an alternative to ```fetch()``` for views
+        with a large number of rows. Rather than buffering the entire
+        response, parsing it and then creating every model, the view's
+        rows are parsed as the response arrives and ```batch_callback```
+        is called with each batch of (up to) ```stream_batch_size```
+        models. This keeps memory bounded and keeps the IOLoop responsive.
+
+        ```batch_callback``` is called with ```(models, self)``` and
+        ```callback``` is called with ```(is_ok, self)``` once the
+        entire response has been processed. Note that ```transform_models()```
+        isn't used by ```stream()```. Also note that if ```is_ok``` is
+        ```False``` some batches may have already been delivered to
+        ```batch_callback```.
+        """
+        assert self._stream_callback is None
+        self._stream_callback = callback
+        self._batch_callback = batch_callback
 
-class InvalidTypeInDocForStoreException(Exception):
-    """This exception is raised by ```AsyncPersister``` when
-    a call to a model's as_doc_for_store() generates a doc
-    with an invalid type property.
-    """
+        self._stream = _ViewRowsStream(
+            self.create_model_from_doc,
+            self._on_stream_batch,
+            type(self).stream_batch_size)
 
-    def __init__(self, model):
-        msg_fmt = (
-            "invalid 'type' in doc for store - "
-            "see '%s.as_doc_for_store()"
-        )
-        msg = msg_fmt % type(model)
-        Exception.__init__(self, msg)
+        request = self._create_request()
+        request.header_callback = self._stream.on_header_line
+        request.streaming_callback = self._stream.on_chunk
 
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+        cac.fetch(request, self._on_stream_cac_fetch_done)
+
+    def fetch_page(self, callback, cursor=None):
+        """```fetch_page()``` is an alternative to ```fetch()``` which
+        walks the view one page of (at most) ```page_size``` models at
+        a time rather than loading the entire range of keys.
+
+        ```callback``` is called with ```(is_ok, models, next_cursor, self)```.
+        ```next_cursor``` is an opaque string which is supplied to the
+        next call to ```fetch_page()``` to get the next page. ```next_cursor```
+        is ```None``` on the last page. ```cursor``` = ```None``` fetches
+        the first page. ```InvalidCursorException``` is raised if ```cursor```
+        isn't a cursor generated by ```fetch_page()```.
+
+        Pages are walked using keyset pagination (ie using startkey
+        and startkey_docid) rather than skip so the cost of fetching
+        a page doesn't grow with the page number - see
+        http://docs.couchdb.org/en/latest/couchapp/views/pagination.html
+        """
+        page = self._prefetched_page
+        self._prefetched_page = None
 
-class AsyncPersister(AsyncAction):
-    """Async'ly persist a model object."""
+        if page is None or page.cursor != cursor:
+            page = _ModelsPage(self, cursor)
+            page.fetch()
 
-    """```_doc_type_reg_ex``` is used to verify the format of the
-    type property for each document before the document is written
-    to the store.
-    """
-    _doc_type_reg_ex = re.compile(
-        r"^[^\s]+_v\d+\.\d+$",
-        re.IGNORECASE)
+        page.callback = callback
+        if page.is_done:
+            self._on_page_done(page)
 
-    def __init__(self, model, model_as_doc_for_store_args, async_state):
-        AsyncAction.__init__(self, async_state)
+    def _on_page_done(self, page):
+        # describes the page being returned rather than every page
+        self.is_shed = page.is_shed
+        self.is_circuit_open = page.is_circuit_open
 
-        self.model = model
-        self.model_as_doc_for_store_args = model_as_doc_for_store_args
+        if page.is_ok and page.next_cursor is not None and type(self).prefetch_next_page:
+            self._prefetched_page = _ModelsPage(self, page.next_cursor)
+            self._prefetched_page.fetch()
 
-        self._callback = None
+        page.callback(page.is_ok, page.models, page.next_cursor, self)
 
-    def persist(self, callback):
-        assert not self._callback
-        self._callback = callback
+    def _on_stream_batch(self, models):
+        self._batch_callback(models, self)
 
-        model_as_doc_for_store = self.model.as_doc_for_store(*self.model_as_doc_for_store_args)
+    def _on_stream_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        assert is_conflict is False
 
-        #
-        # this check is important because the conflict resolution
-        # logic relies on being able to extract the type name from
-        # a document read from the store
-        #
-        if not type(self)._doc_type_reg_ex.match(model_as_doc_for_store['type']):
-            raise InvalidTypeInDocForStoreException(self.model)
+        self._record_unsent_request(cac)
 
-        if '_id' in model_as_doc_for_store:
-            path = model_as_doc_for_store['_id']
-            method = 'PUT'
-        else:
-            path = ''
-            method = 'POST'
+        if is_ok:
+            is_ok = self._stream.close()
+            if not is_ok:
+                _logger.error("incomplete response streaming view '%s'", self.design_doc)
 
-        request = CouchDBAsyncHTTPRequest(path, method, model_as_doc_for_store)
+        self._stream = None
+        self._batch_callback = None
 
-        cac = CouchDBAsyncHTTPClient(httplib.CREATED, None)
-        cac.fetch(request, self._on_cac_fetch_done)
+        assert self._stream_callback is not None
+        self._stream_callback(is_ok, self)
+        self._stream_callback = None
 
-    def _on_cac_fetch_done(self, is_ok, is_conflict, models, _id, _rev, cac):
-        """```self.model``` has just been written to a CouchDB database which
-        means ```self.model```'s _id and _rev properties might be out of
-        sync with the _id and _rev properties in CouchDB since CouchDB
-        generates these values. The "if _id" and "if _rev"
-        sections of code below unite the in-memory view and the CouchDB
-        view of this object/document.
-        """
-        if _id is not None:
-            self.model._id = _id
 
-        if _rev is not None:
+class InvalidCursorException(Exception):
+    """This exception is raised by ```AsyncModelsRetriever.fetch_page()```
+    when supplied with a cursor that wasn't generated by
+    ```AsyncModelsRetriever.fetch_page()```.
+    """
+
+    def __init__(self, cursor):
+        Exception.__init__(self, "invalid cursor '%s'" % cursor)
+
+
+class _ModelsPage(object):
+    """A single page of models being fetched on behalf of
+    ```AsyncModelsRetriever.fetch_page()```.
+    """
+
+    def __init__(self, amr, cursor):
+        object.__init__(self)
+
+        self.amr = amr
+        self.cursor = cursor
+
+        # decode now so an invalid cursor is reported to
+        # the caller of fetch_page()
+        self._start = type(self)._decode_cursor(cursor) if cursor is not None else None
+
+        self.is_done = False
+        self.is_ok = None
+        self.is_shed = False
+        self.is_circuit_open = False
+        self.models = None
+        self.next_cursor = None
+        self.callback = None
+
+    @classmethod
+    def _encode_cursor(cls, key, doc_id):
+        return base64.urlsafe_b64encode(json.dumps([key, doc_id]))
+
+    @classmethod
+    def _decode_cursor(cls, cursor):
+        try:
+            (key, doc_id) = json.loads(base64.urlsafe_b64decode(str(cursor)))
+        except Exception:
+            raise InvalidCursorException(cursor)
+        return (key, doc_id)
+
+    def fetch(self):
+        amr = self.amr
+        page_size = type(amr).page_size
+
+        query_string_key_value_pairs = amr.get_query_string_key_value_pairs()
+        # one extra row identifies where the next page starts
+        query_string_key_value_pairs["limit"] = page_size + 1
+        if self._start is not None:
+            (key, doc_id) = self._start
+            query_string_key_value_pairs["startkey"] = json.dumps(key)
+            query_string_key_value_pairs["startkey_docid"] = doc_id
+
+        # :ASSUMPTION: that design docs and views are called the same thing
+        # ie one view per design doc
+        path = '_design/%s/_view/%s?%s' % (
+            amr.design_doc,
+            amr.design_doc,
+            urllib.urlencode(query_string_key_value_pairs))
+        request = CouchDBAsyncHTTPRequest(path, "GET", None, deadline=amr.deadline)
+        request.priority = AdmissionQueue.PRIORITY_BULK_READ
+
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        assert is_conflict is False
+
+        self.is_ok = is_ok
+        self.is_shed = cac.is_shed
+        self.is_circuit_open = cac.is_circuit_open
+
+        if is_ok:
+            page_size = type(self.amr).page_size
+            rows = response_body.get("rows", [])
+            if page_size < len(rows):
+                next_row = rows[page_size]
+                self.next_cursor = type(self)._encode_cursor(next_row.get("key"), next_row.get("id"))
+                rows = rows[:page_size]
+
+            self.models = []
+            for row in rows:
+                doc = row.get("doc")
+                if doc is None:
+                    continue
+                model = _check_doc_for_tampering_and_if_ok_create_model(doc, self.amr.create_model_from_doc)
+                if model is not None:
+                    self.models.append(model)
+
+        self.is_done = True
+
+        if self.callback is not None:
+            self.amr._on_page_done(self)
+
+
+class _ViewRowsParser(object):
+    """Incrementally parse the rows of a view's response body. The
+    response body of a view looks something like
+
+        {"total_rows":2,"offset":0,"rows":[
+        {"id":"...","key":"...","value":null,"doc":{...}},
+        {"id":"...","key":"...","value":null,"doc":{...}}
+        ]}
+
+    Chunks of the response body are supplied to ```feed()``` as they
+    arrive and ```feed()``` returns the rows that have been completely
+    received. Only the bytes of the row currently being received are
+    buffered. Rows are decoded with the standard library's json module
+    rather than ```json_codec``` since the parser depends on
+    ```json.JSONDecoder.raw_decode()```.
+    """
+
+    _row_separators = frozenset(" \t\r\n,")
+
+    def __init__(self):
+        object.__init__(self)
+
+        self.is_done = False
+
+        self._buffer = ""
+        self._in_rows = False
+        self._decoder = json.JSONDecoder()
+
+    def feed(self, chunk):
+        buf = self._buffer + chunk
+        pos = 0
+        rows = []
+
+        if not self._in_rows:
+            # top level properties before "rows" are numbers
+            # so the first "rows" is the one we're looking for
+            rows_pos = buf.find('"rows"')
+            start_of_rows_pos = buf.find("[", rows_pos) if 0 <= rows_pos else -1
+            if start_of_rows_pos < 0:
+                self._buffer = buf
+                return rows
+            self._in_rows = True
+            pos = start_of_rows_pos + 1
+
+        row_separators = type(self)._row_separators
+        buf_len = len(buf)
+        while True:
+            while pos < buf_len and buf[pos] in row_separators:
+                pos += 1
+            if buf_len <= pos:
+                break
+            if buf[pos] == "]":
+                self.is_done = True
+                pos = buf_len
+                break
+            try:
+                (row, pos) = self._decoder.raw_decode(buf, pos)
+            except ValueError:
+                # row hasn't been completely received yet
+                break
+            rows.append(row)
+
+        self._buffer = buf[pos:]
+
+        return rows
+
+
+class _ViewRowsStream(object):
+    """Turns the chunks of a streamed view response into batches of
+    models. ```on_header_line()``` and ```on_chunk()``` are intended
+    to be used as a request's ```header_callback``` and
+    ```streaming_callback```.
+    """
+
+    def __init__(self, create_model_from_doc, batch_callback, batch_size):
+        object.__init__(self)
+
+        self.create_model_from_doc = create_model_from_doc
+        self.batch_callback = batch_callback
+        self.batch_size = batch_size
+
+        self._code = None
+        self._parser = _ViewRowsParser()
+        self._models = []
+
+    def on_header_line(self, line):
+        if line.startswith("HTTP/"):
+            # take the last status line to skip past the likes
+            # of "100 Continue"
+            self._code = tornado.httputil.parse_response_start_line(line.strip()).code
+
+    def on_chunk(self, chunk):
+        if self._code != httplib.OK:
+            # error responses aren't views
+            return
+
+        for row in self._parser.feed(chunk):
+            doc = row.get("doc")
+            if doc is None:
+                continue
+            model = _check_doc_for_tampering_and_if_ok_create_model(doc, self.create_model_from_doc)
+            if model is not None:
+                self._models.append(model)
+                if self.batch_size <= len(self._models):
+                    self._call_batch_callback()
+
+    def close(self):
+        """Called once the entire response has been received. Delivers
+        the last partial batch of models and returns ```True``` if the
+        entire response was parsed otherwise returns ```False```.
+        """
+        if self._models:
+            self._call_batch_callback()
+        return self._parser.is_done
+
+    def _call_batch_callback(self):
+        models = self._models
+        self._models = []
+        self.batch_callback(models)
+
+
+class AsyncModelsRetrieverByKeys(AsyncAction):
+    """Async'ly retrieve a collection of models from CouchDB by
+    an arbitrary collection of view keys.
+
+    Rather than issuing one request per key the keys are POSTed
+    to the view (see
+    http://docs.couchdb.org/en/latest/api/ddoc/views.html#post--db-_design-ddoc-_view-view).
+    Large collections of keys are split into requests of no more than
+    ```max_keys_per_request``` keys and these requests are issued
+    concurrently.
+
+    The callback supplied to ```fetch()``` receives a list of models in
+    the same order as ```keys``` - the list contains ```None``` for each
+    key with no model. If a view emits a key more than once the model
+    for the first row with the key is used.
+    """
+
+    max_keys_per_request = 100
+
+    def __init__(self, design_doc, keys, async_state=None, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.design_doc = design_doc
+        self.keys = keys
+
+        self._models_by_key = {}
+        self._number_requests_in_flight = 0
+        self._is_ok = True
+        self._callback = None
+
+    def fetch(self, callback):
+        assert self._callback is None
+        self._callback = callback
+
+        if not self.keys:
+            self._call_callback(True, [])
+            return
+
+        path = self.get_path()
+
+        max_keys_per_request = type(self).max_keys_per_request
+        chunks = [
+            self.keys[i:i + max_keys_per_request]
+            for i in range(0, len(self.keys), max_keys_per_request)
+        ]
+
+        self._number_requests_in_flight = len(chunks)
+
+        for chunk in chunks:
+            body = {
+                "keys": chunk,
+            }
+            request = CouchDBAsyncHTTPRequest(path, "POST", body, sign_body_as_dict=False, deadline=self.deadline)
+            request.priority = self.get_priority()
+
+            cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+            cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        assert is_conflict is False
+
+        self._record_unsent_request(cac)
+
+        self._number_requests_in_flight -= 1
+
+        if not is_ok:
+            self._is_ok = False
+        elif self._is_ok:
+            for row in response_body.get("rows", []):
+                doc = row.get("doc")
+                if doc is None:
+                    # doc was deleted after the view was updated
+                    continue
+                row_key = type(self)._hashable_key(row.get("key"))
+                if row_key in self._models_by_key:
+                    continue
+                model = _check_doc_for_tampering_and_if_ok_create_model(doc, self.create_model_from_doc)
+                if model is not None:
+                    self._models_by_key[row_key] = model
+
+        if self._number_requests_in_flight:
+            return
+
+        if not self._is_ok:
+            self._call_callback(False)
+            return
+
+        hashable_key = type(self)._hashable_key
+        models = [self._models_by_key.get(hashable_key(key)) for key in self.keys]
+        self._call_callback(True, models)
+
+    def get_path(self):
+        # :ASSUMPTION: that design docs and views are called the same thing
+        # ie one view per design doc
+        return '_design/%s/_view/%s?include_docs=true' % (self.design_doc, self.design_doc)
+
+    def get_priority(self):
+        """Returns the ```AdmissionQueue``` priority of the requests."""
+        return AdmissionQueue.PRIORITY_BULK_READ
+
+    @classmethod
+    def _hashable_key(cls, key):
+        # view keys can be any JSON value (ex a list for composite keys)
+        return json.dumps(key, sort_keys=True)
+
+    def create_model_from_doc(self, doc):
+        """Concrete classes derived from this class must implement
+        this method which takes a dictionary (```doc```) and creates
+        a model instance.
+        """
+        raise NotImplementedError()
+
+    def _call_callback(self, is_ok, models=None):
+        assert self._callback is not None
+        self._models_by_key = {}
+        self._callback(is_ok, models, self)
+        self._callback = None
+
+
+class AsyncModelsRetrieverByDocumentIDs(AsyncModelsRetrieverByKeys):
+    """Async'ly retrieve a collection of models from CouchDB by document ID
+    using ```_all_docs``` (see
+    http://docs.couchdb.org/en/latest/api/database/bulk-api.html#post--db-_all_docs).
+
+    The callback supplied to ```fetch()``` receives a list of models in
+    the same order as ```document_ids``` - the list contains ```None``` for
+    each document that doesn't exist (or has been deleted).
+    """
+
+    def __init__(self, document_ids, async_state=None, deadline=None):
+        AsyncModelsRetrieverByKeys.__init__(self, None, document_ids, async_state, deadline)
+
+    @property
+    def document_ids(self):
+        return self.keys
+
+    def get_path(self):
+        return '_all_docs?include_docs=true'
+
+
+class _DocumentIDFetchBatch(AsyncModelsRetrieverByDocumentIDs):
+    """When ```batch_fetches_by_document_id``` is ```True```,
+    ```AsyncModelRetrieverByDocumentID``` instances add themselves to
+    the current ```_DocumentIDFetchBatch```. The batch is fetched on the
+    IOLoop's next iteration and each document in the response is handed
+    to the ```AsyncModelRetrieverByDocumentID``` instances that asked for
+    it so each can create its own model.
+    """
+
+    """```_current``` is the batch accepting fetches during the
+    current IOLoop iteration.
+    """
+    _current = None
+
+    @classmethod
+    def add(cls, amrbdi):
+        batch = cls._current
+        if batch is None:
+            batch = cls()
+            cls._current = batch
+            tornado.ioloop.IOLoop.current().add_callback(batch._fetch)
+        batch._amrbdis.append(amrbdi)
+
+    def __init__(self):
+        AsyncModelsRetrieverByDocumentIDs.__init__(self, [])
+
+        self._amrbdis = []
+
+    def _fetch(self):
+        if type(self)._current is self:
+            type(self)._current = None
+
+        # the batch's deadline is the latest of its retrievers' deadlines
+        deadlines = [amrbdi.deadline for amrbdi in self._amrbdis]
+        self.deadline = None if None in deadlines else max(deadlines)
+
+        document_ids = []
+        unique_document_ids = set()
+        for amrbdi in self._amrbdis:
+            if amrbdi.document_id not in unique_document_ids:
+                unique_document_ids.add(amrbdi.document_id)
+                document_ids.append(amrbdi.document_id)
+        self.keys = document_ids
+
+        self.fetch(self._on_fetch_done)
+
+    def get_priority(self):
+        # the batch stands in for single document GETs
+        return AdmissionQueue.PRIORITY_READ
+
+    def create_model_from_doc(self, doc):
+        # each AsyncModelRetrieverByDocumentID creates its own model
+        return doc
+
+    def _on_fetch_done(self, is_ok, docs, batch):
+        docs_by_document_id = dict(zip(self.document_ids, docs)) if is_ok else {}
+        for amrbdi in self._amrbdis:
+            amrbdi._record_unsent_request(self)
+            amrbdi._on_batch_fetch_done(is_ok, docs_by_document_id.get(amrbdi.document_id))
+
+
+class InvalidTypeInDocForStoreException(Exception):
+    """This exception is raised by ```AsyncPersister``` when
+    a call to a model's as_doc_for_store() generates a doc
+    with an invalid type property.
+    """
+
+    def __init__(self, model):
+        msg_fmt = (
+            "invalid 'type' in doc for store - "
+            "see '%s.as_doc_for_store()"
+        )
+        msg = msg_fmt % type(model)
+        Exception.__init__(self, msg)
+
+
+class ConflictMerger(object):
+    """```ConflictMerger``` resolves the conflicts ```AsyncPersister```
+    encounters when persisting a model whose document has been changed
+    by someone else since the model was read. The current version of
+    the document is read and a three-way merge of the model's original
+    document (the base), the model's document (mine) and the current
+    document (theirs) is done property by property. A property changed
+    by only one of mine or theirs, or changed identically by both, is
+    merged. A property changed differently by both is a true conflict
+    unless ```resolvers``` has a resolver for the property.
+    If there are no true conflicts the merged document is persisted.
+    This is repeated (if someone else changes the document again)
+    at most ```max_merge_attempts``` times.
+
+    ```resolvers``` is a dict mapping property names to callables which
+    are called with ```(mine, theirs)``` when both mine and theirs have
+    changed a property differently and return the property's merged value.
+    Properties which every change stamps are the typical use - for example
+    ```ConflictMerger(resolvers={"updated_on": max})``` keeps the later of
+    two ISO 8601 UTC timestamps so concurrent changes to other properties
+    still merge. A property deleted by either mine or theirs is never
+    passed to a resolver.
+
+    A single ```ConflictMerger``` is typically shared by all
+    ```AsyncPersister``` instances so the following metrics describe
+    how much contention merging avoids:
+
+        -- ```number_conflicts``` = number of conflicts encountered
+        -- ```number_merges``` = number of conflicts resolved by
+           persisting a merged document
+        -- ```number_merge_failures``` = number of conflicts reported
+           to ```AsyncPersister```'s caller
+    """
+
+    """```_unmerged_property_names``` are the properties which CouchDB
+    and the tamper module manage and which are therefore never merged.
+    """
+    _unmerged_property_names = frozenset(["_id", "_rev", tamper._tampering_sig_prop_name])
+
+    """```_missing``` represents a property which isn't in a document."""
+    _missing = object()
+
+    def __init__(self, max_merge_attempts=3, resolvers=None):
+        object.__init__(self)
+
+        self.max_merge_attempts = max_merge_attempts
+        self.resolvers = resolvers or {}
+
+        self.number_conflicts = 0
+        self.number_merges = 0
+        self.number_merge_failures = 0
+
+    def merge(self, base_doc, my_doc, their_doc):
+        """Returns a tuple of the merged document (without _id and _rev)
+        and a sorted list of the names of the properties which
+        couldn't be merged.
+        """
+        cls = type(self)
+
+        property_names = set(base_doc) | set(my_doc) | set(their_doc)
+        property_names -= cls._unmerged_property_names
+
+        merged_doc = {}
+        conflicting_property_names = []
+
+        for property_name in property_names:
+            base = base_doc.get(property_name, cls._missing)
+            mine = my_doc.get(property_name, cls._missing)
+            theirs = their_doc.get(property_name, cls._missing)
+
+            if mine == base or mine == theirs:
+                merged = theirs
+            elif theirs == base:
+                merged = mine
+            elif property_name in self.resolvers and cls._missing not in (mine, theirs):
+                merged = self.resolvers[property_name](mine, theirs)
+            else:
+                conflicting_property_names.append(property_name)
+                continue
+
+            if merged is not cls._missing:
+                merged_doc[property_name] = merged
+
+        return (merged_doc, sorted(conflicting_property_names))
+
+
+class AsyncPersister(AsyncAction):
+    """Async'ly persist a model object.
+
+    If ```conflict_merger``` is not None conflicts are resolved
+    by ```conflict_merger``` and only conflicts which can't be merged
+    are reported to the caller. When a merged document is persisted
+    ```model``` is replaced by a model created from the merged document
+    (using ```type(model)(doc=merged_doc)```).
+    """
+
+    """```_doc_type_reg_ex``` is used to verify the format of the
+    type property for each document before the document is written
+    to the store.
+    """
+    _doc_type_reg_ex = re.compile(
+        r"^[^\s]+_v\d+\.\d+$",
+        re.IGNORECASE)
+
+    def __init__(self, model, model_as_doc_for_store_args, async_state, deadline=None, conflict_merger=None):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.model = model
+        self.model_as_doc_for_store_args = model_as_doc_for_store_args
+        self.conflict_merger = conflict_merger
+
+        self._doc = None
+        self._doc_size = None
+        self._number_merge_attempts = 0
+        self._is_merged = False
+        self._callback = None
+
+    def persist(self, callback):
+        assert not self._callback
+        self._callback = callback
+
+        model_as_doc_for_store = self._model_as_doc_for_store()
+
+        if '_id' in model_as_doc_for_store:
+            path = model_as_doc_for_store['_id']
+            method = 'PUT'
+        else:
+            path = ''
+            method = 'POST'
+
+        request = CouchDBAsyncHTTPRequest(path, method, model_as_doc_for_store, deadline=self.deadline)
+
+        # remember what was written so document_cache can be updated
+        self._doc = model_as_doc_for_store
+        self._doc_size = len(request.body)
+
+        cac = CouchDBAsyncHTTPClient(httplib.CREATED, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _model_as_doc_for_store(self):
+        model_as_doc_for_store = self.model.as_doc_for_store(*self.model_as_doc_for_store_args)
+
+        #
+        # this check is important because the conflict resolution
+        # logic relies on being able to extract the type name from
+        # a document read from the store
+        #
+        if not type(self)._doc_type_reg_ex.match(model_as_doc_for_store['type']):
+            raise InvalidTypeInDocForStoreException(self.model)
+
+        return model_as_doc_for_store
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, models, _id, _rev, cac):
+        """```self.model``` has just been written to a CouchDB database which
+        means ```self.model```'s _id and _rev properties might be out of
+        sync with the _id and _rev properties in CouchDB since CouchDB
+        generates these values. The "if _id" and "if _rev"
+        sections of code below unite the in-memory view and the CouchDB
+        view of this object/document.
+        """
+        self._record_unsent_request(cac)
+
+        if is_conflict and self.conflict_merger is not None:
+            self._doc = None
+            self._doc_size = None
+            self._on_conflict()
+            return
+
+        if _id is not None:
+            self.model._id = _id
+
+        if _rev is not None:
             self.model._rev = _rev
 
-        self._call_callback(is_ok, is_conflict)
+        if document_cache is not None:
+            self._update_document_cache(is_ok)
+
+        if is_ok and self._doc is not None:
+            self._doc["_id"] = self.model._id
+            self._doc["_rev"] = self.model._rev
+            if self._is_merged:
+                self.model = type(self.model)(doc=self._doc)
+                self.conflict_merger.number_merges += 1
+            else:
+                self.model._original_doc = self._doc
+
+        self._doc = None
+        self._doc_size = None
+
+        self._call_callback(is_ok, is_conflict)
+
+    def _on_conflict(self):
+        self.conflict_merger.number_conflicts += 1
+
+        if document_cache is not None and self.model._id is not None:
+            document_cache.remove(self.model._id)
+
+        if self.model._id is None or \
+           self.model._original_doc is None or \
+           self.conflict_merger.max_merge_attempts <= self._number_merge_attempts:
+            self._on_merge_failed()
+            return
+
+        self._number_merge_attempts += 1
+
+        request = CouchDBAsyncHTTPRequest(self.model._id, "GET", None, deadline=self.deadline)
+
+        # the current doc is checked for tampering but otherwise
+        # used as is rather than being turned into a model
+        cac = CouchDBAsyncHTTPClient(
+            httplib.OK,                     # expected_response_code
+            lambda doc: doc,                # create_model_from_doc
+            True)                           # expect_one_document
+        cac.fetch(request, self._on_cac_current_doc_fetch_done)
+
+    def _on_cac_current_doc_fetch_done(self, is_ok, is_conflict, their_doc, _id, _rev, cac):
+        self._record_unsent_request(cac)
+
+        if not is_ok or their_doc is None:
+            self._on_merge_failed()
+            return
+
+        my_doc = self._model_as_doc_for_store()
+
+        (merged_doc, conflicting_property_names) = self.conflict_merger.merge(
+            self.model._original_doc,
+            my_doc,
+            their_doc)
+        if conflicting_property_names:
+            _logger.info(
+                "Unable to merge conflict on '%s' - conflicting properties %s",
+                self.model._id,
+                conflicting_property_names)
+            self._on_merge_failed()
+            return
+
+        merged_doc["_id"] = their_doc["_id"]
+        merged_doc["_rev"] = their_doc["_rev"]
+
+        request = CouchDBAsyncHTTPRequest(merged_doc["_id"], "PUT", merged_doc, deadline=self.deadline)
+
+        self._doc = merged_doc
+        self._doc_size = len(request.body)
+        self._is_merged = True
+
+        cac = CouchDBAsyncHTTPClient(httplib.CREATED, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_merge_failed(self):
+        self.conflict_merger.number_merge_failures += 1
+        self._call_callback(False, True)
+
+    def _update_document_cache(self, is_ok):
+        if is_ok and self._doc is not None and self._doc_size is not None:
+            self._doc["_id"] = self.model._id
+            self._doc["_rev"] = self.model._rev
+            document_cache.put(self._doc, self._doc_size)
+        elif self.model._id is not None:
+            document_cache.remove(self.model._id)
+
+    def _call_callback(self, is_ok, is_conflict):
+        assert self._callback is not None
+        assert (is_ok and not is_conflict) or (not is_ok)
+        self._callback(is_ok, is_conflict, self)
+        self._callback = None
+
+
+class AsyncBulkPersister(AsyncPersister):
+    """Async'ly persist a model object as part of a batch of persists
+    which are written to CouchDB with a single ```_bulk_docs``` request.
+
+    From a caller's perspective ```AsyncBulkPersister``` behaves exactly
+    like ```AsyncPersister``` - same constructor, same ```persist()```
+    and the callback supplied to ```persist()``` is called with the
+    outcome for just the caller's model. The difference is that persists
+    issued within ```max_batch_delay_in_ms``` of the first persist in a
+    batch are coalesced into a single request to CouchDB. A batch is
+    written as soon as it contains ```max_batch_size``` documents.
+
+    ```_bulk_docs``` is not transactional - each document in a batch
+    succeeds or fails (including with a conflict) independently of
+    the other documents in the batch. See
+    http://docs.couchdb.org/en/latest/api/database/bulk-api.html#db-bulk-docs
+    for the details.
+    """
+
+    """A batch is written to CouchDB as soon as it contains
+    ```max_batch_size``` documents.
+    """
+    max_batch_size = 100
+
+    """A batch is written to CouchDB no later than ```max_batch_delay_in_ms```
+    after the first persist in the batch is issued.
+    """
+    max_batch_delay_in_ms = 5
+
+    """```_batch``` is the batch currently accepting persists. Note
+    ```_batch``` is intentionally shared by ```AsyncBulkPersister```
+    and all derived classes.
+    """
+    _batch = None
+
+    def persist(self, callback):
+        assert not self._callback
+        self._callback = callback
+
+        #
+        # type check and tamper signing are done per document since
+        # the body of the _bulk_docs request isn't itself a document
+        #
+        model_as_doc_for_store = self._model_as_doc_for_store()
+        if tampering_signer:
+            tamper.sign(tampering_signer, model_as_doc_for_store, json_codec)
+
+        # remember what was written so the model's original doc can
+        # be updated (documents written in batches aren't cached)
+        self._doc = model_as_doc_for_store
+
+        batch = AsyncBulkPersister._batch
+        if batch is None:
+            batch = _BulkDocsBatch(type(self).max_batch_delay_in_ms)
+            AsyncBulkPersister._batch = batch
+
+        batch.add(self, model_as_doc_for_store)
+
+        if type(self).max_batch_size <= len(batch):
+            batch.write()
+
+
+class _BulkDocsBatch(object):
+    """A batch of ```AsyncBulkPersister``` instances and the documents
+    they want written to CouchDB.
+    """
+
+    def __init__(self, max_batch_delay_in_ms):
+        object.__init__(self)
+
+        self._persisters = []
+        self._docs = []
+
+        self._timeout = tornado.ioloop.IOLoop.current().add_timeout(
+            datetime.timedelta(0, max_batch_delay_in_ms / 1000.0, 0),
+            self.write)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, persister, doc):
+        self._persisters.append(persister)
+        self._docs.append(doc)
+
+    def write(self):
+        if AsyncBulkPersister._batch is self:
+            AsyncBulkPersister._batch = None
+
+        if self._timeout is None:
+            # batch has already been written
+            return
+        tornado.ioloop.IOLoop.current().remove_timeout(self._timeout)
+        self._timeout = None
+
+        body = {
+            "docs": self._docs,
+        }
+        # the batch's deadline is the latest of its persisters' deadlines
+        deadlines = [persister.deadline for persister in self._persisters]
+        deadline = None if None in deadlines else max(deadlines)
+        request = CouchDBAsyncHTTPRequest("_bulk_docs", "POST", body, sign_body_as_dict=False, deadline=deadline)
+
+        cac = CouchDBAsyncHTTPClient(httplib.CREATED, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        #
+        # _bulk_docs responds with a list containing one result per
+        # document in the same order as the documents in the request.
+        # results look something like
+        #
+        #   {"ok": true, "id": "...", "rev": "..."}
+        #   {"id": "...", "error": "conflict", "reason": "Document update conflict."}
+        #
+        results = response_body if is_ok and isinstance(response_body, list) else []
+        if is_ok and len(results) != len(self._persisters):
+            _logger.error(
+                "CouchDB responded to _bulk_docs with %d results but expected %d",
+                len(results),
+                len(self._persisters))
+
+        for i in range(0, len(self._persisters)):
+            persister = self._persisters[i]
+            result = results[i] if i < len(results) else None
+            if result is None:
+                persister._on_cac_fetch_done(False, False, None, None, None, cac)
+                continue
+
+            error = result.get("error")
+            if error is not None:
+                is_conflict = error == "conflict"
+                if not is_conflict:
+                    _logger.error(
+                        "CouchDB _bulk_docs failed to write '%s' - %s - %s",
+                        result.get("id"),
+                        error,
+                        result.get("reason"))
+                persister._on_cac_fetch_done(False, is_conflict, None, None, None, cac)
+                continue
+
+            persister._on_cac_fetch_done(True, False, None, result.get("id"), result.get("rev"), cac)
+
+
+class AsyncDeleter(AsyncAction):
+    """Async'ly delete a model object."""
+
+    def __init__(self, model, async_state=None, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.model = model
+
+        self._callback = None
+
+    def delete(self, callback):
+        assert not self._callback
+        self._callback = callback
+
+        if not self.model._id or not self.model._rev:
+            self._call_callback(False, False)
+            return
+
+        path = "%s?rev=%s" % (self.model._id, self.model._rev)
+        request = CouchDBAsyncHTTPRequest(path, "DELETE", None, deadline=self.deadline)
+
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, models, _id, _rev, cac):
+        self._record_unsent_request(cac)
+
+        if document_cache is not None:
+            # regardless of the outcome whatever is in the cache
+            # is no longer trustworthy
+            document_cache.remove(self.model._id)
+
+        self._call_callback(is_ok, is_conflict)
+
+    def _call_callback(self, is_ok, is_conflict):
+        assert self._callback is not None
+        assert (is_ok and not is_conflict) or (not is_ok)
+        self._callback(is_ok, is_conflict, self)
+        self._callback = None
+
+
+class TamperingSignerConfiguredException(Exception):
+    """This exception is raised by ```AsyncUpdateHandlerInvoker```
+    when ```tampering_signer``` is not None. Update handlers change
+    documents inside CouchDB where the tampering signer's keys are
+    not available so the changed document can't be signed and
+    would fail verification the next time it's read.
+    """
+
+    def __init__(self):
+        msg = (
+            "update handlers can't be used with a tampering signer - "
+            "use AsyncPersister which signs the entire document"
+        )
+        Exception.__init__(self, msg)
+
+
+class AsyncUpdateHandlerInvoker(AsyncAction):
+    """Async'ly apply a partial update to a document using the CouchDB
+    update handler ```update_handler``` in the design doc ```design_doc```.
+    The mutation happens inside CouchDB in a single round trip rather than
+    the retrieve, change and persist (and on conflict start over) cycle
+    required by ```AsyncPersister```.
+
+    ```delta``` is a dictionary describing the change. ```delta``` is sent
+    as the JSON body of a PUT to
+    ```_design/<design_doc>/_update/<update_handler>/<document_id>```.
+    The update handler is expected to save the changed document, respond
+    with 201 Created and have the response body be the changed document
+    (ex ```return [doc, {"code": 201, "json": doc}]```). The changed
+    document's new revision is taken from CouchDB's X-Couch-Update-NewRev
+    response header. Update handlers can be installed alongside
+    a design doc's views - see ```installer```.
+
+    Tamper resistance - a document's signature covers the entire document
+    and the key used to create the signature is only available to the app
+    tier so documents changed by update handlers can't be signed. When
+    ```tampering_signer``` is not None ```invoke()``` raises
+    ```TamperingSignerConfiguredException``` and ```AsyncPersister```
+    should be used instead.
+    """
+
+    def __init__(self, design_doc, update_handler, document_id, delta, async_state=None, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.design_doc = design_doc
+        self.update_handler = update_handler
+        self.document_id = document_id
+        self.delta = delta
+
+        self._callback = None
+
+    def invoke(self, callback):
+        assert not self._callback
+
+        if tampering_signer:
+            raise TamperingSignerConfiguredException()
+
+        self._callback = callback
+
+        path = "_design/%s/_update/%s/%s" % (
+            self.design_doc,
+            self.update_handler,
+            self.document_id,
+        )
+        # delta isn't a document so isn't signed
+        request = CouchDBAsyncHTTPRequest(
+            path,
+            "PUT",
+            self.delta,
+            sign_body_as_dict=False,
+            deadline=self.deadline)
+
+        cac = CouchDBAsyncHTTPClient(httplib.CREATED, None)
+        cac.fetch(request, self._on_cac_fetch_done)
+
+    def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        self._record_unsent_request(cac)
+
+        if document_cache is not None:
+            # regardless of the outcome whatever is in the cache
+            # is no longer trustworthy
+            document_cache.remove(self.document_id)
+
+        if not is_ok:
+            self._call_callback(False, is_conflict)
+            return
+
+        new_rev = cac.response_headers.get("X-Couch-Update-NewRev") if cac.response_headers else None
+        if not isinstance(response_body, dict) or new_rev is None:
+            _logger.error(
+                "update handler '%s' in design doc '%s' didn't respond with the updated doc '%s'",
+                self.update_handler,
+                self.design_doc,
+                self.document_id)
+            self._call_callback(False, False)
+            return
+
+        response_body["_rev"] = new_rev
+        self._call_callback(True, False, self.create_model_from_doc(response_body))
+
+    def create_model_from_doc(self, doc):
+        """Concrete classes derived from this class must implement
+        this method which takes a dictionary (```doc```) and creates
+        a model instance.
+        """
+        raise NotImplementedError()
+
+    def _call_callback(self, is_ok, is_conflict, model=None):
+        assert self._callback is not None
+        assert (is_ok and not is_conflict) or (not is_ok)
+        self._callback(is_ok, is_conflict, model, self)
+        self._callback = None
+
+
+class AsyncCouchDBHealthCheck(AsyncAction):
+    """Async'ly confirm CouchDB can be reached. If ```endpoint```
+    is not None the check is made against ```endpoint```.
+
+    After the check, if ```circuit_breakers``` is not None,
+    ```circuit_breaker_state``` is the state of the circuit breaker
+    guarding the check's endpoint. While the circuit breaker is open
+    the check fails without a request being sent to CouchDB.
+    """
+
+    def __init__(self, async_state=None, endpoint=None, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.endpoint = endpoint
+
+        self.circuit_breaker_state = None
+
+        self._callback = None
+
+    def check(self, callback):
+        assert not self._callback
+        self._callback = callback
+
+        request = CouchDBAsyncHTTPRequest("", "GET", None, endpoint=self.endpoint, deadline=self.deadline)
+        request.priority = AdmissionQueue.PRIORITY_HEALTH_CHECK
+
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+        cac.fetch(request, self._on_cac_db_fetch_done)
+
+    def _on_cac_db_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        self._record_unsent_request(cac)
+        if cac.circuit_breaker is not None:
+            self.circuit_breaker_state = cac.circuit_breaker.state
+        self._call_callback(is_ok)
+
+    def _call_callback(self, is_ok):
+        assert self._callback is not None
+        self._callback(is_ok, self)
+        self._callback = None
+
+
+class Endpoint(object):
+    """A CouchDB database in an ```EndpointPool```. ```database```
+    is the URL of the database on one node of a CouchDB cluster.
+    """
+
+    def __init__(self, pool, database):
+        object.__init__(self)
+
+        self.pool = pool
+        self.database = database
+
+        self.ewma_latency_in_ms = None
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.is_ejected = False
+
+    @property
+    def score(self):
+        """The lower the score the more attractive the endpoint.
+        The score is an estimate of the time to service a request
+        given the endpoint's latency and number of in flight requests.
+        Endpoints without a latency estimate are the most attractive
+        so new endpoints quickly get a latency estimate.
+        """
+        return (self.ewma_latency_in_ms or 0.0) * (self.in_flight + 1)
+
+    def on_request_sent(self):
+        self.in_flight += 1
+
+    def on_response(self, http_response_code, latency_in_ms, is_deadline_timeout=False):
+        """Called when a response is received from the endpoint.
+        ```latency_in_ms``` is None if the request's latency shouldn't
+        be used to update the endpoint's latency estimate.
+        ```is_deadline_timeout``` is ```True``` if the request timed out
+        because of its own deadline - such a timeout is neither a failure
+        nor a latency sample.
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+
+        if is_deadline_timeout:
+            return
+
+        if _is_failure_response_code(http_response_code):
+            self.consecutive_failures += 1
+            if self.pool.max_consecutive_failures <= self.consecutive_failures:
+                self.pool.eject(self)
+            return
+
+        self.consecutive_failures = 0
+
+        if latency_in_ms is not None:
+            if self.ewma_latency_in_ms is None:
+                self.ewma_latency_in_ms = latency_in_ms
+            else:
+                weight = self.pool.ewma_weight
+                self.ewma_latency_in_ms = weight * latency_in_ms + (1 - weight) * self.ewma_latency_in_ms
+
+
+class EndpointPool(object):
+    """A pool of endpoints representing the same CouchDB database on
+    different nodes of a CouchDB cluster. ```databases``` is a list
+    of database URLs.
+
+    ```select()``` picks the endpoint with the lowest estimated time to
+    service a request based on an exponentially weighted moving average
+    (EWMA) of each endpoint's observed latency and the number of requests
+    in flight to each endpoint.
+
+    An endpoint which fails ```max_consecutive_failures``` requests in a row
+    (connection errors, timeouts and 5xx responses) is ejected from the pool.
+    Every ```probe_interval_in_ms``` an ```AsyncCouchDBHealthCheck``` is made
+    against each ejected endpoint and the endpoint is readmitted to the pool
+    when the health check succeeds. If all endpoints have been ejected
+    ```select()``` picks from all endpoints rather than failing.
+    """
+
+    def __init__(self,
+                 databases,
+                 ewma_weight=0.3,
+                 max_consecutive_failures=3,
+                 probe_interval_in_ms=5000):
+        object.__init__(self)
+
+        assert databases
+
+        self.ewma_weight = ewma_weight
+        self.max_consecutive_failures = max_consecutive_failures
+        self.probe_interval_in_ms = probe_interval_in_ms
+
+        self.endpoints = [Endpoint(self, database) for database in databases]
+
+    def select(self, exclude=None):
+        """Returns the most attractive endpoint. If not None, ```exclude```
+        is an endpoint which mustn't be selected in which case ```None```
+        is returned if the pool has no other endpoints.
+        """
+        candidates = [endpoint for endpoint in self.endpoints if endpoint is not exclude]
+        if not candidates:
+            return None
+        endpoints = [endpoint for endpoint in candidates if not endpoint.is_ejected]
+        if not endpoints:
+            endpoints = candidates
+        return min(endpoints, key=lambda endpoint: (endpoint.score, endpoint.in_flight))
+
+    def eject(self, endpoint):
+        if endpoint.is_ejected:
+            return
+
+        _logger.error(
+            "Ejecting CouchDB endpoint '%s' after %d consecutive failures",
+            endpoint.database,
+            endpoint.consecutive_failures)
+
+        endpoint.is_ejected = True
+        self._schedule_probe(endpoint)
+
+    def readmit(self, endpoint):
+        _logger.info("Readmitting CouchDB endpoint '%s'", endpoint.database)
+
+        endpoint.is_ejected = False
+        endpoint.consecutive_failures = 0
+
+        # without a latency estimate the readmitted endpoint's score would
+        # be 0 and it would get every request until its first response
+        # arrived so start from the average of the other endpoints' estimates
+        ewma_latencies_in_ms = [
+            other_endpoint.ewma_latency_in_ms for other_endpoint in self.endpoints
+            if other_endpoint is not endpoint and
+            not other_endpoint.is_ejected and
+            other_endpoint.ewma_latency_in_ms is not None
+        ]
+        if ewma_latencies_in_ms:
+            endpoint.ewma_latency_in_ms = sum(ewma_latencies_in_ms) / len(ewma_latencies_in_ms)
+        else:
+            endpoint.ewma_latency_in_ms = None
+
+    def _schedule_probe(self, endpoint):
+        tornado.ioloop.IOLoop.current().add_timeout(
+            datetime.timedelta(milliseconds=self.probe_interval_in_ms),
+            functools.partial(self._probe, endpoint))
+
+    def _probe(self, endpoint):
+        health_check = AsyncCouchDBHealthCheck(endpoint=endpoint)
+        health_check.check(functools.partial(self._on_probe_done, endpoint))
+
+    def _on_probe_done(self, endpoint, is_ok, health_check):
+        if is_ok:
+            self.readmit(endpoint)
+        else:
+            self._schedule_probe(endpoint)
+
+
+class AdmissionQueue(object):
+    """```AdmissionQueue``` bounds the number of requests in flight
+    to CouchDB at ```max_in_flight```. Requests beyond the bound wait in
+    a priority queue - health checks are sent before writes, writes before
+    reads and reads before bulk reads (views). Requests of the same priority
+    are sent in the order they were queued.
+
+    If ```max_wait_in_ms``` is not None requests are shed rather than
+    sent when they would wait more than ```max_wait_in_ms``` to be sent.
+    Requests with a deadline are also shed rather than sent when they
+    would wait past their deadline.
+    A request is shed as soon as it's queued if the expected wait (based on
+    the number of requests ahead of it and an EWMA of the time to service a
+    request) exceeds ```max_wait_in_ms```. A request is also shed if by the
+    time it reaches the front of the queue it has waited more than
+    ```max_wait_in_ms```. A queued request with a deadline is shed as soon
+    as its deadline passes rather than waiting for a slot to be released.
+    When a request is shed ```CouchDBAsyncHTTPClient```
+    sets ```is_shed``` to ```True``` and calls back with ```is_ok``` =
+    ```False``` without sending the request - the async action which made
+    the request also sets its ```is_shed``` to ```True```.
+
+    The following metrics are maintained:
+
+        -- ```queue_depth``` = number of requests waiting to be sent
+        -- ```in_flight``` = number of requests sent and awaiting a response
+        -- ```number_admitted``` = number of requests sent
+        -- ```number_shed``` = number of requests shed
+        -- ```total_wait_in_ms``` = total time admitted requests spent queued
+        -- ```max_observed_wait_in_ms``` = longest time an admitted
+           request spent queued
+    """
+
+    PRIORITY_HEALTH_CHECK = 0
+    PRIORITY_WRITE = 1
+    PRIORITY_READ = 2
+    PRIORITY_BULK_READ = 3
+
+    def __init__(self, max_in_flight=64, max_wait_in_ms=None, ewma_weight=0.3):
+        object.__init__(self)
+
+        self.max_in_flight = max_in_flight
+        self.max_wait_in_ms = max_wait_in_ms
+        self.ewma_weight = ewma_weight
+
+        self.in_flight = 0
+        self.number_admitted = 0
+        self.number_shed = 0
+        self.total_wait_in_ms = 0.0
+        self.max_observed_wait_in_ms = 0.0
+        self.ewma_service_time_in_ms = None
+
+        # heap of [priority, sequence, queued_at, deadline, on_admitted, on_shed, timeout]
+        # entries - sequence keeps requests of the same priority in FIFO order.
+        # when a queued request's deadline passes the request is shed and its
+        # entry is cancelled (on_admitted is set to None) rather than removed
+        # from the heap
+        self._queue = []
+        self._number_cancelled = 0
+        self._sequence = itertools.count()
+
+    @property
+    def queue_depth(self):
+        return len(self._queue) - self._number_cancelled
+
+    @property
+    def average_wait_in_ms(self):
+        if not self.number_admitted:
+            return 0.0
+        return self.total_wait_in_ms / self.number_admitted
+
+    def admit(self, priority, on_admitted, on_shed, deadline=None):
+        """Call ```on_admitted``` when the request can be sent or
+        ```on_shed``` if the request should not be sent. If not None,
+        ```deadline``` is the time (as returned by ```time.time()```)
+        after which the request should not be sent.
+        """
+        if self.in_flight < self.max_in_flight and not self.queue_depth:
+            self._admit(0.0, on_admitted)
+            return
+
+        now = time.time()
+        max_wait_in_ms = self._max_wait_in_ms(now, deadline)
+        if max_wait_in_ms is not None and max_wait_in_ms < self._expected_wait_in_ms(priority):
+            self.number_shed += 1
+            on_shed()
+            return
+
+        entry = [priority, next(self._sequence), now, deadline, on_admitted, on_shed, None]
+        if deadline is not None:
+            entry[6] = tornado.ioloop.IOLoop.current().add_timeout(
+                datetime.timedelta(seconds=max(0.0, deadline - now)),
+                functools.partial(self._on_deadline, entry))
+        heapq.heappush(self._queue, entry)
+
+    def try_admit(self):
+        """Admit a request only if it can be sent immediately. Returns
+        ```True``` if the request was admitted. Used for optional requests
+        (ex hedges) which aren't worth queueing.
+        """
+        if self.max_in_flight <= self.in_flight or self.queue_depth:
+            return False
+        self._admit(0.0, lambda: None)
+        return True
+
+    def release(self, service_time_in_ms=None):
+        """Called when a response is received to a request that was
+        admitted. ```service_time_in_ms``` is how long the request took
+        or ```None``` if the admitted request wasn't sent.
+        """
+        self.in_flight = max(0, self.in_flight - 1)
+
+        if service_time_in_ms is not None:
+            if self.ewma_service_time_in_ms is None:
+                self.ewma_service_time_in_ms = service_time_in_ms
+            else:
+                weight = self.ewma_weight
+                self.ewma_service_time_in_ms = \
+                    weight * service_time_in_ms + (1 - weight) * self.ewma_service_time_in_ms
+
+        now = time.time()
+        while self._queue and self.in_flight < self.max_in_flight:
+            (_, _, queued_at, deadline, on_admitted, on_shed, timeout) = heapq.heappop(self._queue)
+            if on_admitted is None:
+                self._number_cancelled -= 1
+                continue
+            if timeout is not None:
+                tornado.ioloop.IOLoop.current().remove_timeout(timeout)
+            wait_in_ms = (now - queued_at) * 1000
+            is_expired = deadline is not None and deadline <= now
+            if is_expired or (self.max_wait_in_ms is not None and self.max_wait_in_ms < wait_in_ms):
+                self.number_shed += 1
+                on_shed()
+            else:
+                self._admit(wait_in_ms, on_admitted)
+
+    def _on_deadline(self, entry):
+        if entry[4] is None:
+            return
+
+        on_shed = entry[5]
+        entry[4] = None
+        entry[5] = None
+        self._number_cancelled += 1
+        if not self.queue_depth:
+            # only cancelled entries are left
+            self._queue = []
+            self._number_cancelled = 0
+
+        self.number_shed += 1
+        on_shed()
+
+    def _admit(self, wait_in_ms, on_admitted):
+        self.in_flight += 1
+        self.number_admitted += 1
+        self.total_wait_in_ms += wait_in_ms
+        self.max_observed_wait_in_ms = max(self.max_observed_wait_in_ms, wait_in_ms)
+        on_admitted()
+
+    def _max_wait_in_ms(self, now, deadline):
+        if deadline is None:
+            return self.max_wait_in_ms
+        time_to_deadline_in_ms = (deadline - now) * 1000
+        if self.max_wait_in_ms is None:
+            return time_to_deadline_in_ms
+        return min(self.max_wait_in_ms, time_to_deadline_in_ms)
+
+    def _expected_wait_in_ms(self, priority):
+        if self.ewma_service_time_in_ms is None:
+            return 0.0
+        number_ahead = len([
+            entry for entry in self._queue
+            if entry[0] <= priority and entry[4] is not None
+        ])
+        return (number_ahead + 1) * self.ewma_service_time_in_ms / self.max_in_flight
+
+
+class ReadHedger(object):
+    """```ReadHedger``` decides when ```CouchDBAsyncHTTPClient``` should
+    hedge a GET - if the response to a GET hasn't arrived within
+    ```hedge_delay_in_ms()``` an identical GET is sent and whichever
+    response arrives first is used. Tornado can't cancel the slower
+    request so its response is discarded when it arrives.
+
+    The hedge delay is the ```percentile``` of the most recent
+    ```max_number_samples``` GET latencies. No GETs are hedged until
+    ```min_number_samples``` latencies have been observed. Sorting the
+    latencies on every GET would cost too much CPU on the IOLoop so
+    the hedge delay is only recalculated after every
+    ```recalculation_interval``` responses. A hedge only
+    wins if its response isn't a failure (connection error, timeout
+    or 5xx) - otherwise the original GET's response is used.
+
+    Hedges are subject to ```circuit_breakers``` and count towards
+    ```admission_queue```'s ```max_in_flight``` but never wait in
+    ```admission_queue``` - a hedge which can't be sent immediately
+    isn't sent. If the original GET was sent to an endpoint in an
+    ```EndpointPool``` the hedge is sent to a different endpoint.
+
+    Hedges are rate limited by a token bucket - each GET adds
+    ```max_hedge_ratio``` tokens to the bucket (up to ```max_hedge_tokens```)
+    and each hedge spends one token. At most ```max_hedge_ratio``` of GETs
+    are therefore hedged which bounds the extra load hedging puts on
+    CouchDB even when CouchDB is slow.
+
+    The following metrics are maintained:
+
+        -- ```number_requests``` = number of GETs which could have been hedged
+        -- ```number_hedges``` = number of hedged GETs sent
+        -- ```number_hedge_wins``` = number of hedged GETs whose response
+           arrived before the original GET's response
+    """
 
-    def _call_callback(self, is_ok, is_conflict):
-        assert self._callback is not None
-        assert (is_ok and not is_conflict) or (not is_ok)
-        self._callback(is_ok, is_conflict, self)
-        self._callback = None
+    def __init__(self,
+                 max_hedge_ratio=0.05,
+                 percentile=95,
+                 min_number_samples=100,
+                 max_number_samples=1000,
+                 max_hedge_tokens=10,
+                 recalculation_interval=100):
+        object.__init__(self)
 
+        self.max_hedge_ratio = max_hedge_ratio
+        self.percentile = percentile
+        self.min_number_samples = min_number_samples
+        self.max_hedge_tokens = max_hedge_tokens
+        self.recalculation_interval = recalculation_interval
+
+        self.number_requests = 0
+        self.number_hedges = 0
+        self.number_hedge_wins = 0
+
+        self._latencies_in_ms = collections.deque(maxlen=max_number_samples)
+        self._hedge_delay_in_ms = None
+        self._number_responses_since_recalculation = 0
+        self._hedge_tokens = 0.0
+
+    def on_request(self):
+        """Called when a GET which could be hedged is sent."""
+        self.number_requests += 1
+        self._hedge_tokens = min(self.max_hedge_tokens, self._hedge_tokens + self.max_hedge_ratio)
+
+    def on_response(self, latency_in_ms):
+        """Called when the response to a GET which could have been
+        hedged is received.
+        """
+        self._latencies_in_ms.append(latency_in_ms)
+        self._number_responses_since_recalculation += 1
 
-class AsyncDeleter(AsyncAction):
-    """Async'ly delete a model object."""
+    def hedge_delay_in_ms(self):
+        """Returns the number of ms to wait for a response before
+        hedging a GET or None if GETs shouldn't be hedged yet.
+        """
+        if len(self._latencies_in_ms) < self.min_number_samples:
+            return None
+
+        if self._hedge_delay_in_ms is None or \
+           self.recalculation_interval <= self._number_responses_since_recalculation:
+            latencies_in_ms = sorted(self._latencies_in_ms)
+            index = int(len(latencies_in_ms) * self.percentile / 100.0)
+            self._hedge_delay_in_ms = latencies_in_ms[min(index, len(latencies_in_ms) - 1)]
+            self._number_responses_since_recalculation = 0
+
+        return self._hedge_delay_in_ms
+
+    def acquire_hedge(self):
+        """Returns ```True``` if a hedged GET can be sent."""
+        if self._hedge_tokens < 1:
+            return False
+        self._hedge_tokens -= 1
+        self.number_hedges += 1
+        return True
+
+
+class CircuitBreaker(object):
+    """A circuit breaker guarding requests to a CouchDB endpoint
+    (or a design doc on an endpoint). Circuit breakers are created
+    by ```CircuitBreakers```.
+
+    A circuit breaker starts ```STATE_CLOSED``` and all requests are sent.
+    When at least ```failure_rate_threshold``` of the last ```window_size```
+    responses (and at least ```min_number_responses``` responses)
+    were connection errors, timeouts or 5xx responses the circuit
+    breaker opens. While ```STATE_OPEN``` no requests are sent.
+    After ```open_duration_in_ms``` the circuit breaker is
+    ```STATE_HALF_OPEN``` and up to ```max_half_open_requests``` trial
+    requests are sent - if a trial request succeeds the circuit breaker
+    closes and if a trial request fails the circuit breaker re-opens.
+    A request is a trial request if the circuit breaker is
+    ```STATE_HALF_OPEN``` when ```allow_request()``` allows it and its
+    response must be reported with ```is_trial``` = ```True``` - only
+    trial requests' responses decide a half-open circuit breaker's fate
+    so late responses to requests sent before the circuit breaker opened
+    are ignored.
+
+    State transitions are logged and, if not None, reported by calling
+    ```on_state_change(circuit_breaker, old_state, new_state)```.
+    ```number_rejected``` is the number of requests which were not sent
+    because the circuit breaker was open.
+    """
 
-    def __init__(self, model, async_state=None):
-        AsyncAction.__init__(self, async_state)
+    STATE_CLOSED = "closed"
+    STATE_OPEN = "open"
+    STATE_HALF_OPEN = "half-open"
 
-        self.model = model
+    def __init__(self,
+                 name,
+                 failure_rate_threshold=0.5,
+                 min_number_responses=20,
+                 window_size=100,
+                 open_duration_in_ms=5000,
+                 max_half_open_requests=1,
+                 on_state_change=None):
+        object.__init__(self)
 
-        self._callback = None
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_number_responses = min_number_responses
+        self.open_duration_in_ms = open_duration_in_ms
+        self.max_half_open_requests = max_half_open_requests
+        self.on_state_change = on_state_change
 
-    def delete(self, callback):
-        assert not self._callback
-        self._callback = callback
+        self.state = type(self).STATE_CLOSED
+        self.number_rejected = 0
 
-        if not self.model._id or not self.model._rev:
-            self._call_callback(False, False)
+        # window of the most recent responses - True = failure
+        self._responses = collections.deque(maxlen=window_size)
+        self._number_failures = 0
+        self._opened_at = None
+        self._half_open_in_flight = 0
+
+    @property
+    def failure_rate(self):
+        if not self._responses:
+            return 0.0
+        return float(self._number_failures) / len(self._responses)
+
+    def allow_request(self):
+        """Returns ```True``` if a request can be sent."""
+        cls = type(self)
+
+        if self.state == cls.STATE_OPEN:
+            if time.time() < self._opened_at + self.open_duration_in_ms / 1000.0:
+                self.number_rejected += 1
+                return False
+            self._change_state(cls.STATE_HALF_OPEN)
+
+        if self.state == cls.STATE_HALF_OPEN:
+            if self.max_half_open_requests <= self._half_open_in_flight:
+                self.number_rejected += 1
+                return False
+            self._half_open_in_flight += 1
+
+        return True
+
+    def on_abandoned(self, is_trial=False):
+        """Called when a request which was allowed isn't sent or
+        its response says nothing about the health of CouchDB.
+        """
+        if is_trial and self.state == type(self).STATE_HALF_OPEN:
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+
+    def on_response(self, is_failure, is_trial=False):
+        """Called when a response is received to a request which was allowed."""
+        cls = type(self)
+
+        if self.state == cls.STATE_HALF_OPEN:
+            if not is_trial:
+                # response to a request sent before the circuit breaker opened
+                return
+            self._half_open_in_flight = max(0, self._half_open_in_flight - 1)
+            self._change_state(cls.STATE_OPEN if is_failure else cls.STATE_CLOSED)
             return
 
-        path = "%s?rev=%s" % (self.model._id, self.model._rev)
-        request = CouchDBAsyncHTTPRequest(path, "DELETE", None)
+        if is_trial:
+            # another trial request has already decided the
+            # half-open circuit breaker's fate
+            return
 
-        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
-        cac.fetch(request, self._on_cac_fetch_done)
+        if self.state == cls.STATE_OPEN:
+            # response to a request sent before the circuit breaker opened
+            return
 
-    def _on_cac_fetch_done(self, is_ok, is_conflict, models, _id, _rev, cac):
-        self._call_callback(is_ok, is_conflict)
+        if len(self._responses) == self._responses.maxlen and self._responses[0]:
+            self._number_failures -= 1
+        self._responses.append(is_failure)
+        if is_failure:
+            self._number_failures += 1
 
-    def _call_callback(self, is_ok, is_conflict):
-        assert self._callback is not None
-        assert (is_ok and not is_conflict) or (not is_ok)
-        self._callback(is_ok, is_conflict, self)
-        self._callback = None
+        if self.min_number_responses <= len(self._responses) and \
+           self.failure_rate_threshold <= self.failure_rate:
+            self._change_state(cls.STATE_OPEN)
+
+    def _change_state(self, new_state):
+        cls = type(self)
 
+        old_state = self.state
+        self.state = new_state
 
-class AsyncCouchDBHealthCheck(AsyncAction):
-    """Async'ly confirm CouchDB can be reached."""
+        if new_state == cls.STATE_HALF_OPEN:
+            self._half_open_in_flight = 0
+
+        if new_state == cls.STATE_OPEN:
+            self._opened_at = time.time()
+            _logger.error(
+                "Circuit breaker '%s' changed from %s to %s - failure rate = %.2f",
+                self.name,
+                old_state,
+                new_state,
+                self.failure_rate)
+        else:
+            if new_state == cls.STATE_CLOSED:
+                self._responses.clear()
+                self._number_failures = 0
+            _logger.info("Circuit breaker '%s' changed from %s to %s", self.name, old_state, new_state)
+
+        if self.on_state_change is not None:
+            self.on_state_change(self, old_state, new_state)
+
+
+class CircuitBreakers(object):
+    """```CircuitBreakers``` creates and keeps track of the
+    ```CircuitBreaker``` guarding each CouchDB endpoint. If
+    ```per_design_doc``` is ```True``` requests against a design doc
+    (ex a view) are guarded by a separate circuit breaker for each
+    design doc so one failing view doesn't stop all requests
+    to the endpoint. ```circuit_breaker_args``` are passed
+    to each ```CircuitBreaker```'s ctr.
+    """
+
+    _design_doc_reg_ex = re.compile(r"^/_design/(?P<design_doc>[^/?]+)")
+
+    def __init__(self, per_design_doc=False, **circuit_breaker_args):
+        object.__init__(self)
+
+        self.per_design_doc = per_design_doc
+        self.circuit_breaker_args = circuit_breaker_args
+
+        # name -> CircuitBreaker
+        self.circuit_breakers = {}
+
+    def circuit_breaker_for(self, request):
+        endpoint_database = request.endpoint.database if request.endpoint is not None else database
+
+        name = endpoint_database
+        if self.per_design_doc:
+            match = type(self)._design_doc_reg_ex.match(request.url[len(endpoint_database):])
+            if match:
+                name = "%s/_design/%s" % (endpoint_database, match.group("design_doc"))
+
+        circuit_breaker = self.circuit_breakers.get(name)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker(name, **self.circuit_breaker_args)
+            self.circuit_breakers[name] = circuit_breaker
+        return circuit_breaker
 
-    def __init__(self, async_state=None):
+
+class AsyncChangesFollower(AsyncAction):
+    """Async'ly follow the database's ```_changes``` feed and publish
+    each change to registered listeners. The primary use case is keeping
+    in-process caches (ex ```document_cache```) fresh in deployments
+    where many processes write to the same database.
+
+    The feed is consumed using ```feed=longpoll``` - each poll is an
+    ordinary request to CouchDB which returns as soon as there are
+    changes or ```longpoll_timeout_in_ms``` elapses. On failure the
+    follower reconnects after a delay which doubles with each consecutive
+    failure (capped at ```max_reconnect_delay_in_ms```).
+
+    If ```checkpoint_filename``` is not ```None``` the ```since```
+    sequence number is persisted to ```checkpoint_filename``` after each
+    batch of changes is published and is read from ```checkpoint_filename```
+    when the follower starts.
+
+    Listeners are callables with the signature
+
+        listener(doc_id, rev, is_deleted)
+
+    See http://docs.couchdb.org/en/latest/api/database/changes.html
+    for details on the ```_changes``` feed.
+    """
+
+    longpoll_timeout_in_ms = 10 * 1000
+
+    min_reconnect_delay_in_ms = 100
+
+    max_reconnect_delay_in_ms = 30 * 1000
+
+    def __init__(self, since="now", checkpoint_filename=None, async_state=None):
         AsyncAction.__init__(self, async_state)
 
-        self._callback = None
+        self.since = since
+        self.checkpoint_filename = checkpoint_filename
 
-    def check(self, callback):
-        assert not self._callback
-        self._callback = callback
+        self.is_running = False
 
-        request = CouchDBAsyncHTTPRequest("", "GET", None)
+        self._listeners = []
+        self._reconnect_delay_in_ms = None
+        self._reconnect_timeout = None
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self._listeners.remove(listener)
+
+    def start(self):
+        assert not self.is_running
+        self.is_running = True
+
+        if self.checkpoint_filename and os.path.exists(self.checkpoint_filename):
+            with open(self.checkpoint_filename, "r") as fd:
+                self.since = json.load(fd)
+
+        self._poll()
+
+    def stop(self):
+        """Stop following the feed. Note that a poll which is in
+        flight when ```stop()``` is called isn't cancelled but
+        changes it returns are not published.
+        """
+        self.is_running = False
+
+        if self._reconnect_timeout is not None:
+            tornado.ioloop.IOLoop.current().remove_timeout(self._reconnect_timeout)
+            self._reconnect_timeout = None
+
+    def _poll(self):
+        self._reconnect_timeout = None
+
+        if not self.is_running:
+            return
+
+        cls = type(self)
+        query_string_key_value_pairs = {
+            "feed": "longpoll",
+            "since": self.since,
+            "timeout": cls.longpoll_timeout_in_ms,
+        }
+        path = "_changes?%s" % urllib.urlencode(query_string_key_value_pairs)
+        request = CouchDBAsyncHTTPRequest(path, "GET", None)
+        # give CouchDB plenty of time to respond to the longpoll
+        request.request_timeout = 2 * cls.longpoll_timeout_in_ms / 1000.0
+        request.track_latency = False
+        # long polls would hog admission_queue's slots
+        request.priority = None
 
         cac = CouchDBAsyncHTTPClient(httplib.OK, None)
-        cac.fetch(request, self._on_cac_db_fetch_done)
+        cac.fetch(request, self._on_cac_fetch_done)
 
-    def _on_cac_db_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
-        self._call_callback(is_ok)
+    def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
+        if not self.is_running:
+            return
 
-    def _call_callback(self, is_ok):
-        assert self._callback is not None
-        self._callback(is_ok, self)
-        self._callback = None
+        if not is_ok:
+            self._reconnect()
+            return
+
+        self._reconnect_delay_in_ms = None
+
+        #
+        # response body will look something like
+        #
+        #   {
+        #       "results": [
+        #           {"seq": 12, "id": "...", "changes": [{"rev": "2-..."}], "deleted": true},
+        #       ],
+        #       "last_seq": 12
+        #   }
+        #
+        for result in response_body.get("results", []):
+            doc_id = result.get("id")
+            changes = result.get("changes")
+            rev = changes[0].get("rev") if changes else None
+            is_deleted = result.get("deleted", False)
+            for listener in list(self._listeners):
+                try:
+                    listener(doc_id, rev, is_deleted)
+                except Exception:
+                    _logger.exception("_changes listener failed on doc '%s'", doc_id)
+
+        last_seq = response_body.get("last_seq")
+        if last_seq is not None and last_seq != self.since:
+            self.since = last_seq
+            self._write_checkpoint()
+
+        self._poll()
+
+    def _reconnect(self):
+        cls = type(self)
+        if self._reconnect_delay_in_ms is None:
+            self._reconnect_delay_in_ms = cls.min_reconnect_delay_in_ms
+        else:
+            self._reconnect_delay_in_ms = min(
+                2 * self._reconnect_delay_in_ms,
+                cls.max_reconnect_delay_in_ms)
+
+        _logger.error(
+            "error following _changes - reconnecting in %d ms",
+            self._reconnect_delay_in_ms)
+
+        self._reconnect_timeout = tornado.ioloop.IOLoop.current().add_timeout(
+            datetime.timedelta(0, self._reconnect_delay_in_ms / 1000.0, 0),
+            self._poll)
+
+    def _write_checkpoint(self):
+        if not self.checkpoint_filename:
+            return
+
+        try:
+            with open(self.checkpoint_filename, "w") as fd:
+                json.dump(self.since, fd)
+        except (IOError, OSError):
+            _logger.exception(
+                "error writing _changes checkpoint to '%s'",
+                self.checkpoint_filename)
 
 
 class ViewMetrics(object):
@@ -655,7 +3227,7 @@ class DatabaseMetrics(object):
     this class are created by ```AsyncDatabaseMetricsRetriever```.
     """
 
-    def __init__(self, database, doc_count, data_size, disk_size, view_metrics):
+    def __init__(self, database, doc_count, data_size, disk_size, view_metrics, failed_design_docs=None):
         object.__init__(self)
 
         self.database = database
@@ -663,6 +3235,8 @@ class DatabaseMetrics(object):
         self.data_size = data_size
         self.disk_size = disk_size
         self.view_metrics = view_metrics
+        # design docs whose view metrics couldn't be retrieved
+        self.failed_design_docs = failed_design_docs or []
 
     @property
     def fragmentation(self):
@@ -671,7 +3245,10 @@ class DatabaseMetrics(object):
 
 
 class AsyncDatabaseMetricsRetriever(AsyncAction):
-    """Async'ly retrieve metrics for the CouchDB database."""
+    """Async'ly retrieve metrics for the CouchDB database.
+    ```max_view_concurrency``` and ```partial_view_results```
+    are passed to ```AsyncAllViewMetricsRetriever```.
+    """
 
     # FDD = Fetch Failure Details
     FFD_OK = 0x0000
@@ -679,8 +3256,11 @@ class AsyncDatabaseMetricsRetriever(AsyncAction):
     FFD_ERROR_TALKING_TO_COUCHDB = FFD_ERROR | 0x0001
     FFD_ERROR_GETTING_VIEW_METRICS = FFD_ERROR | 0x0002
 
-    def __init__(self, async_state=None):
-        AsyncAction.__init__(self, async_state)
+    def __init__(self, async_state=None, deadline=None, max_view_concurrency=None, partial_view_results=False):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        self.max_view_concurrency = max_view_concurrency
+        self.partial_view_results = partial_view_results
 
         self.fetch_failure_detail = None
 
@@ -690,13 +3270,17 @@ class AsyncDatabaseMetricsRetriever(AsyncAction):
         assert not self._callback
         self._callback = callback
 
-        request = CouchDBAsyncHTTPRequest("", "GET", None)
+        # 3 sequential requests - this one, AsyncAllViewMetricsRetriever's
+        # request for design docs and then its concurrent requests for
+        # each view's metrics
+        request = CouchDBAsyncHTTPRequest("", "GET", None, deadline=_split_deadline(self.deadline, 3))
 
         cac = CouchDBAsyncHTTPClient(httplib.OK, None)
         cac.fetch(request, self._on_cac_db_fetch_done)
 
     def _on_cac_db_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, acdba):
         assert is_conflict is False
+        self._record_unsent_request(acdba)
         if not is_ok:
             self._call_callback(type(self).FFD_ERROR_TALKING_TO_COUCHDB)
             return
@@ -706,10 +3290,15 @@ class AsyncDatabaseMetricsRetriever(AsyncAction):
             response_body.get("data_size"),
             response_body.get("disk_size"),
         )
-        aaddmr = AsyncAllViewMetricsRetriever(async_state)
+        aaddmr = AsyncAllViewMetricsRetriever(
+            async_state,
+            self.deadline,
+            max_concurrency=self.max_view_concurrency,
+            partial_results=self.partial_view_results)
         aaddmr.fetch(self._on_aaddmr_fetch_done)
 
     def _on_aaddmr_fetch_done(self, is_ok, view_metrics, aaddmr):
+        self._record_unsent_request(aaddmr)
         if not is_ok:
             self._call_callback(type(self).FFD_ERROR_GETTING_VIEW_METRICS)
             return
@@ -720,7 +3309,8 @@ class AsyncDatabaseMetricsRetriever(AsyncAction):
             doc_count,
             data_size,
             disk_size,
-            view_metrics)
+            view_metrics,
+            aaddmr.failed_design_docs)
         self._call_callback(type(self).FFD_OK, database_metrics)
 
     def _call_callback(self, fetch_failure_detail, database_metrics=None):
@@ -735,8 +3325,141 @@ class AsyncDatabaseMetricsRetriever(AsyncAction):
         self._callback = None
 
 
+class CachedDatabaseMetricsProvider(object):
+    """Retrieving database metrics with ```AsyncDatabaseMetricsRetriever```
+    requires a request for each design doc so retrieving them on every
+    request to a service's ```/_metrics``` endpoint can put measurable
+    load on CouchDB. ```CachedDatabaseMetricsProvider``` retrieves
+    database metrics every ```refresh_interval_in_ms``` on a
+    ```tornado.ioloop.PeriodicCallback``` and ```fetch()``` serves
+    the most recent snapshot without making any requests to CouchDB.
+
+    A snapshot is retained until a refresh succeeds so after a failed
+    refresh ```snapshot_age_in_ms``` reports how stale the snapshot is.
+    Only one refresh is ever in progress - callers who arrive during a
+    refresh share its result. ```max_view_concurrency``` and
+    ```partial_view_results``` are passed to ```AsyncDatabaseMetricsRetriever```.
+    """
+
+    def __init__(self,
+                 refresh_interval_in_ms=60 * 1000,
+                 refresh_timeout_in_ms=None,
+                 max_view_concurrency=None,
+                 partial_view_results=False):
+        object.__init__(self)
+
+        self.refresh_interval_in_ms = refresh_interval_in_ms
+        self.refresh_timeout_in_ms = refresh_timeout_in_ms
+        self.max_view_concurrency = max_view_concurrency
+        self.partial_view_results = partial_view_results
+
+        self.database_metrics = None
+        self.refreshed_at = None
+
+        self.number_refreshes = 0
+        self.number_refresh_failures = 0
+
+        # None when no refresh is in progress otherwise the callbacks
+        # waiting for the refresh in progress
+        self._refresh_callbacks = None
+
+        self._periodic_callback = None
+
+    @property
+    def snapshot_age_in_ms(self):
+        """Milliseconds since the current snapshot was retrieved
+        or ```None``` if no snapshot has been retrieved.
+        """
+        if self.refreshed_at is None:
+            return None
+        return max(0, (time.time() - self.refreshed_at) * 1000)
+
+    @property
+    def is_refreshing(self):
+        return self._refresh_callbacks is not None
+
+    def start(self):
+        """Retrieve a snapshot now and every ```refresh_interval_in_ms```
+        after that. Must be called on the IOLoop's thread.
+        """
+        assert self._periodic_callback is None
+        self._periodic_callback = tornado.ioloop.PeriodicCallback(
+            self.refresh,
+            self.refresh_interval_in_ms)
+        self._periodic_callback.start()
+        self.refresh()
+
+    def stop(self):
+        if self._periodic_callback is not None:
+            self._periodic_callback.stop()
+            self._periodic_callback = None
+
+    def fetch(self, callback):
+        """Calls ```callback``` with ```(is_ok, database_metrics, provider)```.
+        If a snapshot is available ```callback``` is called immediately
+        otherwise ```callback``` is called when the refresh in progress
+        (started if necessary) completes.
+        """
+        if self.database_metrics is not None:
+            callback(True, self.database_metrics, self)
+            return
+
+        self.refresh(callback)
+
+    def refresh(self, callback=None):
+        """Retrieve a new snapshot. If a refresh is already in
+        progress ```callback``` waits for that refresh instead.
+        """
+        if self._refresh_callbacks is not None:
+            if callback:
+                self._refresh_callbacks.append(callback)
+            return
+
+        self._refresh_callbacks = [callback] if callback else []
+        self.number_refreshes += 1
+
+        deadline = None
+        if self.refresh_timeout_in_ms is not None:
+            deadline = time.time() + self.refresh_timeout_in_ms / 1000.0
+
+        adbmr = AsyncDatabaseMetricsRetriever(
+            deadline=deadline,
+            max_view_concurrency=self.max_view_concurrency,
+            partial_view_results=self.partial_view_results)
+        adbmr.fetch(self._on_adbmr_fetch_done)
+
+    def _on_adbmr_fetch_done(self, is_ok, database_metrics, adbmr):
+        if is_ok:
+            self.database_metrics = database_metrics
+            self.refreshed_at = time.time()
+        else:
+            self.number_refresh_failures += 1
+            _logger.error(
+                "error refreshing database metrics - %s",
+                "snapshot is %.0f ms old" % self.snapshot_age_in_ms if self.refreshed_at else "no snapshot")
+
+        callbacks = self._refresh_callbacks
+        self._refresh_callbacks = None
+
+        for callback in callbacks:
+            callback(is_ok, database_metrics if is_ok else None, self)
+
+
 class AsyncAllViewMetricsRetriever(AsyncAction):
-    """Async'ly retrieve metrics for all views in a database."""
+    """Async'ly retrieve metrics for all views in a database.
+
+    By default metrics for every view are requested concurrently.
+    For databases with lots of design docs that burst of requests
+    can trip rate limits - if ```max_concurrency``` is not None
+    at most ```max_concurrency``` requests for view metrics are
+    outstanding at any one time.
+
+    By default failing to retrieve any view's metrics fails the
+    whole retrieval. If ```partial_results``` is True the metrics
+    for the views that were retrieved are returned and
+    ```failed_design_docs``` lists the design docs whose view
+    metrics couldn't be retrieved.
+    """
 
     # FDD = Fetch Failure Details
     FFD_OK = 0x0000
@@ -744,13 +3467,22 @@ class AsyncAllViewMetricsRetriever(AsyncAction):
     FFD_ERROR_TALKING_TO_COUCHDB = FFD_ERROR | 0x0001
     FFD_ERROR_FETCHING_VIEW_METRICS = FFD_ERROR | 0x0002
     FFD_NO_DESIGN_DOCS_IN_DATABASE = 0x0003
+    FFD_SOME_VIEW_METRICS_NOT_FETCHED = 0x0004
 
-    def __init__(self, async_state=None):
-        AsyncAction.__init__(self, async_state)
+    def __init__(self, async_state=None, deadline=None, max_concurrency=None, partial_results=False):
+        AsyncAction.__init__(self, async_state, deadline)
+
+        assert max_concurrency is None or 0 < max_concurrency
+        self.max_concurrency = max_concurrency
+        self.partial_results = partial_results
 
         self.fetch_failure_detail = None
+        self.failed_design_docs = []
 
-        self._todo = []
+        # design docs whose view metrics haven't yet been requested
+        self._pending = collections.deque()
+        self._number_outstanding = 0
+        self._is_fetching_pending = False
         self._done = []
         self._callback = None
 
@@ -781,13 +3513,16 @@ class AsyncAllViewMetricsRetriever(AsyncAction):
         # }
         #
         path = '_all_docs?startkey="_design"&endkey="_design0"'
-        request = CouchDBAsyncHTTPRequest(path, "GET", None)
+        # 2 sequential requests - this one and then the
+        # concurrent requests for each view's metrics
+        request = CouchDBAsyncHTTPRequest(path, "GET", None, deadline=_split_deadline(self.deadline, 2))
 
         cac = CouchDBAsyncHTTPClient(httplib.OK, None)
         cac.fetch(request, self._on_cac_fetch_done)
 
     def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, acdba):
         assert is_conflict is False
+        self._record_unsent_request(acdba)
         if not is_ok:
             self._call_callback(type(self).FFD_ERROR_TALKING_TO_COUCHDB)
             return
@@ -797,21 +3532,52 @@ class AsyncAllViewMetricsRetriever(AsyncAction):
             self._call_callback(type(self).FFD_NO_DESIGN_DOCS_IN_DATABASE)
             return
 
-        for row in rows:
-            design_doc = row["key"].split("/")[1]
-            self._todo.append(design_doc)
-            avmr = AsyncViewMetricsRetriever(design_doc)
+        self._pending.extend([row["key"].split("/")[1] for row in rows])
+        self._fetch_pending()
+
+    def _fetch_pending(self):
+        # AsyncViewMetricsRetriever can call back synchronously (ex when
+        # a circuit breaker is open) so rather than recursing (and,
+        # with lots of design docs, exhausting the stack) callbacks
+        # which arrive while this loop is running just return and
+        # leave this loop to request the remaining view metrics
+        if self._is_fetching_pending:
+            return
+
+        self._is_fetching_pending = True
+        while self._pending and self._callback:
+            if self.max_concurrency is not None and self.max_concurrency <= self._number_outstanding:
+                break
+            design_doc = self._pending.popleft()
+            self._number_outstanding += 1
+            avmr = AsyncViewMetricsRetriever(design_doc, deadline=self.deadline)
             avmr.fetch(self._on_avmr_fetch_done)
+        self._is_fetching_pending = False
 
-    def _on_avmr_fetch_done(self, is_ok, view_metrics, avmr):
-        if not is_ok:
-            self._call_callback(type(self).FFD_ERROR_FETCHING_VIEW_METRICS)
+        if self._pending or self._number_outstanding:
             return
 
-        self._todo.remove(view_metrics.design_doc)
-        self._done.append(view_metrics)
+        cls = type(self)
+        if not self.failed_design_docs:
+            self._call_callback(cls.FFD_OK)
+        elif self._done:
+            self._call_callback(cls.FFD_SOME_VIEW_METRICS_NOT_FETCHED)
+        else:
+            self._call_callback(cls.FFD_ERROR_FETCHING_VIEW_METRICS)
+
+    def _on_avmr_fetch_done(self, is_ok, view_metrics, avmr):
+        self._record_unsent_request(avmr)
+        self._number_outstanding -= 1
+
+        if is_ok:
+            self._done.append(view_metrics)
+        else:
+            self.failed_design_docs.append(avmr.design_doc)
+            if not self.partial_results:
+                self._call_callback(type(self).FFD_ERROR_FETCHING_VIEW_METRICS)
+                return
 
-        self._call_callback(type(self).FFD_OK)
+        self._fetch_pending()
 
     def _call_callback(self, fetch_failure_detail):
         if not self._callback:
@@ -819,21 +3585,10 @@ class AsyncAllViewMetricsRetriever(AsyncAction):
             # we're still getting responses back from CouchDB
             return
 
-        is_ok = not bool(fetch_failure_detail & type(self).FFD_ERROR)
-
-        if not is_ok:
-            assert self.fetch_failure_detail is None
-            self.fetch_failure_detail = fetch_failure_detail
-            self._callback(False, None, self)
-            self._callback = None
-            return
-
-        if self._todo:
-            return
-
         assert self.fetch_failure_detail is None
         self.fetch_failure_detail = fetch_failure_detail
-        self._callback(True, self._done, self)
+        is_ok = not bool(fetch_failure_detail & type(self).FFD_ERROR)
+        self._callback(is_ok, self._done if is_ok else None, self)
         self._callback = None
 
 
@@ -846,8 +3601,8 @@ class AsyncViewMetricsRetriever(AsyncAction):
     FFD_ERROR_TALKING_TO_COUCHDB = FFD_ERROR | 0x0001
     FFD_INVALID_RESPONSE_BODY = 0x0002
 
-    def __init__(self, design_doc, async_state=None):
-        AsyncAction.__init__(self, async_state)
+    def __init__(self, design_doc, async_state=None, deadline=None):
+        AsyncAction.__init__(self, async_state, deadline)
 
         self.design_doc = design_doc
         self.fetch_failure_detail = None
@@ -859,13 +3614,14 @@ class AsyncViewMetricsRetriever(AsyncAction):
         self._callback = callback
 
         path = '_design/%s/_info' % self.design_doc
-        request = CouchDBAsyncHTTPRequest(path, "GET", None)
+        request = CouchDBAsyncHTTPRequest(path, "GET", None, deadline=self.deadline)
 
         cac = CouchDBAsyncHTTPClient(httplib.OK, None)
         cac.fetch(request, self._on_cac_fetch_done)
 
     def _on_cac_fetch_done(self, is_ok, is_conflict, response_body, _id, _rev, cac):
         assert is_conflict is False
+        self._record_unsent_request(cac)
         if not is_ok:
             self._call_callback(type(self).FFD_ERROR_TALKING_TO_COUCHDB)
             return
@@ -889,3 +3645,302 @@ class AsyncViewMetricsRetriever(AsyncAction):
             ViewMetrics(self.design_doc, data_size, disk_size) if is_ok else None,
             self)
         self._callback = None
+
+
+class AsyncCompactionScheduler(object):
+    """Every ```evaluation_interval_in_ms``` ```AsyncCompactionScheduler```
+    retrieves the database's metrics and, if the database's fragmentation
+    is at least ```database_fragmentation_threshold```, compacts the database
+    otherwise, if the fragmentation of any view is at least
+    ```view_fragmentation_threshold```, compacts the most fragmented view.
+    Like CouchDB's compaction daemon's ```min_file_size``` the database
+    is only compacted if its disk size is at least ```min_database_size```
+    bytes and a view only if its disk size is at least ```min_view_size```
+    bytes - the fragmentation of a small database or view is dominated by
+    overhead that compaction can't reclaim.
+
+    Compaction is I/O intensive so:
+
+        -- if ```allowed_windows``` is not None compactions are only
+           started during one of the windows - ```allowed_windows``` is
+           a list of (start, end) ```datetime.time``` tuples in UTC and a
+           window whose end is before its start spans midnight
+        -- at most one compaction runs at a time - before starting a
+           compaction CouchDB's ```_active_tasks``` is checked and no
+           compaction is started if any compaction (including one started
+           by some other process) is already running against the database
+
+    Once a compaction has been started ```_active_tasks``` is polled every
+    ```poll_interval_in_ms``` to track the compaction's progress. The next
+    compaction waits for the next evaluation. The database and each view
+    are compacted at most once per cycle - a cycle ends when an evaluation
+    finds nothing that hasn't already been compacted during the cycle - so
+    a database which stays above its threshold can't starve its views.
+
+    Compaction requires CouchDB admin privileges.
+    """
+
+    def __init__(self,
+                 evaluation_interval_in_ms=15 * 60 * 1000,
+                 poll_interval_in_ms=10 * 1000,
+                 database_fragmentation_threshold=70,
+                 view_fragmentation_threshold=70,
+                 allowed_windows=None,
+                 max_view_concurrency=None,
+                 min_database_size=128 * 1024,
+                 min_view_size=128 * 1024):
+        object.__init__(self)
+
+        self.evaluation_interval_in_ms = evaluation_interval_in_ms
+        self.poll_interval_in_ms = poll_interval_in_ms
+        self.database_fragmentation_threshold = database_fragmentation_threshold
+        self.view_fragmentation_threshold = view_fragmentation_threshold
+        self.allowed_windows = allowed_windows
+        self.max_view_concurrency = max_view_concurrency
+        self.min_database_size = min_database_size
+        self.min_view_size = min_view_size
+
+        # while a compaction is running compaction_path is the path of
+        # the request which started the compaction (```_compact``` or
+        # ```_compact/<design doc>```) and compaction_progress is the
+        # compaction's most recently reported progress as a percentage
+        self.compaction_path = None
+        self.compaction_progress = None
+
+        self.number_evaluations = 0
+        self.number_compactions = 0
+        self.number_compaction_failures = 0
+
+        self._is_evaluating = False
+        self._is_stopped = False
+        self._periodic_callback = None
+        self._poll_timeout = None
+
+        # paths of the compactions started during the current cycle
+        self._compacted_paths = set()
+
+    @property
+    def is_compacting(self):
+        return self.compaction_path is not None
+
+    def start(self):
+        """Evaluate the database's metrics every ```evaluation_interval_in_ms```.
+        Must be called on the IOLoop's thread.
+        """
+        assert self._periodic_callback is None
+        self._is_stopped = False
+        self._periodic_callback = tornado.ioloop.PeriodicCallback(
+            self.evaluate,
+            self.evaluation_interval_in_ms)
+        self._periodic_callback.start()
+
+    def stop(self):
+        """Stop evaluating the database's metrics. A running compaction
+        isn't cancelled but its progress is no longer tracked and
+        the responses to any in flight requests are ignored.
+        """
+        self._is_stopped = True
+
+        if self._periodic_callback is not None:
+            self._periodic_callback.stop()
+            self._periodic_callback = None
+
+        if self._poll_timeout is not None:
+            tornado.ioloop.IOLoop.current().remove_timeout(self._poll_timeout)
+            self._poll_timeout = None
+
+        self._is_evaluating = False
+        self.compaction_path = None
+        self.compaction_progress = None
+        self._compacted_paths.clear()
+
+    def is_in_allowed_window(self, now=None):
+        if self.allowed_windows is None:
+            return True
+
+        if now is None:
+            now = datetime.datetime.utcnow().time()
+
+        for (start, end) in self.allowed_windows:
+            if start <= end:
+                if start <= now < end:
+                    return True
+            else:
+                if start <= now or now < end:
+                    return True
+
+        return False
+
+    def evaluate(self):
+        """Start a compaction if one is needed, none is running
+        and the current time is in an allowed window.
+        """
+        if self._is_evaluating or self.is_compacting:
+            return
+
+        if not self.is_in_allowed_window():
+            return
+
+        self._is_evaluating = True
+        self.number_evaluations += 1
+
+        adbmr = AsyncDatabaseMetricsRetriever(
+            max_view_concurrency=self.max_view_concurrency,
+            partial_view_results=True)
+        adbmr.fetch(self._on_adbmr_fetch_done)
+
+    def _on_adbmr_fetch_done(self, is_ok, database_metrics, adbmr):
+        if self._is_stopped:
+            return
+
+        if not is_ok:
+            _logger.error("error retrieving database metrics to evaluate compaction")
+            self._is_evaluating = False
+            return
+
+        compaction_path = self._compaction_path_for(database_metrics)
+        if compaction_path is None:
+            self._is_evaluating = False
+            return
+
+        self._fetch_active_tasks(functools.partial(self._on_active_tasks_fetch_done, compaction_path))
+
+    def _compaction_path_for(self, database_metrics):
+        """Returns the path of the request which compacts the most
+        pressing of ```database_metrics``` which hasn't already been
+        compacted during the current cycle or None if nothing needs
+        to be compacted. When None is returned a new cycle starts.
+        """
+        compaction_paths = []
+
+        # fragmentation is None if CouchDB didn't report data and disk sizes
+        fragmentation = database_metrics.fragmentation
+        if fragmentation is not None and \
+           self.database_fragmentation_threshold <= fragmentation and \
+           self.min_database_size <= database_metrics.disk_size:
+            compaction_paths.append("_compact")
+
+        fragmented_view_metrics = [
+            view_metrics for view_metrics in database_metrics.view_metrics
+            if view_metrics.fragmentation is not None and
+            self.view_fragmentation_threshold <= view_metrics.fragmentation and
+            self.min_view_size <= view_metrics.disk_size
+        ]
+        fragmented_view_metrics.sort(key=lambda view_metrics: view_metrics.fragmentation, reverse=True)
+        compaction_paths.extend([
+            "_compact/%s" % view_metrics.design_doc
+            for view_metrics in fragmented_view_metrics
+        ])
+
+        for compaction_path in compaction_paths:
+            if compaction_path not in self._compacted_paths:
+                return compaction_path
+
+        self._compacted_paths.clear()
+        return None
+
+    def _on_active_tasks_fetch_done(self, compaction_path, is_ok, compaction_tasks):
+        if self._is_stopped:
+            return
+
+        if not is_ok or compaction_tasks:
+            if compaction_tasks:
+                _logger.info("compaction already running - not starting '%s'", compaction_path)
+            self._is_evaluating = False
+            return
+
+        request = CouchDBAsyncHTTPRequest(compaction_path, "POST", {}, sign_body_as_dict=False)
+        cac = CouchDBAsyncHTTPClient(httplib.ACCEPTED, None)
+        cac.fetch(request, functools.partial(self._on_cac_compact_fetch_done, compaction_path))
+
+    def _on_cac_compact_fetch_done(self, compaction_path, is_ok, is_conflict, response_body, _id, _rev, cac):
+        if self._is_stopped:
+            return
+
+        self._is_evaluating = False
+
+        if not is_ok:
+            self.number_compaction_failures += 1
+            _logger.error("error starting compaction '%s'", compaction_path)
+            return
+
+        _logger.info("started compaction '%s'", compaction_path)
+
+        self.number_compactions += 1
+        self._compacted_paths.add(compaction_path)
+        self.compaction_path = compaction_path
+        self.compaction_progress = 0
+        self._schedule_poll()
+
+    def _schedule_poll(self):
+        self._poll_timeout = tornado.ioloop.IOLoop.current().add_timeout(
+            datetime.timedelta(milliseconds=self.poll_interval_in_ms),
+            self._poll)
+
+    def _poll(self):
+        self._poll_timeout = None
+        self._fetch_active_tasks(self._on_poll_active_tasks_fetch_done)
+
+    def _on_poll_active_tasks_fetch_done(self, is_ok, compaction_tasks):
+        if self._is_stopped:
+            return
+
+        if not is_ok:
+            # try again at the next poll
+            self._schedule_poll()
+            return
+
+        if compaction_tasks:
+            progresses = [task.get("progress", 0) for task in compaction_tasks]
+            self.compaction_progress = sum(progresses) / len(progresses)
+            self._schedule_poll()
+            return
+
+        _logger.info("compaction '%s' complete", self.compaction_path)
+
+        # anything else which needs compacting is compacted
+        # after the next evaluation
+        self.compaction_path = None
+        self.compaction_progress = None
+
+    def _fetch_active_tasks(self, callback):
+        """Calls ```callback``` with ```(is_ok, compaction_tasks)``` where
+        ```compaction_tasks``` is the list of CouchDB's active tasks which
+        are compacting the database or one of its views.
+        """
+        # _active_tasks is a server (rather than database) resource
+        request = CouchDBAsyncHTTPRequest("", "GET", None)
+        (server_url, database_name) = _split_database_url(request.url)
+        request.url = "%s/_active_tasks" % server_url
+        request.operation = "active_tasks"
+
+        def on_cac_fetch_done(is_ok, is_conflict, response_body, _id, _rev, cac):
+            if not is_ok:
+                callback(False, None)
+                return
+
+            compaction_tasks = [
+                task for task in response_body
+                if task.get("type") in ["database_compaction", "view_compaction"] and
+                _is_active_task_for_database(task, database_name)
+            ]
+            callback(True, compaction_tasks)
+
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+        cac.fetch(request, on_cac_fetch_done)
+
+
+def _split_database_url(database_url):
+    """Returns a (server url, database name) tuple for ```database_url```."""
+    (server_url, _, database_name) = database_url.rstrip("/").rpartition("/")
+    return (server_url, urllib.unquote(database_name))
+
+
+def _is_active_task_for_database(task, database_name):
+    # on a clustered CouchDB an active task's database is
+    # a shard of the form shards/<range>/<database>.<suffix>
+    task_database_name = task.get("database", "")
+    if task_database_name == database_name:
+        return True
+    return task_database_name.startswith("shards/") and \
+        task_database_name.split("/", 2)[-1].rsplit(".", 1)[0] == database_name
@@ -0,0 +1,116 @@
+"""This module contains an in-process cache of CouchDB documents.
+
+Documents in CouchDB are versioned by their ```_rev``` property and
+CouchDB returns a document's ```_rev``` as the document's ETag. This
+means a cached document can be cheaply revalidated with a conditional
+GET (If-None-Match) - when CouchDB responds with a 304 Not Modified
+the response has no body so we save both the transfer of the document
+and the JSON decode of the document.
+"""
+
+import collections
+
+
+class DocumentCache(object):
+    """An LRU cache of CouchDB documents keyed by document ID and
+    bounded by the total size (in bytes) of the cached documents.
+
+    Documents in the cache are shared by all readers of the cache
+    and therefore must be treated as read-only.
+
+    The counters below are intended to help size the cache:
+
+        -- ```misses``` = number of lookups that found no document
+        -- ```revalidations``` = number of lookups that found a
+           document (and therefore number of conditional GETs)
+        -- ```hits``` = number of revalidations where CouchDB
+           confirmed the cached document was current
+        -- ```evictions``` = number of documents evicted from the
+           cache to keep the cache's size within ```max_size_in_bytes```
+    """
+
+    def __init__(self, max_size_in_bytes=16 * 1024 * 1024):
+        object.__init__(self)
+
+        self.max_size_in_bytes = max_size_in_bytes
+        self.size_in_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+        # document ID -> (doc, size_in_bytes) in least to most
+        # recently used order
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._entries
+
+    def get(self, doc_id):
+        """Returns the cached document with ID ```doc_id``` or ```None```
+        if the document isn't in the cache.
+        """
+        entry = self._entries.pop(doc_id, None)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self._entries[doc_id] = entry
+        self.revalidations += 1
+        return entry[0]
+
+    def not_modified(self, doc_id):
+        """Called when CouchDB confirms, by responding to a conditional
+        GET with a 304 Not Modified, that the cached document with
+        ID ```doc_id``` is current.
+        """
+        self.hits += 1
+
+    def put(self, doc, size_in_bytes):
+        """Add ```doc``` to the cache replacing any document already in
+        the cache with the same ID. ```size_in_bytes``` is the size of
+        ```doc``` when encoded as JSON. Documents without ```_id``` and
+        ```_rev``` properties or larger than the cache aren't cached.
+        """
+        doc_id = doc.get("_id")
+        if doc_id is None:
+            return
+
+        self.remove(doc_id)
+
+        if doc.get("_rev") is None or self.max_size_in_bytes < size_in_bytes:
+            return
+
+        self._entries[doc_id] = (doc, size_in_bytes)
+        self.size_in_bytes += size_in_bytes
+
+        while self.max_size_in_bytes < self.size_in_bytes:
+            (_, (_, evicted_size_in_bytes)) = self._entries.popitem(last=False)
+            self.size_in_bytes -= evicted_size_in_bytes
+            self.evictions += 1
+
+    def remove(self, doc_id):
+        """Invalidate the cached document with ID ```doc_id```."""
+        entry = self._entries.pop(doc_id, None)
+        if entry is not None:
+            self.size_in_bytes -= entry[1]
+
+    def on_change(self, doc_id, rev, is_deleted):
+        """A listener for ```async_model_actions.AsyncChangesFollower```
+        which invalidates the cached document with ID ```doc_id```
+        unless the cached document is already at revision ```rev```.
+        """
+        entry = self._entries.get(doc_id)
+        if entry is None:
+            return
+
+        if is_deleted or entry[0].get("_rev") != rev:
+            self.remove(doc_id)
+
+    def clear(self):
+        self._entries.clear()
+        self.size_in_bytes = 0
@@ -4,6 +4,13 @@ as JSON files (just like CouchDB would expect) and then
 create a mainline for the installer like the example in
 samples/db_installer/installer.py
 
+Update handlers (see ```async_model_actions.AsyncUpdateHandlerInvoker```)
+can be written in the design doc's JSON file or, since JavaScript
+embedded in JSON strings is hard to read and edit, as JavaScript files
+in a folder called ```<design doc name>/updates``` alongside the design
+doc's JSON file. Each ```<update handler name>.js``` file in the folder
+is added to the design doc's ```updates``` before the design doc is created.
+
 And that's all there is too it! Pretty sweet right?:-)
 """
 
@@ -53,6 +60,34 @@ def _create_database(database, host, session, verify_host_ssl_cert):
     return True
 
 
+def _add_update_handlers(design_doc, design_doc_filename):
+    """Add the update handlers in the JavaScript files in the folder
+    ```<design doc name>/updates``` (relative to ```design_doc_filename```)
+    to ```design_doc``` (a JSON string). Returns the design doc as
+    a JSON string.
+    """
+    update_handlers_folder = os.path.join(design_doc_filename[:-len(".json")], "updates")
+    update_handler_filenames = glob.glob(os.path.join(update_handlers_folder, "*.js"))
+    if not update_handler_filenames:
+        return design_doc
+
+    design_doc = json.loads(design_doc)
+    updates = design_doc.setdefault("updates", {})
+
+    for update_handler_filename in sorted(update_handler_filenames):
+        update_handler_name = os.path.basename(update_handler_filename)[:-len(".js")]
+
+        _logger.info(
+            "Adding update handler '%s' from file '%s'",
+            update_handler_name,
+            update_handler_filename)
+
+        with open(update_handler_filename, "r") as update_handler_file:
+            updates[update_handler_name] = update_handler_file.read()
+
+    return json.dumps(design_doc)
+
+
 def _create_design_docs(database,
                         host,
                         session,
@@ -92,6 +127,8 @@ def _create_design_docs(database,
         with open(design_doc_filename, "r") as design_doc_file:
             design_doc = design_doc_file.read()
 
+        design_doc = _add_update_handlers(design_doc, design_doc_filename)
+
         response = session.put(
             url,
             data=design_doc,
@@ -0,0 +1,106 @@
+"""This module contains the JSON codecs used to encode request bodies
+sent to CouchDB, decode response bodies received from CouchDB and
+create the canonical representation of documents used by the
+```tamper``` module.
+
+JSON encoding and decoding is typically the largest consumer of CPU
+in a service built on this package. The codec used by this package
+is configured with ```async_model_actions.json_codec``` and by default
+is a ```JSONCodec``` which uses the standard library's json module.
+A service's mainline can swap in a faster codec:
+
+    async_model_actions.json_codec = json_codec.UJSONCodec()
+
+A note on canonical encoding - tamper signatures are calculated
+against a document's canonical encoding and are stored alongside the
+document in CouchDB so the canonical encoding must never change or
+previously signed documents will fail verification. ```dumps_canonical()```
+must therefore produce output byte for byte identical to the standard
+library's ```json.dumps(doc, sort_keys=True)```. ```SimpleJSONCodec```
+meets this requirement and so uses simplejson's C speedups for
+canonical encoding. ```UJSONCodec``` does not (ujson uses different
+separators and escaping) and so uses the standard library for
+canonical encoding.
+
+A note on floats - using the standard library for canonical encoding
+isn't enough on its own. The canonical encoding of a document read
+from CouchDB is calculated from the decoded document so decoding must
+return exactly the floats that were signed. By default ujson's decoder
+is imprecise (it changes the value of about half of all floats) and
+ujson 1.x's encoder writes at most 15 significant digits so can't
+round-trip floats either. ```UJSONCodec``` therefore decodes with
+```precise_float=True``` and encodes with the standard library.
+"""
+
+import json
+
+
+class JSONCodec(object):
+    """A JSON codec using the standard library's json module.
+    Also the base class for all other codecs.
+    """
+
+    name = "json"
+
+    def dumps(self, obj):
+        """Encode ```obj``` as a JSON string."""
+        return json.dumps(obj)
+
+    def loads(self, s):
+        """Decode the JSON string ```s```."""
+        return json.loads(s)
+
+    def dumps_canonical(self, obj):
+        """Encode ```obj``` as a UTF-8 JSON string with sorted keys.
+        See the module's docstring for why derived classes must take
+        care when overriding this method.
+        """
+        return json.dumps(obj, encoding="utf-8", sort_keys=True)
+
+
+class SimpleJSONCodec(JSONCodec):
+    """A JSON codec using simplejson and its C speedups.
+    Raises ```ImportError``` if simplejson isn't installed.
+    """
+
+    name = "simplejson"
+
+    def __init__(self):
+        JSONCodec.__init__(self)
+
+        import simplejson
+        self._simplejson = simplejson
+
+    def dumps(self, obj):
+        return self._simplejson.dumps(obj)
+
+    def loads(self, s):
+        return self._simplejson.loads(s)
+
+    def dumps_canonical(self, obj):
+        return self._simplejson.dumps(obj, encoding="utf-8", sort_keys=True)
+
+
+class UJSONCodec(JSONCodec):
+    """A JSON codec using ujson for decoding and the standard library
+    for encoding and canonical encoding - see the module's docstring
+    for why ujson isn't used for encoding.
+    Raises ```ImportError``` if ujson isn't installed.
+    """
+
+    name = "ujson"
+
+    def __init__(self):
+        JSONCodec.__init__(self)
+
+        import ujson
+        self._ujson = ujson
+
+    def loads(self, s):
+        return self._ujson.loads(s, precise_float=True)
+
+
+"""```_default_codec``` is used by callers that aren't configured
+with a codec.
+"""
+_default_codec = JSONCodec()
@@ -0,0 +1,187 @@
+"""This module contains an in-process metrics registry which records
+histograms of the time CouchDB takes to respond to requests.
+
+```CouchDBAsyncHTTPClient``` writes a log message describing the
+timing of every response from CouchDB. Calculating percentiles from
+these log messages requires scraping and parsing the logs.
+If ```async_model_actions.metrics_registry``` is a ```MetricsRegistry```
+the same timing details are also recorded in log-bucketed histograms
+which ```MetricsRegistry.render_text()``` renders in the Prometheus
+text exposition format. A service's ```/_metrics``` endpoint can serve
+the rendered histograms without making any requests to CouchDB -
+see samples/metrics/service.py.
+
+Each histogram is labelled with:
+
+    -- ```phase``` = ```request``` for the request's total time or one of
+       the phases of a request described by tornado's ```time_info```
+       (```queue```, ```namelookup```, ```connect```, ```pretransfer```,
+       ```starttransfer```, ```total``` and ```redirect```)
+    -- ```method``` = the request's HTTP method
+    -- ```status_class``` = ```2xx```, ```3xx```, ```4xx``` or ```5xx```
+       (tornado's 599 for connection errors and timeouts is ```5xx```)
+    -- ```operation``` = the logical operation the request performs
+       (ex ```view:fruit_by_fruit```, ```get_by_id```, ```persist```,
+       ```compact```)
+"""
+
+import bisect
+import re
+
+
+def log_bucket_bounds(min_bound=0.0005, factor=2.0, number_buckets=18):
+    """Returns a list of ```number_buckets``` bucket upper bounds
+    starting at ```min_bound``` with each bound ```factor``` times
+    the previous bound. The defaults cover 0.5 ms to about 65 seconds.
+    """
+    return [min_bound * (factor ** i) for i in range(0, number_buckets)]
+
+
+class Histogram(object):
+    """A histogram of observations. ```bucket_bounds``` is a sorted
+    list of bucket upper bounds - observations greater than the last
+    bound are counted only in the implicit ```+Inf``` bucket.
+    """
+
+    def __init__(self, bucket_bounds):
+        object.__init__(self)
+
+        self.bucket_bounds = bucket_bounds
+        # the last bucket is the +Inf bucket
+        self.bucket_counts = [0] * (len(bucket_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.bucket_bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative_bucket_counts(self):
+        """Returns a list of (upper bound, cumulative count) tuples
+        with an upper bound of ```None``` for the ```+Inf``` bucket.
+        """
+        rv = []
+        cumulative_count = 0
+        for (bound, bucket_count) in zip(self.bucket_bounds + [None], self.bucket_counts):
+            cumulative_count += bucket_count
+            rv.append((bound, cumulative_count))
+        return rv
+
+
+"""```_time_info_phases``` are the phases of a request described
+by the ```time_info``` attribute of tornado's responses.
+See http://curl.haxx.se/libcurl/c/curl_easy_getinfo.html#TIMES
+"""
+_time_info_phases = [
+    "queue",
+    "namelookup",
+    "connect",
+    "pretransfer",
+    "starttransfer",
+    "total",
+    "redirect",
+]
+
+_design_doc_path_reg_ex = re.compile(
+    r"^_design/(?P<design_doc>[^/?]+)(/(?P<handler_type>_view|_update|_info)(/(?P<handler>[^/?]+))?)?")
+
+_special_path_reg_ex = re.compile(r"^(?P<path>_all_docs|_bulk_docs|_changes|_compact)")
+
+
+def operation_for_path(method, path):
+    """Returns the logical operation performed by a ```method``` request
+    to ```path``` (relative to the database). Document IDs are never part
+    of an operation so the number of operations is bounded.
+    """
+    match = _design_doc_path_reg_ex.match(path)
+    if match:
+        handler_type = match.group("handler_type")
+        if handler_type == "_view":
+            return "view:%s" % match.group("design_doc")
+        if handler_type == "_update":
+            return "update:%s/%s" % (match.group("design_doc"), match.group("handler"))
+        if handler_type == "_info":
+            return "view_info"
+        return "design_doc"
+
+    match = _special_path_reg_ex.match(path)
+    if match:
+        return match.group("path")[1:]
+
+    if method == "GET":
+        if not path or path.startswith("?"):
+            return "database"
+        return "get_by_id"
+    if method == "DELETE":
+        return "delete"
+    return "persist"
+
+
+class MetricsRegistry(object):
+    """```MetricsRegistry``` records a histogram of the time CouchDB
+    takes to respond for each combination of labels described in this
+    module's docstring. Times are recorded in seconds. ```bucket_bounds```
+    is the list of histogram bucket upper bounds and defaults to
+    ```log_bucket_bounds()```.
+    """
+
+    metric_name = "couchdb_request_duration_seconds"
+
+    def __init__(self, bucket_bounds=None):
+        object.__init__(self)
+
+        self.bucket_bounds = bucket_bounds or log_bucket_bounds()
+
+        # (phase, method, status_class, operation) -> Histogram
+        self.histograms = {}
+
+    def observe_response(self, operation, method, http_response_code, request_time, time_info):
+        """Record the timing of a response from CouchDB. ```request_time```
+        and the values in ```time_info``` are in seconds.
+        """
+        status_class = "%dxx" % min(5, http_response_code // 100)
+
+        self._observe("request", method, status_class, operation, request_time)
+
+        for phase in _time_info_phases:
+            value = time_info.get(phase)
+            if value is not None:
+                self._observe(phase, method, status_class, operation, value)
+
+    def _observe(self, phase, method, status_class, operation, value):
+        labels = (phase, method, status_class, operation)
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = Histogram(self.bucket_bounds)
+            self.histograms[labels] = histogram
+        histogram.observe(value)
+
+    def render_text(self):
+        """Returns the histograms in the Prometheus text exposition format."""
+        name = type(self).metric_name
+
+        lines = [
+            "# HELP %s Time CouchDB took to respond by request phase." % name,
+            "# TYPE %s histogram" % name,
+        ]
+
+        for labels in sorted(self.histograms):
+            histogram = self.histograms[labels]
+            labels_as_str = 'phase="%s",method="%s",status_class="%s",operation="%s"' % tuple(
+                [_escape_label_value(label) for label in labels])
+
+            for (bound, cumulative_count) in histogram.cumulative_bucket_counts():
+                lines.append('%s_bucket{%s,le="%s"} %d' % (
+                    name,
+                    labels_as_str,
+                    "+Inf" if bound is None else repr(bound),
+                    cumulative_count))
+            lines.append("%s_sum{%s} %s" % (name, labels_as_str, repr(histogram.sum)))
+            lines.append("%s_count{%s} %d" % (name, labels_as_str, histogram.count))
+
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label_value(value):
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
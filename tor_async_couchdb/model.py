@@ -1,5 +1,13 @@
 class Model(object):
-    """Abstract base class for all models."""
+    """Abstract base class for all models.
+
+    ```_original_doc``` is the document the model was created from or
+    most recently persisted as (None for models which have never been
+    read from or written to CouchDB). ```AsyncPersister``` uses
+    ```_original_doc``` as the base of a three-way merge when resolving
+    conflicts. ```_original_doc``` is a reference rather than a copy
+    so documents used to create models must not be changed.
+    """
 
     def __init__(self, *args, **kwargs):
         object.__init__(self)
@@ -11,6 +19,7 @@ class Model(object):
         else:
             self._id = kwargs.get('_id', None)
             self._rev = kwargs.get('_rev', None)
+        self._original_doc = doc
 
     def as_doc_for_store(self):
         rv = {}
@@ -5,10 +5,59 @@ conflict responses.
 
 import datetime
 import random
+import time
 
 from tornado.ioloop import IOLoop
 
 
+class RetryBudget(object):
+    """```RetryBudget``` is a token bucket which limits retries to a fraction
+    of base traffic. Each ```RetryStrategy``` represents a single update or
+    delete and adds ```retry_ratio``` tokens to the bucket (up to
+    ```max_tokens```) when it's created. Each retry spends one token.
+    When the bucket is empty retries are refused so, during a conflict
+    storm, retries are limited to about ```retry_ratio``` of base traffic
+    rather than multiplying the load on CouchDB. The bucket starts full.
+
+    The following metrics are maintained:
+
+        -- ```number_requests``` = number of updates and deletes
+        -- ```number_retries``` = number of retries allowed
+        -- ```number_retries_refused``` = number of retries refused
+    """
+
+    def __init__(self, retry_ratio=0.1, max_tokens=10):
+        object.__init__(self)
+
+        self.retry_ratio = retry_ratio
+        self.max_tokens = max_tokens
+
+        self.number_requests = 0
+        self.number_retries = 0
+        self.number_retries_refused = 0
+
+        self._tokens = float(max_tokens)
+
+    def on_request(self):
+        self.number_requests += 1
+        self._tokens = min(self.max_tokens, self._tokens + self.retry_ratio)
+
+    def acquire_retry(self):
+        """Returns ```True``` if a retry is allowed."""
+        if self._tokens < 1:
+            self.number_retries_refused += 1
+            return False
+        self._tokens -= 1
+        self.number_retries += 1
+        return True
+
+
+"""If not None, ```retry_budget``` is a ```RetryBudget``` shared by
+all retry strategies.
+"""
+retry_budget = None
+
+
 class RetryStrategy(object):
     """With CouchDB's optimistic concurrency it's possible for
     document updates and deletes to result in a 409 Conflict. When this
@@ -29,23 +78,88 @@ class RetryStrategy(object):
     Retry strategies are represented using a strategy pattern
     and ```RetryStrategy``` is the abstract base class for all
     concrete strategy classes.
+
+    If not None, ```deadline``` is the time (as returned by ```time.time()```)
+    by which the loop must complete - no attempts are made after ```deadline```
+    and ```attempt_deadline()``` splits the time remaining until ```deadline```
+    between the next attempt and any attempts that might follow it.
+
+    If ```retry_budget``` is not None retries are also limited
+    by ```retry_budget```.
     """
 
-    def __init__(self, max_num_retries=20):
+    def __init__(self, max_num_retries=20, deadline=None):
         object.__init__(self)
 
         self.num_retries = 0
         self.max_num_retries = max_num_retries
+        self.deadline = deadline
+
+        self._retry_budget = retry_budget
+        if self._retry_budget is not None:
+            self._retry_budget.on_request()
 
     def next_attempt(self):
         self.num_retries += 1
-        return self.num_retries < self.max_num_retries
+        if self.deadline is not None and self.deadline <= time.time():
+            return False
+        if self.max_num_retries <= self.num_retries:
+            return False
+        if self._retry_budget is not None:
+            return self._retry_budget.acquire_retry()
+        return True
+
+    def attempt_deadline(self):
+        """Returns the deadline for the next attempt's requests or ```None```
+        if the loop has no deadline. Half of the time remaining until
+        ```deadline``` is reserved for subsequent attempts unless the next
+        attempt is the last attempt.
+        """
+        if self.deadline is None:
+            return None
+        if self.max_num_retries <= self.num_retries + 1:
+            return self.deadline
+        now = time.time()
+        return now + max(0.0, self.deadline - now) / 2
 
     def wait(self, callback, *callback_args, **callback_kwargs):
         raise NotImplementedError("must implement 'wait()' in subclass")
 
 
-class ExponentialBackoffRetryStrategy(RetryStrategy):
+class BackoffRetryStrategy(RetryStrategy):
+    """```BackoffRetryStrategy``` is the abstract base class for
+    retry strategies which wait before each retry. Concrete classes
+    implement ```delay_in_ms()``` which returns the number of ms
+    to wait before the next retry.
+    """
+
+    def delay_in_ms(self):
+        raise NotImplementedError("must implement 'delay_in_ms()' in subclass")
+
+    def wait(self, callback, *callback_args, **callback_kwargs):
+
+        if not self.next_attempt():
+            callback(0, *callback_args, **callback_kwargs)
+            return
+
+        delay_in_ms = self.delay_in_ms()
+
+        if self.deadline is not None and self.deadline <= time.time() + delay_in_ms / 1000.0:
+            # waiting would take us past the deadline
+            callback(0, *callback_args, **callback_kwargs)
+            return
+
+        IOLoop.current().add_timeout(
+            datetime.timedelta(0, delay_in_ms / 1000.0, 0),
+            callback,
+            delay_in_ms,
+            *callback_args,
+            **callback_kwargs)
+
+        return delay_in_ms
+
+
+class ExponentialBackoffRetryStrategy(BackoffRetryStrategy):
     """```ExponentialBackoffRetryStrategy``` implements a retry strategy
     that, as the name suggests, waits exponentially longer time as the
     number of retry attempts increases. The specific time waited is calculated
@@ -62,21 +176,84 @@ class ExponentialBackoffRetryStrategy(RetryStrategy):
         * https://developers.google.com/google-apps/documents-list/?csw=1#implementing_exponential_backoff
         * http://googleappsdeveloper.blogspot.ca/2011/12/documents-list-api-best-practices.html
         * http://docs.aws.amazon.com/general/latest/gr/api-retries.html
+
+    The small, fixed jitter means concurrent retries remain largely
+    synchronized and the delay is never capped - prefer one of the
+    jittered strategies below.
     """
 
-    def wait(self, callback, *callback_args, **callback_kwargs):
+    def delay_in_ms(self):
+        return (2 ** self.num_retries) * 25 + random.randint(-10, 10)
 
-        if not self.next_attempt():
-            callback(0, *callback_args, **callback_kwargs)
-            return
 
-        delay_in_ms = (2 ** self.num_retries) * 25 + random.randint(-10, 10)
+class CappedExponentialBackoffRetryStrategy(BackoffRetryStrategy):
+    """```CappedExponentialBackoffRetryStrategy``` waits
 
-        IOLoop.current().add_timeout(
-            datetime.timedelta(0, delay_in_ms / 1000.0, 0),
-            callback,
-            delay_in_ms,
-            *callback_args,
-            **callback_kwargs)
+        min(max_delay_in_ms, base_delay_in_ms * 2 ** retry_number)
+
+    before each retry.
+
+    References
+
+        * https://www.awsarchitectureblog.com/2015/03/backoff.html
+    """
+
+    def __init__(self, max_num_retries=20, deadline=None, base_delay_in_ms=25, max_delay_in_ms=10000):
+        BackoffRetryStrategy.__init__(self, max_num_retries, deadline)
+
+        self.base_delay_in_ms = base_delay_in_ms
+        self.max_delay_in_ms = max_delay_in_ms
+
+    def delay_in_ms(self):
+        return self._capped_exponential_delay_in_ms()
+
+    def _capped_exponential_delay_in_ms(self):
+        # cap the exponent so huge retry numbers don't create huge ints
+        exponent = min(self.num_retries, 62)
+        return min(self.max_delay_in_ms, self.base_delay_in_ms * (2 ** exponent))
+
+
+class FullJitterBackoffRetryStrategy(CappedExponentialBackoffRetryStrategy):
+    """```FullJitterBackoffRetryStrategy``` waits a random time between 0
+    and ```CappedExponentialBackoffRetryStrategy```'s delay before each
+    retry. Spreading retries over the entire interval de-synchronizes
+    clients which conflicted with each other.
+
+    References
+
+        * https://www.awsarchitectureblog.com/2015/03/backoff.html
+    """
+
+    def delay_in_ms(self):
+        return random.uniform(0, self._capped_exponential_delay_in_ms())
+
+
+class DecorrelatedJitterBackoffRetryStrategy(CappedExponentialBackoffRetryStrategy):
+    """```DecorrelatedJitterBackoffRetryStrategy``` waits
+
+        min(max_delay_in_ms, random between base_delay_in_ms and 3 * previous delay)
+
+    before each retry. Each delay is derived from the previous delay rather
+    than the retry number.
+
+    References
+
+        * https://www.awsarchitectureblog.com/2015/03/backoff.html
+    """
+
+    def __init__(self, max_num_retries=20, deadline=None, base_delay_in_ms=25, max_delay_in_ms=10000):
+        CappedExponentialBackoffRetryStrategy.__init__(
+            self,
+            max_num_retries,
+            deadline,
+            base_delay_in_ms,
+            max_delay_in_ms)
+
+        self._previous_delay_in_ms = base_delay_in_ms
 
+    def delay_in_ms(self):
+        delay_in_ms = min(
+            self.max_delay_in_ms,
+            random.uniform(self.base_delay_in_ms, self._previous_delay_in_ms * 3))
+        self._previous_delay_in_ms = delay_in_ms
         return delay_in_ms
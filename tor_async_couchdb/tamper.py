@@ -8,31 +8,41 @@ the signature is verified and if signature vertification fails
 thet document is discarded after an alarm is raised.
 """
 
+import base64
+import collections
+import hashlib
+import hmac
 import json
+import threading
+
+import json_codec
 
 _tampering_sig_prop_name = "801dbe4659a641739cbe94fcf0baab03_tampering_v1.0_sig"
 
 
-def sign(signer, doc):
+def sign(signer, doc, codec=None):
     """This method should be called just before ```doc``` (a dictionary)
     is written to CouchDB. The method adds a signature to ```doc``` using
     ```signer.Sign()```. It's assumed that ```signer``` is an instance
-    of ```keyczar.Signer```. If ```signer.Sign()``` returns ```None```
-    no signature is added to ```doc```.
+    of ```keyczar.Signer``` or ```HMACSigner```. If ```signer.Sign()```
+    returns ```None``` no signature is added to ```doc```. ```codec``` is the
+    ```json_codec.JSONCodec``` used to canonically encode ```doc```.
     """
-    (_, doc_as_utf8_str) = _prep_doc_for_signing_and_verification(doc)
+    (_, doc_as_utf8_str) = _prep_doc_for_signing_and_verification(doc, codec)
     doc[_tampering_sig_prop_name] = signer.Sign(doc_as_utf8_str)
     return doc
 
 
-def verify(signer, doc):
+def verify(signer, doc, codec=None):
     """This method should be called just after ```doc``` (a dictionary)
     is read from CouchDB. The method verifies ```doc``` contains a valid
     a signature that was added by this module's ```sign()```. Signature
     verification is done by ```signer.Verify()```. It's assumed that
-    ```signer``` is an instance of ```keyczar.Signer```.
+    ```signer``` is an instance of ```keyczar.Signer``` or ```HMACSigner```.
+    ```codec``` is the ```json_codec.JSONCodec``` used to canonically
+    encode ```doc```.
     """
-    (sig, doc_as_utf8_str) = _prep_doc_for_signing_and_verification(doc)
+    (sig, doc_as_utf8_str) = _prep_doc_for_signing_and_verification(doc, codec)
     if sig is None:
         return False
     # the try/except is here to catch the scenarios like the signature
@@ -45,7 +55,7 @@ def verify(signer, doc):
     return False
 
 
-def _prep_doc_for_signing_and_verification(doc):
+def _prep_doc_for_signing_and_verification(doc, codec=None):
     """This method have an important and tricky responsiblity. This method
     takes a dictionary representing a document that's destined for or read
     from a CouchDB database and creates a UTF-8 encoded string representation
@@ -66,5 +76,158 @@ def _prep_doc_for_signing_and_verification(doc):
     doc_copy.pop("_id", None)
     doc_copy.pop("_rev", None)
     sig = doc_copy.pop(_tampering_sig_prop_name, None)
-    doc_as_utf8_str = json.dumps(doc_copy, encoding="utf-8", sort_keys=True)
+    if codec is None:
+        codec = json_codec._default_codec
+    doc_as_utf8_str = codec.dumps_canonical(doc_copy)
     return (sig, doc_as_utf8_str)
+
+
+class HMACSigner(object):
+    """```HMACSigner``` is a drop-in replacement for ```keyczar.Signer```
+    which calculates an HMAC-SHA256 using the standard library's
+    ```hmac``` and ```hashlib``` modules.
+
+    ```keys``` is a dictionary mapping key IDs to keys (byte strings).
+    Documents are signed with the key identified by ```primary_key_id```
+    and can be verified with any key in ```keys``` - this allows keys to
+    be rotated by introducing a new primary key while retaining the old
+    keys until all documents have been re-signed. Key IDs can't contain
+    a colon.
+
+    Signatures have the form ```hs256:<key ID>:<websafe base64 HMAC>```.
+    Since keyczar signatures are websafe base64 encoded they never contain
+    a colon. If ```legacy_signer``` is not None then signatures without the
+    ```hs256:``` prefix are assumed to be keyczar signatures and are verified
+    by ```legacy_signer``` - this allows documents signed by keyczar
+    to be read while migrating to ```HMACSigner```.
+    """
+
+    _sig_prefix = "hs256:"
+
+    @classmethod
+    def Read(cls, filename, legacy_signer=None):
+        """Create an ```HMACSigner``` from the JSON file ```filename```
+        which looks like
+
+            {
+                "primary_key_id": "2",
+                "keys": {
+                    "1": "<base64 encoded key>",
+                    "2": "<base64 encoded key>"
+                }
+            }
+        """
+        with open(filename, "r") as fd:
+            keyset = json.load(fd)
+
+        keys = {}
+        for (key_id, key) in keyset["keys"].items():
+            keys[str(key_id)] = base64.b64decode(key)
+
+        return cls(keys, str(keyset["primary_key_id"]), legacy_signer)
+
+    def __init__(self, keys, primary_key_id, legacy_signer=None):
+        object.__init__(self)
+
+        assert primary_key_id in keys
+        assert all([':' not in key_id for key_id in keys])
+
+        self.keys = keys
+        self.primary_key_id = primary_key_id
+        self.legacy_signer = legacy_signer
+
+    def Sign(self, data):
+        mac = self._mac(self.keys[self.primary_key_id], data)
+        return "%s%s:%s" % (self._sig_prefix, self.primary_key_id, mac)
+
+    def Verify(self, data, sig):
+        if not sig.startswith(self._sig_prefix):
+            if self.legacy_signer is None:
+                return False
+            return self.legacy_signer.Verify(data, sig)
+
+        (key_id, _, mac) = sig[len(self._sig_prefix):].partition(":")
+        key = self.keys.get(key_id)
+        if key is None:
+            return False
+
+        return hmac.compare_digest(self._mac(key, data), str(mac))
+
+    def _mac(self, key, data):
+        if isinstance(data, unicode):
+            data = data.encode("utf-8")
+        return base64.urlsafe_b64encode(hmac.new(key, data, hashlib.sha256).digest())
+
+
+class VerificationCache(object):
+    """A CouchDB document's ```_id``` and ```_rev``` identify an immutable
+    revision of the document so once a revision's signature has been
+    verified there's no need to verify it again. ```VerificationCache```
+    is a bounded LRU set of the (```_id```, ```_rev```, signature) triples
+    that have passed verification. A cache hit skips the canonical encoding
+    of the document and the crypto. Failed verifications are never cached.
+
+    The cache is tied to a single signer. When ```verify()``` is called
+    with a different signer (ie the keys have been rotated and a new signer
+    created) the cache is cleared. If keys are rotated without creating a
+    new signer call ```clear()```.
+
+    The cache is thread safe so it can be used when responses are
+    processed on ```async_model_actions.response_processing_executor```.
+    """
+
+    def __init__(self, max_size=64 * 1024):
+        object.__init__(self)
+
+        self.max_size = max_size
+
+        self.hits = 0
+        self.misses = 0
+
+        self._signer = None
+        self._lock = threading.Lock()
+
+        # (_id, _rev, signature) triples in least to most recently used order
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def verify(self, signer, doc, codec=None):
+        """Equivalent to this module's ```verify()``` but skips
+        verification of documents whose (```_id```, ```_rev```, signature)
+        triple has already passed verification.
+        """
+        key = (doc.get("_id"), doc.get("_rev"), doc.get(_tampering_sig_prop_name))
+        if None in key:
+            return verify(signer, doc, codec)
+
+        with self._lock:
+            if signer is not self._signer:
+                self._entries.clear()
+                self._signer = signer
+
+            if key in self._entries:
+                # move to most recently used
+                del self._entries[key]
+                self._entries[key] = None
+                self.hits += 1
+                return True
+
+            self.misses += 1
+
+        # verify outside the lock so other threads aren't blocked
+        if not verify(signer, doc, codec):
+            return False
+
+        with self._lock:
+            if signer is self._signer:
+                self._entries[key] = None
+                while self.max_size < len(self._entries):
+                    self._entries.popitem(last=False)
+
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -2,25 +2,54 @@
 the async_model_actions.py module.
 """
 
+import datetime
+import functools
 import httplib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
 import unittest
 import uuid
 
 import mock
+import tornado.concurrent
 
+from ..async_model_actions import AdmissionQueue
 from ..async_model_actions import AsyncAllViewMetricsRetriever
+from ..async_model_actions import AsyncBulkPersister
+from ..async_model_actions import AsyncChangesFollower
+from ..async_model_actions import AsyncCompactionScheduler
 from ..async_model_actions import AsyncDeleter
 from ..async_model_actions import AsyncModelRetriever
+from ..async_model_actions import AsyncModelRetrieverByDocumentID
 from ..async_model_actions import AsyncModelsRetriever
+from ..async_model_actions import AsyncModelsRetrieverByDocumentIDs
+from ..async_model_actions import AsyncModelsRetrieverByKeys
 from ..async_model_actions import AsyncPersister
+from ..async_model_actions import AsyncUpdateHandlerInvoker
 from ..async_model_actions import AsyncCouchDBHealthCheck
 from ..async_model_actions import AsyncDatabaseMetricsRetriever
 from ..async_model_actions import AsyncViewMetricsRetriever
 from ..async_model_actions import BaseAsyncModelRetriever
+from ..async_model_actions import CachedDatabaseMetricsProvider
+from ..async_model_actions import CircuitBreaker
+from ..async_model_actions import CircuitBreakers
+from ..async_model_actions import ConflictMerger
 from ..async_model_actions import CouchDBAsyncHTTPClient
+from ..async_model_actions import CouchDBAsyncHTTPRequest
 from ..async_model_actions import DatabaseMetrics
+from ..async_model_actions import EndpointPool
+from ..async_model_actions import InvalidCursorException
 from ..async_model_actions import InvalidTypeInDocForStoreException
+from ..async_model_actions import ReadHedger
+from ..async_model_actions import TamperingSignerConfiguredException
 from ..async_model_actions import ViewMetrics
+from ..async_model_actions import _ViewRowsParser
+from ..cache import DocumentCache
+from ..metrics import MetricsRegistry
 from ..model import Model
 from .. import async_model_actions  # noqa, needed for patching using relative path
 
@@ -60,6 +89,165 @@ class CouchDBAsyncHTTPClientPatcher(object):
         self._patcher.stop()
 
 
+class CouchDBAsyncHTTPClientSequencePatcher(object):
+    """Patch ```CouchDBAsyncHTTPClient.fetch``` so each call responds
+    with the next of a sequence of responses. Once the sequence is
+    exhausted calls to ```fetch``` never respond.
+    """
+
+    def __init__(self, responses):
+
+        self.requests = []
+
+        def fetch_patch(cac, request, callback):
+            self.requests.append(request)
+            if len(responses) < len(self.requests):
+                return
+            (is_ok, is_conflict, response_body) = responses[len(self.requests) - 1]
+            callback(is_ok, is_conflict, response_body, None, None, cac)
+
+        self._patcher = mock.patch(
+            __name__ + ".async_model_actions.CouchDBAsyncHTTPClient.fetch",
+            fetch_patch)
+
+    def __enter__(self):
+        self._patcher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._patcher.stop()
+
+
+def create_response(request, code=httplib.OK, body=None, headers=None, request_time=0.01, time_info=None):
+    """Create a mock ```tornado.httpclient.HTTPResponse``` to ```request```
+    for a test to pass to the callback given to a patched
+    ```tornado.httpclient.AsyncHTTPClient.fetch```. If not None,
+    ```body``` is JSON encoded to become the response's body.
+    """
+    response = mock.Mock()
+    response.code = code
+    response.error = None if code < 400 else mock.Mock()
+    response.body = json.dumps(body) if body is not None else ""
+    response.headers = headers or {}
+    response.time_info = time_info or {}
+    response.effective_url = request.url
+    response.request_time = request_time
+    response.request = request
+    return response
+
+
+class CheckDocForTamperingTestCase(unittest.TestCase):
+    """A collection of unit tests for the
+    _check_doc_for_tampering_and_if_ok_create_model function.
+    """
+
+    def test_no_tampering_signer(self):
+        doc = {"_id": uuid.uuid4().hex}
+        create_model_from_doc = mock.Mock()
+
+        with mock.patch(__name__ + ".async_model_actions.tamper.verify") as verify_patch:
+            model = async_model_actions._check_doc_for_tampering_and_if_ok_create_model(doc, create_model_from_doc)
+
+        self.assertEqual(0, verify_patch.call_count)
+        self.assertTrue(model is create_model_from_doc.return_value)
+
+    def test_tampering_detected(self):
+        doc = {"_id": uuid.uuid4().hex}
+        create_model_from_doc = mock.Mock()
+
+        with mock.patch(__name__ + ".async_model_actions.tampering_signer", mock.Mock()):
+            with mock.patch(__name__ + ".async_model_actions.tamper.verify", return_value=False):
+                model = async_model_actions._check_doc_for_tampering_and_if_ok_create_model(doc, create_model_from_doc)
+
+        self.assertIsNone(model)
+        self.assertEqual(0, create_model_from_doc.call_count)
+
+    def test_verification_cache(self):
+        doc = {"_id": uuid.uuid4().hex}
+        create_model_from_doc = mock.Mock()
+        the_tampering_signer = mock.Mock()
+        the_tampering_verification_cache = mock.Mock()
+        the_tampering_verification_cache.verify.return_value = True
+
+        with mock.patch(__name__ + ".async_model_actions.tampering_signer", the_tampering_signer):
+            with mock.patch(__name__ + ".async_model_actions.tampering_verification_cache",
+                            the_tampering_verification_cache):
+                with mock.patch(__name__ + ".async_model_actions.tamper.verify") as verify_patch:
+                    model = async_model_actions._check_doc_for_tampering_and_if_ok_create_model(
+                        doc,
+                        create_model_from_doc)
+
+        self.assertEqual(0, verify_patch.call_count)
+        the_tampering_verification_cache.verify.assert_called_once_with(
+            the_tampering_signer,
+            doc,
+            async_model_actions.json_codec)
+        self.assertTrue(model is create_model_from_doc.return_value)
+
+
+class CouchDBAsyncHTTPRequestTestCase(unittest.TestCase):
+    """A collection of unit tests for the CouchDBAsyncHTTPRequest class."""
+
+    def test_body_encoded_with_json_codec(self):
+        the_body_as_dict = {"dave": "was here"}
+        the_body = uuid.uuid4().hex
+
+        the_json_codec = mock.Mock()
+        the_json_codec.dumps.return_value = the_body
+
+        with mock.patch(__name__ + ".async_model_actions.json_codec", the_json_codec):
+            request = CouchDBAsyncHTTPRequest("doc", "PUT", the_body_as_dict)
+
+        self.assertEqual(request.body, the_body)
+        the_json_codec.dumps.assert_called_once_with(the_body_as_dict)
+
+    def test_body_signed_with_json_codec(self):
+        the_body_as_dict = {"dave": "was here"}
+        the_json_codec = mock.Mock()
+        the_json_codec.dumps.return_value = "{}"
+        the_tampering_signer = mock.Mock()
+
+        with mock.patch(__name__ + ".async_model_actions.json_codec", the_json_codec):
+            with mock.patch(__name__ + ".async_model_actions.tampering_signer", the_tampering_signer):
+                with mock.patch(__name__ + ".async_model_actions.tamper.sign") as sign_patch:
+                    CouchDBAsyncHTTPRequest("doc", "PUT", the_body_as_dict)
+
+        sign_patch.assert_called_once_with(
+            the_tampering_signer,
+            the_body_as_dict,
+            the_json_codec)
+
+    def test_deadline(self):
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=1002.5)
+        self.assertEqual(1002.5, request.deadline)
+        self.assertAlmostEqual(2.5, request.request_timeout)
+        self.assertAlmostEqual(2.5, request.connect_timeout)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=1100.0)
+        self.assertAlmostEqual(100.0, request.request_timeout)
+        self.assertTrue(request.connect_timeout < request.request_timeout)
+
+        request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+        self.assertIsNone(request.deadline)
+
+    def test_split_deadline(self):
+        self.assertIsNone(async_model_actions._split_deadline(None, 2))
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            self.assertEqual(1001.0, async_model_actions._split_deadline(1003.0, 3))
+            self.assertEqual(1000.0, async_model_actions._split_deadline(999.0, 3))
+
+    def test_no_body(self):
+        the_json_codec = mock.Mock()
+
+        with mock.patch(__name__ + ".async_model_actions.json_codec", the_json_codec):
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+
+        self.assertIsNone(request.body)
+        self.assertEqual(0, the_json_codec.dumps.call_count)
+
+
 class CouchDBAsyncHTTPClientTestCase(unittest.TestCase):
     """A collection of unit tests for the CouchDBAsyncHTTPClient class."""
 
@@ -79,6 +267,91 @@ class CouchDBAsyncHTTPClientTestCase(unittest.TestCase):
             ac.create_model_from_doc,
             the_create_model_from_doc)
 
+    _timings = {"request_time": 0.05, "time_info": {"total": 0.04}}
+
+    def test_metrics_recorded(self):
+        mr = MetricsRegistry()
+
+        with mock.patch(__name__ + ".async_model_actions.metrics_registry", mr):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                request = CouchDBAsyncHTTPRequest("_design/fruit/_view/fruit", "GET", None)
+                CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, mock.Mock())
+                fetch_patch.call_args[1]["callback"](create_response(request, **self._timings))
+
+                request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                request.operation = "my_operation"
+                CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, mock.Mock())
+                fetch_patch.call_args[1]["callback"](create_response(request, httplib.NOT_FOUND, **self._timings))
+
+        self.assertEqual(
+            set([
+                ("request", "GET", "2xx", "view:fruit"),
+                ("total", "GET", "2xx", "view:fruit"),
+                ("request", "GET", "4xx", "my_operation"),
+                ("total", "GET", "4xx", "my_operation"),
+            ]),
+            set(mr.histograms.keys()))
+        self.assertAlmostEqual(0.05, mr.histograms[("request", "GET", "2xx", "view:fruit")].sum)
+
+    def test_metrics_not_recorded_without_registry(self):
+        with mock.patch(__name__ + ".async_model_actions.metrics.operation_for_path") as operation_for_path_patch:
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, mock.Mock())
+                fetch_patch.call_args[1]["callback"](create_response(request, **self._timings))
+        self.assertEqual(0, operation_for_path_patch.call_count)
+
+    def _fetch_and_log(self, request_time=0.05):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+            the_ac = CouchDBAsyncHTTPClient(httplib.OK, None)
+            with mock.patch.object(the_ac, "_timing_log_msg", wraps=the_ac._timing_log_msg) as msg_patch:
+                the_ac.fetch(request, mock.Mock())
+                response = create_response(request, request_time=request_time, time_info={"total": 0.04})
+                fetch_patch.call_args[1]["callback"](response)
+                return msg_patch.call_count
+
+    def test_timing_log_not_formatted_when_info_disabled(self):
+        with mock.patch(__name__ + ".async_model_actions._logger") as logger_patch:
+            logger_patch.isEnabledFor.return_value = False
+            self.assertEqual(0, self._fetch_and_log())
+            logger_patch.isEnabledFor.assert_called_once_with(logging.INFO)
+            self.assertEqual(0, logger_patch.info.call_count)
+
+    def test_timing_log_sampled(self):
+        with mock.patch(__name__ + ".async_model_actions.timing_log_sample_rate", 0.25):
+            with mock.patch(__name__ + ".async_model_actions._logger") as logger_patch:
+                with mock.patch(__name__ + ".async_model_actions.random.random", return_value=0.5):
+                    self.assertEqual(0, self._fetch_and_log())
+                    self.assertEqual(0, logger_patch.info.call_count)
+
+                with mock.patch(__name__ + ".async_model_actions.random.random", return_value=0.1):
+                    self.assertEqual(1, self._fetch_and_log())
+                    self.assertEqual(1, logger_patch.info.call_count)
+
+    def test_slow_requests_always_logged(self):
+        with mock.patch(__name__ + ".async_model_actions.timing_log_sample_rate", 0.0):
+            with mock.patch(__name__ + ".async_model_actions.slow_request_threshold_in_ms", 100):
+                with mock.patch(__name__ + ".async_model_actions._logger") as logger_patch:
+                    self.assertEqual(0, self._fetch_and_log(request_time=0.05))
+                    self.assertEqual(0, logger_patch.warning.call_count)
+
+                    self.assertEqual(1, self._fetch_and_log(request_time=0.1))
+                    self.assertEqual(1, logger_patch.warning.call_count)
+                    self.assertEqual(0, logger_patch.info.call_count)
+
+    def test_timing_log_json_format(self):
+        the_format = async_model_actions.TIMING_LOG_FORMAT_JSON
+        with mock.patch(__name__ + ".async_model_actions.timing_log_format", the_format):
+            with mock.patch(__name__ + ".async_model_actions._logger") as logger_patch:
+                self._fetch_and_log()
+                msg_as_dict = json.loads(logger_patch.info.call_args[0][0])
+                self.assertEqual(200, msg_as_dict["http_response_code"])
+                self.assertEqual("GET", msg_as_dict["http_method"])
+                self.assertAlmostEqual(50, msg_as_dict["request_time_in_ms"])
+                self.assertAlmostEqual(40, msg_as_dict["total_in_ms"])
+                self.assertEqual(0, msg_as_dict["queue_in_ms"])
+
     def test_happy_path_with_no_time_info(self):
         response = mock.Mock()
         response.code = httplib.OK
@@ -225,6 +498,341 @@ class CouchDBAsyncHTTPClientTestCase(unittest.TestCase):
                     logger_patch.error.call_args_list,
                     mock.call(expected_logger_error_call_arg_list))
 
+    def _create_ok_response_for_doc(self, doc):
+        response = mock.Mock()
+        response.code = httplib.OK
+        response.error = None
+        response.body = json.dumps(doc)
+        response.time_info = {}
+        response.effective_url = "http://www.example.com/%s" % uuid.uuid4().hex
+        response.request_time = 0.99
+        response.request = mock.Mock()
+        response.request.method = "GET"
+        response.request.url = response.effective_url
+        response.request.headers = {}
+        response.request.streaming_callback = None
+        return response
+
+    def test_gets_not_coalesced_by_default(self):
+        response = self._create_ok_response_for_doc({"_id": uuid.uuid4().hex})
+
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            for i in range(0, 3):
+                cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(), True)
+                cac.fetch(response.request, mock.Mock())
+
+            self.assertEqual(3, fetch_patch.call_count)
+
+    def test_coalesced_gets(self):
+        the_doc = {"_id": uuid.uuid4().hex}
+        response = self._create_ok_response_for_doc(the_doc)
+
+        with mock.patch(__name__ + ".async_model_actions.coalesce_gets", True):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                cacs = []
+                callbacks = []
+                for i in range(0, 3):
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(return_value=Model()), True)
+                    callback = mock.Mock()
+                    cac.fetch(response.request, callback)
+                    cacs.append(cac)
+                    callbacks.append(callback)
+
+                self.assertEqual(1, fetch_patch.call_count)
+                self.assertIn((response.request.url, None), async_model_actions._in_flight_gets)
+
+                with mock.patch.object(async_model_actions.json_codec, "loads", side_effect=json.loads) as loads_patch:
+                    fetch_patch.call_args[1]["callback"](response)
+                    self.assertEqual(1, loads_patch.call_count)
+
+                self.assertNotIn((response.request.url, None), async_model_actions._in_flight_gets)
+
+                models = []
+                for (cac, callback) in zip(cacs, callbacks):
+                    cac.create_model_from_doc.assert_called_once_with(the_doc)
+                    model = cac.create_model_from_doc.return_value
+                    callback.assert_called_once_with(True, False, model, None, None, cac)
+                    models.append(model)
+                self.assertEqual(len(models), len(set(models)))
+
+    def test_gets_only_coalesced_with_no_earlier_deadline(self):
+        response = self._create_ok_response_for_doc({"_id": uuid.uuid4().hex})
+
+        with mock.patch(__name__ + ".async_model_actions.coalesce_gets", True):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                    def fetch(deadline):
+                        request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=deadline)
+                        request.url = response.request.url
+                        cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(return_value=Model()), True)
+                        callback = mock.Mock()
+                        cac.fetch(request, callback)
+                        return (cac, callback)
+
+                    fetch(1000.05)
+                    self.assertEqual(1, fetch_patch.call_count)
+
+                    # a caller with an earlier deadline waits for the in flight GET
+                    fetch(1000.01)
+                    self.assertEqual(1, fetch_patch.call_count)
+
+                    # callers with a later or no deadline send their own GETs
+                    fetch(1000.10)
+                    self.assertEqual(2, fetch_patch.call_count)
+                    (cac, callback) = fetch(None)
+                    self.assertEqual(3, fetch_patch.call_count)
+
+                # the GET without a deadline isn't affected by the others' deadlines
+                fetch_patch.call_args[1]["callback"](response)
+                callback.assert_called_once_with(True, False, mock.ANY, None, None, cac)
+
+                async_model_actions._in_flight_gets.clear()
+
+    def test_coalesced_gets_error(self):
+        response = self._create_ok_response_for_doc({})
+        response.code = httplib.INTERNAL_SERVER_ERROR
+
+        with mock.patch(__name__ + ".async_model_actions.coalesce_gets", True):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                cacs = []
+                callbacks = []
+                for i in range(0, 2):
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(), True)
+                    callback = mock.Mock()
+                    cac.fetch(response.request, callback)
+                    cacs.append(cac)
+                    callbacks.append(callback)
+
+                self.assertEqual(1, fetch_patch.call_count)
+                fetch_patch.call_args[1]["callback"](response)
+
+                for (cac, callback) in zip(cacs, callbacks):
+                    self.assertEqual(0, cac.create_model_from_doc.call_count)
+                    callback.assert_called_once_with(False, False, None, None, None, cac)
+
+    def _create_executor(self):
+        def submit(fn, *args):
+            future = tornado.concurrent.Future()
+            try:
+                future.set_result(fn(*args))
+            except Exception as ex:
+                future.set_exception(ex)
+            return future
+
+        executor = mock.Mock()
+        executor.submit.side_effect = submit
+        return executor
+
+    def test_large_response_processed_on_executor(self):
+        the_doc = {"_id": uuid.uuid4().hex}
+        response = self._create_ok_response_for_doc(the_doc)
+        the_executor = self._create_executor()
+
+        with mock.patch(__name__ + ".async_model_actions.response_processing_executor", the_executor):
+            with mock.patch(__name__ + ".async_model_actions.response_processing_executor_threshold_in_bytes",
+                            len(response.body)):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(), True)
+                        callback = mock.Mock()
+                        cac.fetch(response.request, callback)
+                        fetch_patch.call_args[1]["callback"](response)
+
+                    self.assertEqual(1, the_executor.submit.call_count)
+                    self.assertEqual(0, callback.call_count)
+
+                    add_future = ioloop_patch.return_value.add_future
+                    self.assertEqual(1, add_future.call_count)
+                    (future, on_done) = add_future.call_args[0]
+                    on_done(future)
+
+        cac.create_model_from_doc.assert_called_once_with(the_doc)
+        callback.assert_called_once_with(True, False, cac.create_model_from_doc.return_value, None, None, cac)
+
+    def test_small_response_not_processed_on_executor(self):
+        the_doc = {"_id": uuid.uuid4().hex}
+        response = self._create_ok_response_for_doc(the_doc)
+        the_executor = self._create_executor()
+
+        with mock.patch(__name__ + ".async_model_actions.response_processing_executor", the_executor):
+            with mock.patch(__name__ + ".async_model_actions.response_processing_executor_threshold_in_bytes",
+                            len(response.body) + 1):
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(), True)
+                    callback = mock.Mock()
+                    cac.fetch(response.request, callback)
+                    fetch_patch.call_args[1]["callback"](response)
+
+        self.assertEqual(0, the_executor.submit.call_count)
+        callback.assert_called_once_with(True, False, cac.create_model_from_doc.return_value, None, None, cac)
+
+    def test_error_processing_response_on_executor(self):
+        response = self._create_ok_response_for_doc({"_id": uuid.uuid4().hex})
+        the_executor = self._create_executor()
+
+        with mock.patch(__name__ + ".async_model_actions.response_processing_executor", the_executor):
+            with mock.patch(__name__ + ".async_model_actions.response_processing_executor_threshold_in_bytes", 0):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        cac = CouchDBAsyncHTTPClient(httplib.OK, mock.Mock(side_effect=Exception()), True)
+                        callback = mock.Mock()
+                        cac.fetch(response.request, callback)
+                        fetch_patch.call_args[1]["callback"](response)
+
+                    (future, on_done) = ioloop_patch.return_value.add_future.call_args[0]
+                    on_done(future)
+
+        callback.assert_called_once_with(False, False, None, None, None, cac)
+
+
+class MyModelRetrieverByDocumentID(AsyncModelRetrieverByDocumentID):
+
+    def create_model_from_doc(self, doc):
+        return MyModel(doc=doc)
+
+
+class AsyncModelRetrieverByDocumentIDUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncModelRetrieverByDocumentID class."""
+
+    def _create_response(self, code, body):
+        response = mock.Mock()
+        response.code = code
+        response.error = None if code == httplib.OK else uuid.uuid4().hex
+        response.body = body
+        response.time_info = {}
+        response.effective_url = "http://www.example.com/%s" % uuid.uuid4().hex
+        response.request_time = 0.99
+        response.request = mock.Mock()
+        response.request.method = "GET"
+        return response
+
+    def test_ctr(self):
+        the_document_id = uuid.uuid4().hex
+        the_async_state = uuid.uuid4().hex
+        amrbdi = AsyncModelRetrieverByDocumentID(the_document_id, the_async_state)
+        self.assertTrue(amrbdi.document_id is the_document_id)
+        self.assertTrue(amrbdi.async_state is the_async_state)
+
+    def test_document_cache(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+            "type": "mymodel_v1.0",
+        }
+        the_body = json.dumps(the_doc)
+        the_document_cache = DocumentCache()
+
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            # miss ...
+            response = self._create_response(httplib.OK, the_body)
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                amrbdi.fetch(callback)
+
+                request = fetch_patch.call_args[0][0]
+                self.assertNotIn("If-None-Match", request.headers)
+
+                fetch_patch.call_args[1]["callback"](response)
+
+                self.assertEqual(1, callback.call_count)
+                self.assertTrue(callback.call_args[0][0])
+                self.assertEqual(the_doc["_rev"], callback.call_args[0][1]._rev)
+
+            self.assertEqual(1, the_document_cache.misses)
+            self.assertEqual(len(the_body), the_document_cache.size_in_bytes)
+            self.assertTrue(the_doc["_id"] in the_document_cache)
+
+            # hit ...
+            response = self._create_response(httplib.NOT_MODIFIED, "")
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                amrbdi.fetch(callback)
+
+                request = fetch_patch.call_args[0][0]
+                self.assertEqual('"%s"' % the_doc["_rev"], request.headers["If-None-Match"])
+
+                fetch_patch.call_args[1]["callback"](response)
+
+                self.assertEqual(1, callback.call_count)
+                self.assertTrue(callback.call_args[0][0])
+                self.assertEqual(the_doc["_rev"], callback.call_args[0][1]._rev)
+
+            self.assertEqual(1, the_document_cache.revalidations)
+            self.assertEqual(1, the_document_cache.hits)
+
+            # error invalidates ...
+            response = self._create_response(httplib.NOT_FOUND, "")
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                amrbdi.fetch(callback)
+                fetch_patch.call_args[1]["callback"](response)
+                callback.assert_called_once_with(False, None, amrbdi)
+
+            self.assertFalse(the_doc["_id"] in the_document_cache)
+
+    def test_document_cache_not_invalidated_when_couchdb_does_not_answer(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+            "type": "mymodel_v1.0",
+        }
+        the_document_cache = DocumentCache()
+        the_document_cache.put(the_doc, 100)
+
+        cbs = CircuitBreakers()
+
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                # connection error or timeout and CouchDB error
+                for code in [599, httplib.SERVICE_UNAVAILABLE]:
+                    callback = mock.Mock()
+                    amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                    amrbdi.fetch(callback)
+                    fetch_patch.call_args[1]["callback"](self._create_response(code, ""))
+                    callback.assert_called_once_with(False, None, amrbdi)
+
+                # shed
+                callback = mock.Mock()
+                amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None, deadline=time.time() - 1)
+                amrbdi.fetch(callback)
+                callback.assert_called_once_with(False, None, amrbdi)
+                self.assertTrue(amrbdi.is_shed)
+
+                # circuit breaker open
+                with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+                    cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("", "GET", None))._change_state(
+                        CircuitBreaker.STATE_OPEN)
+                    callback = mock.Mock()
+                    amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                    amrbdi.fetch(callback)
+                    callback.assert_called_once_with(False, None, amrbdi)
+                    self.assertTrue(amrbdi.is_circuit_open)
+
+        self.assertTrue(the_doc["_id"] in the_document_cache)
+
+    def test_document_cache_invalidated_when_model_not_created(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+            "type": "mymodel_v1.0",
+        }
+        the_document_cache = DocumentCache()
+        the_document_cache.put(the_doc, 100)
+
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                with mock.patch.object(amrbdi, "create_model_from_doc", return_value=None):
+                    amrbdi.fetch(callback)
+                    fetch_patch.call_args[1]["callback"](self._create_response(httplib.OK, json.dumps(the_doc)))
+                callback.assert_called_once_with(False, None, amrbdi)
+
+        self.assertFalse(the_doc["_id"] in the_document_cache)
+
 
 class BaseAsyncModelRetrieverUnitTaseCase(unittest.TestCase):
     """A collection of unit tests for the BaseAsyncModelRetriever class."""
@@ -452,6 +1060,424 @@ class AsyncModelsRetrieverUnitTaseCase(unittest.TestCase):
         good.create_model_from_doc({})
 
 
+class MyModelsRetrieverByKeys(AsyncModelsRetrieverByKeys):
+
+    def create_model_from_doc(self, doc):
+        return MyModel(doc=doc)
+
+
+class AsyncModelsRetrieverPagingUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for AsyncModelsRetriever.fetch_page()."""
+
+    class MyModelsRetriever(AsyncModelsRetriever):
+
+        page_size = 2
+
+        def create_model_from_doc(self, doc):
+            return MyModel(doc=doc)
+
+    def _create_rows(self, number_rows):
+        rows = []
+        for i in range(0, number_rows):
+            doc_id = uuid.uuid4().hex
+            rows.append({
+                "id": doc_id,
+                "key": ["k", i],
+                "value": None,
+                "doc": {"_id": doc_id, "_rev": uuid.uuid4().hex},
+            })
+        return rows
+
+    def test_pages_with_prefetch(self):
+        rows = self._create_rows(5)
+        responses = [
+            (True, False, {"rows": rows[0:3]}),
+            (True, False, {"rows": rows[2:5]}),
+            (True, False, {"rows": rows[4:5]}),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            amr = type(self).MyModelsRetriever(uuid.uuid4().hex, start_key="a")
+
+            callback = mock.Mock()
+            amr.fetch_page(callback)
+            self.assertEqual(1, callback.call_count)
+            (is_ok, models, next_cursor, amr_in_callback) = callback.call_args[0]
+            self.assertTrue(is_ok)
+            self.assertTrue(amr_in_callback is amr)
+            self.assertEqual([row["id"] for row in rows[0:2]], [model._id for model in models])
+            self.assertIsNotNone(next_cursor)
+            self.assertIn("limit=3", patcher.requests[0].url)
+            self.assertIn("startkey=%22a%22", patcher.requests[0].url)
+            self.assertNotIn("startkey_docid", patcher.requests[0].url)
+
+            # 2nd page was prefetched
+            self.assertEqual(2, len(patcher.requests))
+            self.assertIn("startkey_docid=%s" % rows[2]["id"], patcher.requests[1].url)
+            self.assertIn("startkey=%5B%22k%22%2C+2%5D", patcher.requests[1].url)
+
+            callback = mock.Mock()
+            amr.fetch_page(callback, next_cursor)
+            (is_ok, models, next_cursor, amr_in_callback) = callback.call_args[0]
+            self.assertTrue(is_ok)
+            self.assertEqual([row["id"] for row in rows[2:4]], [model._id for model in models])
+            self.assertEqual(3, len(patcher.requests))
+
+            callback = mock.Mock()
+            amr.fetch_page(callback, next_cursor)
+            (is_ok, models, next_cursor, amr_in_callback) = callback.call_args[0]
+            self.assertTrue(is_ok)
+            self.assertEqual([row["id"] for row in rows[4:5]], [model._id for model in models])
+            self.assertIsNone(next_cursor)
+
+            # last page so nothing to prefetch
+            self.assertEqual(3, len(patcher.requests))
+
+    def test_no_prefetch(self):
+        rows = self._create_rows(3)
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, {"rows": rows})]) as patcher:
+            with mock.patch.object(type(self).MyModelsRetriever, "prefetch_next_page", False):
+                amr = type(self).MyModelsRetriever(uuid.uuid4().hex)
+                callback = mock.Mock()
+                amr.fetch_page(callback)
+                self.assertIsNotNone(callback.call_args[0][2])
+                self.assertEqual(1, len(patcher.requests))
+
+    def test_error(self):
+        with CouchDBAsyncHTTPClientSequencePatcher([(False, False, None)]):
+            amr = type(self).MyModelsRetriever(uuid.uuid4().hex)
+            callback = mock.Mock()
+            amr.fetch_page(callback)
+            callback.assert_called_once_with(False, None, None, amr)
+
+    def test_invalid_cursor(self):
+        with CouchDBAsyncHTTPClientSequencePatcher([]):
+            amr = type(self).MyModelsRetriever(uuid.uuid4().hex)
+            with self.assertRaises(InvalidCursorException):
+                amr.fetch_page(mock.Mock(), "dave")
+
+
+class ViewRowsParserUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the _ViewRowsParser class."""
+
+    def setUp(self):
+        self.rows = [
+            {"id": uuid.uuid4().hex, "key": ["a", 1], "value": None, "doc": {"_id": "1", "s": "]} \" ,"}},
+            {"id": uuid.uuid4().hex, "key": "b", "value": {"rows": [1, 2]}, "doc": {"_id": "2"}},
+            {"id": uuid.uuid4().hex, "key": "c", "value": None, "doc": {"_id": "3", "s": u"\u00e9t\u00e9"}},
+        ]
+        self.body = '{"total_rows":3,"offset":0,"rows":[\r\n%s\r\n]}\n' % (
+            ",\r\n".join([json.dumps(row) for row in self.rows]))
+
+    def test_entire_body_in_one_chunk(self):
+        parser = _ViewRowsParser()
+        self.assertEqual(self.rows, parser.feed(self.body))
+        self.assertTrue(parser.is_done)
+
+    def test_every_chunk_boundary(self):
+        for i in range(0, len(self.body) + 1):
+            parser = _ViewRowsParser()
+            rows = parser.feed(self.body[:i])
+            if i <= self.body.rindex("]"):
+                self.assertFalse(parser.is_done)
+            rows.extend(parser.feed(self.body[i:]))
+            self.assertEqual(self.rows, rows)
+            self.assertTrue(parser.is_done)
+
+    def test_one_byte_chunks(self):
+        parser = _ViewRowsParser()
+        rows = []
+        for c in self.body:
+            rows.extend(parser.feed(c))
+        self.assertEqual(self.rows, rows)
+        self.assertTrue(parser.is_done)
+
+    def test_no_rows(self):
+        parser = _ViewRowsParser()
+        self.assertEqual([], parser.feed('{"total_rows":0,"offset":0,"rows":[]}'))
+        self.assertTrue(parser.is_done)
+
+    def test_incomplete_body(self):
+        parser = _ViewRowsParser()
+        self.assertEqual(self.rows[:1], parser.feed(self.body[:self.body.index('"b"')]))
+        self.assertFalse(parser.is_done)
+
+
+class AsyncModelsRetrieverStreamUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for AsyncModelsRetriever.stream()."""
+
+    def _stream(self, code, chunks, batch_size):
+
+        class MyModelsRetriever(AsyncModelsRetriever):
+
+            def create_model_from_doc(self, doc):
+                return MyModel(doc=doc)
+
+        def fetch_patch(request, callback):
+            request.header_callback("HTTP/1.1 100 Continue\r\n")
+            request.header_callback("HTTP/1.1 %d Whatever\r\n" % code)
+            request.header_callback("Content-Type: application/json\r\n")
+            for chunk in chunks:
+                request.streaming_callback(chunk)
+
+            response = mock.Mock()
+            response.code = code
+            response.error = None if code == httplib.OK else uuid.uuid4().hex
+            response.body = ""
+            response.time_info = {}
+            response.effective_url = request.url
+            response.request_time = 0.99
+            response.request = request
+            callback(response)
+
+        batch_callback = mock.Mock()
+        callback = mock.Mock()
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch", side_effect=fetch_patch):
+            with mock.patch.object(MyModelsRetriever, "stream_batch_size", batch_size):
+                amr = MyModelsRetriever(uuid.uuid4().hex)
+                amr.stream(batch_callback, callback)
+
+        return (amr, batch_callback, callback)
+
+    def test_happy_path(self):
+        docs = [{"_id": uuid.uuid4().hex, "_rev": uuid.uuid4().hex} for i in range(0, 5)]
+        body = '{"total_rows":5,"offset":0,"rows":[\r\n%s\r\n]}' % (
+            ",\r\n".join([json.dumps({"id": doc["_id"], "key": None, "doc": doc}) for doc in docs]))
+        chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+
+        (amr, batch_callback, callback) = self._stream(httplib.OK, chunks, 2)
+
+        callback.assert_called_once_with(True, amr)
+
+        batches = [call[0][0] for call in batch_callback.call_args_list]
+        self.assertEqual([2, 2, 1], [len(batch) for batch in batches])
+        models = [model for batch in batches for model in batch]
+        self.assertEqual([doc["_id"] for doc in docs], [model._id for model in models])
+
+    def test_error(self):
+        (amr, batch_callback, callback) = self._stream(httplib.NOT_FOUND, ['{"error":"not_found"}'], 2)
+        callback.assert_called_once_with(False, amr)
+        self.assertEqual(0, batch_callback.call_count)
+
+    def test_incomplete_response(self):
+        body = '{"total_rows":5,"offset":0,"rows":[{"id":"1","key":null,"doc":{"_id":"1"}}'
+        (amr, batch_callback, callback) = self._stream(httplib.OK, [body], 2)
+        callback.assert_called_once_with(False, amr)
+        self.assertEqual(1, batch_callback.call_count)
+
+
+class AsyncModelsRetrieverByKeysUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncModelsRetrieverByKeys class."""
+
+    def _create_row(self, key):
+        return {
+            "key": key,
+            "id": uuid.uuid4().hex,
+            "doc": {
+                "_id": uuid.uuid4().hex,
+                "_rev": uuid.uuid4().hex,
+            },
+        }
+
+    def test_ctr(self):
+        the_design_doc = uuid.uuid4().hex
+        the_keys = [uuid.uuid4().hex]
+        the_async_state = uuid.uuid4().hex
+        amrbk = AsyncModelsRetrieverByKeys(the_design_doc, the_keys, the_async_state)
+        self.assertTrue(amrbk.design_doc is the_design_doc)
+        self.assertTrue(amrbk.keys is the_keys)
+        self.assertTrue(amrbk.async_state is the_async_state)
+
+    def test_no_keys(self):
+        with CouchDBAsyncHTTPClientSequencePatcher([]) as patcher:
+            callback = mock.Mock()
+            amrbk = MyModelsRetrieverByKeys(uuid.uuid4().hex, [])
+            amrbk.fetch(callback)
+            callback.assert_called_once_with(True, [], amrbk)
+            self.assertEqual(0, len(patcher.requests))
+
+    def test_models_in_key_order_with_missing_keys(self):
+        the_keys = ["a", ["b", 1], "c", "d", "e"]
+        rows_1 = [self._create_row(["b", 1]), self._create_row("a")]
+        rows_2 = [self._create_row("e"), self._create_row("e"), {"key": "d", "id": uuid.uuid4().hex, "doc": None}]
+        responses = [
+            (True, False, {"rows": rows_1}),
+            (True, False, {"rows": rows_2}),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            with mock.patch.object(MyModelsRetrieverByKeys, "max_keys_per_request", 3):
+                callback = mock.Mock()
+                amrbk = MyModelsRetrieverByKeys(uuid.uuid4().hex, the_keys)
+                amrbk.fetch(callback)
+
+            self.assertEqual(2, len(patcher.requests))
+            self.assertEqual("POST", patcher.requests[0].method)
+            self.assertEqual({"keys": the_keys[:3]}, json.loads(patcher.requests[0].body))
+            self.assertEqual({"keys": the_keys[3:]}, json.loads(patcher.requests[1].body))
+
+            self.assertEqual(1, callback.call_count)
+            (is_ok, models, amrbk_in_callback) = callback.call_args[0]
+            self.assertTrue(is_ok)
+            self.assertTrue(amrbk_in_callback is amrbk)
+            self.assertEqual(len(the_keys), len(models))
+            self.assertEqual(rows_1[1]["doc"]["_id"], models[0]._id)
+            self.assertEqual(rows_1[0]["doc"]["_id"], models[1]._id)
+            self.assertIsNone(models[2])
+            self.assertIsNone(models[3])
+            self.assertEqual(rows_2[0]["doc"]["_id"], models[4]._id)
+
+    def test_error(self):
+        responses = [
+            (True, False, {"rows": [self._create_row("a")]}),
+            (False, False, None),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses):
+            with mock.patch.object(MyModelsRetrieverByKeys, "max_keys_per_request", 1):
+                callback = mock.Mock()
+                amrbk = MyModelsRetrieverByKeys(uuid.uuid4().hex, ["a", "b"])
+                amrbk.fetch(callback)
+                callback.assert_called_once_with(False, None, amrbk)
+
+    def test_implementation_for_create_model_from_doc_required(self):
+        amrbk = AsyncModelsRetrieverByKeys(uuid.uuid4().hex, [])
+        with self.assertRaises(NotImplementedError):
+            amrbk.create_model_from_doc({})
+
+
+class AsyncModelsRetrieverByDocumentIDsUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncModelsRetrieverByDocumentIDs class."""
+
+    def test_happy_path(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+        }
+        the_document_ids = [the_doc["_id"], uuid.uuid4().hex]
+        the_response_body = {
+            "rows": [
+                {"key": the_doc["_id"], "id": the_doc["_id"], "value": {"rev": the_doc["_rev"]}, "doc": the_doc},
+                {"key": the_document_ids[1], "error": "not_found"},
+            ],
+        }
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]) as patcher:
+
+            class MyModelsRetrieverByDocumentIDs(AsyncModelsRetrieverByDocumentIDs):
+
+                def create_model_from_doc(self, doc):
+                    return MyModel(doc=doc)
+
+            callback = mock.Mock()
+            amrbdis = MyModelsRetrieverByDocumentIDs(the_document_ids)
+            self.assertTrue(amrbdis.document_ids is the_document_ids)
+            amrbdis.fetch(callback)
+
+            self.assertEqual(1, len(patcher.requests))
+            self.assertIn("/_all_docs?include_docs=true", patcher.requests[0].url)
+            self.assertEqual({"keys": the_document_ids}, json.loads(patcher.requests[0].body))
+
+            self.assertEqual(1, callback.call_count)
+            (is_ok, models, _) = callback.call_args[0]
+            self.assertTrue(is_ok)
+            self.assertEqual(2, len(models))
+            self.assertEqual(the_doc["_id"], models[0]._id)
+            self.assertIsNone(models[1])
+
+
+class BatchedAsyncModelRetrieverByDocumentIDUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for AsyncModelRetrieverByDocumentID
+    when fetches by document ID are batched.
+    """
+
+    def setUp(self):
+        self.io_loop = mock.Mock()
+        self._io_loop_patcher = mock.patch("tornado.ioloop.IOLoop.current", return_value=self.io_loop)
+        self._io_loop_patcher.start()
+
+        self._batch_patcher = mock.patch(__name__ + ".async_model_actions.batch_fetches_by_document_id", True)
+        self._batch_patcher.start()
+
+    def tearDown(self):
+        self._batch_patcher.stop()
+        self._io_loop_patcher.stop()
+
+    def test_fetches_in_same_iteration_batched(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+        }
+        the_missing_document_id = uuid.uuid4().hex
+        the_response_body = {
+            "rows": [
+                {"key": the_doc["_id"], "id": the_doc["_id"], "value": {"rev": the_doc["_rev"]}, "doc": the_doc},
+                {"key": the_missing_document_id, "error": "not_found"},
+            ],
+        }
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]) as patcher:
+            the_document_ids = [the_doc["_id"], the_missing_document_id, the_doc["_id"]]
+            amrbdis = [MyModelRetrieverByDocumentID(document_id, None) for document_id in the_document_ids]
+            callbacks = [mock.Mock() for amrbdi in amrbdis]
+            for (amrbdi, callback) in zip(amrbdis, callbacks):
+                amrbdi.fetch(callback)
+
+            self.assertEqual(0, len(patcher.requests))
+            self.assertEqual(1, self.io_loop.add_callback.call_count)
+
+            # simulate the next iteration of the IOLoop
+            self.io_loop.add_callback.call_args[0][0]()
+
+            self.assertEqual(1, len(patcher.requests))
+            self.assertEqual(
+                {"keys": [the_doc["_id"], the_missing_document_id]},
+                json.loads(patcher.requests[0].body))
+
+            self.assertEqual(AdmissionQueue.PRIORITY_READ, patcher.requests[0].priority)
+
+            models = []
+            for (amrbdi, callback) in zip(amrbdis, callbacks):
+                self.assertEqual(1, callback.call_count)
+                (is_ok, model, amrbdi_in_callback) = callback.call_args[0]
+                self.assertTrue(amrbdi_in_callback is amrbdi)
+                models.append((is_ok, model))
+
+            self.assertEqual(the_doc["_id"], models[0][1]._id)
+            self.assertTrue(models[0][0])
+            # like an unbatched fetch a missing document is a failure
+            self.assertEqual((False, None), models[1])
+            self.assertEqual(the_doc["_id"], models[2][1]._id)
+            self.assertTrue(models[2][0])
+            self.assertFalse(models[0][1] is models[2][1])
+
+    def test_tampered_doc_is_failure(self):
+        the_doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+        }
+        the_response_body = {
+            "rows": [
+                {"key": the_doc["_id"], "id": the_doc["_id"], "value": {"rev": the_doc["_rev"]}, "doc": the_doc},
+            ],
+        }
+        with mock.patch(__name__ + ".async_model_actions.tampering_signer", mock.Mock()):
+            with mock.patch(__name__ + ".async_model_actions.tamper.verify", return_value=False):
+                with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]):
+                    callback = mock.Mock()
+                    amrbdi = MyModelRetrieverByDocumentID(the_doc["_id"], None)
+                    amrbdi.fetch(callback)
+
+                    self.io_loop.add_callback.call_args[0][0]()
+
+                    callback.assert_called_once_with(False, None, amrbdi)
+
+    def test_error(self):
+        with CouchDBAsyncHTTPClientSequencePatcher([(False, False, None)]):
+            callback = mock.Mock()
+            amrbdi = MyModelRetrieverByDocumentID(uuid.uuid4().hex, None)
+            amrbdi.fetch(callback)
+
+            self.io_loop.add_callback.call_args[0][0]()
+
+            callback.assert_called_once_with(False, None, amrbdi)
+
+
 class AsyncPersisterUnitTaseCase(unittest.TestCase):
     """A collection of unit tests for the AsyncPersister class."""
 
@@ -515,6 +1541,43 @@ class AsyncPersisterUnitTaseCase(unittest.TestCase):
             callback.assert_called_once_with(True, False, the_ap)
             self.assertEqual(the_model._rev, the_next_rev)
 
+    def test_document_cache_updated(self):
+        the_model = MyModel(doc={})
+        the_ap = AsyncPersister(the_model, [], None)
+
+        the_id = uuid.uuid4().hex
+        the_rev = uuid.uuid4().hex
+
+        the_document_cache = DocumentCache()
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            with CouchDBAsyncHTTPClientPatcher(True, False, [], the_id, the_rev):
+                callback = mock.Mock()
+                the_ap.persist(callback)
+                callback.assert_called_once_with(True, False, the_ap)
+
+        doc = the_document_cache.get(the_id)
+        self.assertIsNotNone(doc)
+        self.assertEqual(the_id, doc["_id"])
+        self.assertEqual(the_rev, doc["_rev"])
+        self.assertEqual("mymodel_v1.0", doc["type"])
+
+    def test_document_cache_invalidated_on_conflict(self):
+        the_model = MyModel(doc={
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+        })
+        the_ap = AsyncPersister(the_model, [], None)
+
+        the_document_cache = DocumentCache()
+        the_document_cache.put(the_model.as_doc_for_store(), 10)
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            with CouchDBAsyncHTTPClientPatcher(False, True, None, None, None):
+                callback = mock.Mock()
+                the_ap.persist(callback)
+                callback.assert_called_once_with(False, True, the_ap)
+
+        self.assertFalse(the_model._id in the_document_cache)
+
     def test_create_new_with_invalid_type_property(self):
 
         the_model = MyModelWithBadType(doc={})
@@ -530,6 +1593,370 @@ class AsyncPersisterUnitTaseCase(unittest.TestCase):
                 the_ap.persist(callback)
 
 
+class MyFruitModel(Model):
+
+    def __init__(self, **kwargs):
+        Model.__init__(self, **kwargs)
+
+        doc = kwargs.get("doc", {})
+        self.fruit = doc.get("fruit", kwargs.get("fruit"))
+        self.color = doc.get("color", kwargs.get("color"))
+
+    def as_doc_for_store(self, *args, **kwargs):
+        rv = Model.as_doc_for_store(self, *args, **kwargs)
+        rv["type"] = "fruit_v1.0"
+        rv["fruit"] = self.fruit
+        rv["color"] = self.color
+        return rv
+
+
+class MyTimestampedFruitModel(MyFruitModel):
+    """Like the retry sample's Fruit model every change
+    stamps ```updated_on```.
+    """
+
+    def __init__(self, **kwargs):
+        MyFruitModel.__init__(self, **kwargs)
+
+        doc = kwargs.get("doc", {})
+        self.updated_on = doc.get("updated_on")
+
+    def as_doc_for_store(self, *args, **kwargs):
+        rv = MyFruitModel.as_doc_for_store(self, *args, **kwargs)
+        rv["updated_on"] = self.updated_on
+        return rv
+
+    def change_fruit(self, fruit, updated_on):
+        self.fruit = fruit
+        self.updated_on = updated_on
+
+    def change_color(self, color, updated_on):
+        self.color = color
+        self.updated_on = updated_on
+
+
+class ConflictMergerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the ConflictMerger class
+    and AsyncPersister's use of ConflictMerger.
+    """
+
+    def _create_docs(self):
+        the_id = uuid.uuid4().hex
+        base_doc = {
+            "_id": the_id,
+            "_rev": "1-a",
+            "type": "fruit_v1.0",
+            "fruit": "apple",
+            "color": "red",
+        }
+        their_doc = dict(base_doc)
+        their_doc["_rev"] = "2-b"
+        return (base_doc, their_doc)
+
+    def test_ctr(self):
+        cm = ConflictMerger(max_merge_attempts=5)
+        self.assertEqual(5, cm.max_merge_attempts)
+        self.assertEqual({}, cm.resolvers)
+        self.assertEqual(0, cm.number_conflicts)
+        self.assertEqual(0, cm.number_merges)
+        self.assertEqual(0, cm.number_merge_failures)
+
+    def test_merge(self):
+        base_doc = {"_id": "1", "_rev": "1-a", "a": 1, "b": 2, "c": 3, "d": 4, "e": 5}
+        my_doc = {"_id": "1", "_rev": "1-a", "a": 10, "b": 2, "c": 30, "d": 40, "f": 6}
+        their_doc = {"_id": "1", "_rev": "2-b", "a": 1, "b": 20, "c": 30, "d": 41, "e": 5, "g": 7}
+
+        (merged_doc, conflicting_property_names) = ConflictMerger().merge(base_doc, my_doc, their_doc)
+
+        # "a" changed by me, "b" by them, "c" identically by both,
+        # "e" deleted by me, "f" added by me and "g" added by them
+        self.assertEqual({"a": 10, "b": 20, "c": 30, "f": 6, "g": 7}, merged_doc)
+        # "d" changed differently by both
+        self.assertEqual(["d"], conflicting_property_names)
+
+    def test_merge_with_resolvers(self):
+        base_doc = {"a": 1, "b": 2, "c": 3}
+        my_doc = {"a": 10, "b": 20}
+        their_doc = {"a": 11, "b": 21, "c": 4}
+
+        resolvers = {"a": max, "c": max}
+        (merged_doc, conflicting_property_names) = ConflictMerger(resolvers=resolvers).merge(
+            base_doc,
+            my_doc,
+            their_doc)
+
+        # "a" resolved, "b" has no resolver and "c" was deleted by me
+        self.assertEqual({"a": 11}, merged_doc)
+        self.assertEqual(["b", "c"], conflicting_property_names)
+
+    def test_merge_ignores_signature(self):
+        prop_name = async_model_actions.tamper._tampering_sig_prop_name
+        (merged_doc, conflicting_property_names) = ConflictMerger().merge(
+            {prop_name: "a"},
+            {prop_name: "b"},
+            {prop_name: "c"})
+        self.assertEqual({}, merged_doc)
+        self.assertEqual([], conflicting_property_names)
+
+    def test_persist_merges_non_overlapping_changes(self):
+        (base_doc, their_doc) = self._create_docs()
+        their_doc["color"] = "green"
+
+        model = MyFruitModel(doc=base_doc)
+        model.fruit = "pear"
+
+        cm = ConflictMerger()
+        responses = [
+            (False, True, None),        # PUT = conflict
+            (True, False, their_doc),   # GET current doc
+            (True, False, None),        # PUT merged doc
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            callback = mock.Mock()
+            ap = AsyncPersister(model, [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(True, False, ap)
+
+        self.assertEqual(3, len(patcher.requests))
+        merged_doc = json.loads(patcher.requests[2].body)
+        self.assertEqual("pear", merged_doc["fruit"])
+        self.assertEqual("green", merged_doc["color"])
+        self.assertEqual(their_doc["_rev"], merged_doc["_rev"])
+
+        self.assertFalse(ap.model is model)
+        self.assertEqual("pear", ap.model.fruit)
+        self.assertEqual("green", ap.model.color)
+        self.assertEqual("pear", ap.model._original_doc["fruit"])
+
+        self.assertEqual(1, cm.number_conflicts)
+        self.assertEqual(1, cm.number_merges)
+        self.assertEqual(0, cm.number_merge_failures)
+
+    def test_persist_merges_concurrent_timestamped_changes(self):
+        (base_doc, _) = self._create_docs()
+        base_doc["updated_on"] = "2016-01-15T10:00:00+00:00"
+
+        # they change the color and then, slightly later, I change the fruit
+        their_model = MyTimestampedFruitModel(doc=base_doc)
+        their_model.change_color("green", "2016-01-15T10:00:01+00:00")
+        their_doc = their_model.as_doc_for_store()
+        their_doc["_rev"] = "2-b"
+
+        my_model = MyTimestampedFruitModel(doc=base_doc)
+        my_model.change_fruit("pear", "2016-01-15T10:00:02+00:00")
+
+        responses = [
+            (False, True, None),        # PUT = conflict
+            (True, False, their_doc),   # GET current doc
+            (True, False, None),        # PUT merged doc
+        ]
+
+        # without a resolver updated_on is a true conflict
+        with CouchDBAsyncHTTPClientSequencePatcher(responses[:2]):
+            callback = mock.Mock()
+            ap = AsyncPersister(my_model, [], None, conflict_merger=ConflictMerger())
+            ap.persist(callback)
+        callback.assert_called_once_with(False, True, ap)
+
+        cm = ConflictMerger(resolvers={"updated_on": max})
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            callback = mock.Mock()
+            ap = AsyncPersister(my_model, [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(True, False, ap)
+        self.assertEqual(1, cm.number_merges)
+
+        merged_doc = json.loads(patcher.requests[2].body)
+        self.assertEqual("pear", merged_doc["fruit"])
+        self.assertEqual("green", merged_doc["color"])
+        self.assertEqual("2016-01-15T10:00:02+00:00", merged_doc["updated_on"])
+
+    def test_persist_reports_true_conflicts(self):
+        (base_doc, their_doc) = self._create_docs()
+        their_doc["fruit"] = "fig"
+
+        model = MyFruitModel(doc=base_doc)
+        model.fruit = "pear"
+
+        cm = ConflictMerger()
+        responses = [
+            (False, True, None),
+            (True, False, their_doc),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            callback = mock.Mock()
+            ap = AsyncPersister(model, [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(False, True, ap)
+        self.assertEqual(2, len(patcher.requests))
+        self.assertTrue(ap.model is model)
+        self.assertEqual(1, cm.number_conflicts)
+        self.assertEqual(0, cm.number_merges)
+        self.assertEqual(1, cm.number_merge_failures)
+
+    def test_persist_gives_up_after_max_merge_attempts(self):
+        (base_doc, their_doc) = self._create_docs()
+
+        model = MyFruitModel(doc=base_doc)
+        model.fruit = "pear"
+
+        cm = ConflictMerger(max_merge_attempts=2)
+        responses = [
+            (False, True, None),
+            (True, False, their_doc),
+            (False, True, None),
+            (True, False, their_doc),
+            (False, True, None),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as patcher:
+            callback = mock.Mock()
+            ap = AsyncPersister(model, [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(False, True, ap)
+        self.assertEqual(5, len(patcher.requests))
+        self.assertEqual(3, cm.number_conflicts)
+        self.assertEqual(1, cm.number_merge_failures)
+
+    def test_persist_without_original_doc(self):
+        model = MyFruitModel(_id=uuid.uuid4().hex, _rev="1-a", fruit="pear", color="red")
+
+        cm = ConflictMerger()
+        with CouchDBAsyncHTTPClientSequencePatcher([(False, True, None)]) as patcher:
+            callback = mock.Mock()
+            ap = AsyncPersister(model, [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(False, True, ap)
+        self.assertEqual(1, len(patcher.requests))
+        self.assertEqual(1, cm.number_merge_failures)
+
+    def test_persist_current_doc_fetch_fails(self):
+        (base_doc, their_doc) = self._create_docs()
+
+        cm = ConflictMerger()
+        responses = [
+            (False, True, None),
+            (False, False, None),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses):
+            callback = mock.Mock()
+            ap = AsyncPersister(MyFruitModel(doc=base_doc), [], None, conflict_merger=cm)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(False, True, ap)
+        self.assertEqual(1, cm.number_merge_failures)
+
+    def test_persist_updates_original_doc(self):
+        model = MyFruitModel(fruit="pear", color="red")
+        self.assertIsNone(model._original_doc)
+
+        the_id = uuid.uuid4().hex
+        the_rev = "1-%s" % uuid.uuid4().hex
+        with CouchDBAsyncHTTPClientPatcher(True, False, None, the_id, the_rev):
+            callback = mock.Mock()
+            ap = AsyncPersister(model, [], None)
+            ap.persist(callback)
+
+        callback.assert_called_once_with(True, False, ap)
+        self.assertTrue(ap.model is model)
+        self.assertEqual(the_id, model._original_doc["_id"])
+        self.assertEqual(the_rev, model._original_doc["_rev"])
+        self.assertEqual("pear", model._original_doc["fruit"])
+
+
+class AsyncBulkPersisterUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncBulkPersister class."""
+
+    def setUp(self):
+        self.io_loop = mock.Mock()
+        self._io_loop_patcher = mock.patch("tornado.ioloop.IOLoop.current", return_value=self.io_loop)
+        self._io_loop_patcher.start()
+
+    def tearDown(self):
+        self._io_loop_patcher.stop()
+        AsyncBulkPersister._batch = None
+
+    def test_persists_coalesced_into_one_bulk_docs_request(self):
+        the_models = [MyModel(doc={}), MyModel(doc={}), MyModel(doc={})]
+        the_abps = [AsyncBulkPersister(the_model, [], None) for the_model in the_models]
+        the_ids = [uuid.uuid4().hex for the_model in the_models]
+        the_revs = [uuid.uuid4().hex for the_model in the_models]
+        the_response_body = [
+            {"ok": True, "id": the_ids[0], "rev": the_revs[0]},
+            {"id": the_ids[1], "error": "conflict", "reason": "Document update conflict."},
+            {"id": the_ids[2], "error": "forbidden", "reason": "bad doc"},
+        ]
+
+        requests = []
+
+        def fetch_patch(cac, request, callback):
+            requests.append(request)
+            callback(True, False, the_response_body, None, None, cac)
+
+        name_of_method_to_patch = __name__ + ".async_model_actions.CouchDBAsyncHTTPClient.fetch"
+        with mock.patch(name_of_method_to_patch, fetch_patch):
+            with mock.patch.object(AsyncBulkPersister, "max_batch_size", len(the_models)):
+                callbacks = []
+                for the_abp in the_abps:
+                    callback = mock.Mock()
+                    callbacks.append(callback)
+                    the_abp.persist(callback)
+
+        self.assertEqual(1, len(requests))
+        self.assertTrue(requests[0].url.endswith("/_bulk_docs"))
+        self.assertEqual("POST", requests[0].method)
+        self.assertEqual(len(the_models), len(json.loads(requests[0].body)["docs"]))
+
+        self.assertEqual(1, self.io_loop.add_timeout.call_count)
+        self.assertEqual(1, self.io_loop.remove_timeout.call_count)
+        self.assertIsNone(AsyncBulkPersister._batch)
+
+        callbacks[0].assert_called_once_with(True, False, the_abps[0])
+        self.assertEqual(the_models[0]._id, the_ids[0])
+        self.assertEqual(the_models[0]._rev, the_revs[0])
+
+        callbacks[1].assert_called_once_with(False, True, the_abps[1])
+        self.assertIsNone(the_models[1]._id)
+        self.assertIsNone(the_models[1]._rev)
+
+        callbacks[2].assert_called_once_with(False, False, the_abps[2])
+        self.assertIsNone(the_models[2]._id)
+        self.assertIsNone(the_models[2]._rev)
+
+    def test_batch_not_written_until_full(self):
+        with CouchDBAsyncHTTPClientPatcher(True, False, [], None, None):
+            callback = mock.Mock()
+            the_abp = AsyncBulkPersister(MyModel(doc={}), [], None)
+            the_abp.persist(callback)
+
+            self.assertEqual(0, callback.call_count)
+            self.assertIsNotNone(AsyncBulkPersister._batch)
+            self.assertEqual(1, len(AsyncBulkPersister._batch))
+
+    def test_error_writing_batch(self):
+        with CouchDBAsyncHTTPClientPatcher(False, False, None, None, None):
+            with mock.patch.object(AsyncBulkPersister, "max_batch_size", 2):
+                callbacks = [mock.Mock(), mock.Mock()]
+                the_abps = [AsyncBulkPersister(MyModel(doc={}), [], None) for callback in callbacks]
+                for (the_abp, callback) in zip(the_abps, callbacks):
+                    the_abp.persist(callback)
+
+                for (the_abp, callback) in zip(the_abps, callbacks):
+                    callback.assert_called_once_with(False, False, the_abp)
+
+    def test_create_new_with_invalid_type_property(self):
+        with CouchDBAsyncHTTPClientPatcher(True, False, [], None, None):
+            callback = mock.Mock()
+            the_abp = AsyncBulkPersister(MyModelWithBadType(doc={}), [], None)
+            with self.assertRaises(InvalidTypeInDocForStoreException):
+                the_abp.persist(callback)
+            self.assertIsNone(AsyncBulkPersister._batch)
+
+
 class AsyncDeleterUnitTaseCase(unittest.TestCase):
     """A collection of unit tests for the AsyncDeleter class."""
 
@@ -623,6 +2050,125 @@ class AsyncDeleterUnitTaseCase(unittest.TestCase):
             ad.delete(callback)
             callback.assert_called_once_with(True, False, ad)
 
+    def test_document_cache_invalidated(self):
+        model = mock.Mock()
+        model._id = uuid.uuid4().hex
+        model._rev = uuid.uuid4().hex
+
+        the_document_cache = DocumentCache()
+        the_document_cache.put({"_id": model._id, "_rev": model._rev}, 10)
+
+        ad = AsyncDeleter(model)
+        with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+            with CouchDBAsyncHTTPClientPatcher(True,    # is_ok
+                                               False,   # is_conflict
+                                               None,    # models
+                                               None,    # _id
+                                               None):   # _rev
+                callback = mock.Mock()
+                ad.delete(callback)
+                callback.assert_called_once_with(True, False, ad)
+
+        self.assertFalse(model._id in the_document_cache)
+
+
+class MyAsyncUpdateHandlerInvoker(AsyncUpdateHandlerInvoker):
+
+    def create_model_from_doc(self, doc):
+        return MyModel(doc=doc)
+
+
+class AsyncUpdateHandlerInvokerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncUpdateHandlerInvoker class."""
+
+    def test_ctr(self):
+        delta = {"fruit": "pear"}
+        async_state = mock.Mock()
+
+        auhi = AsyncUpdateHandlerInvoker("dd", "fn", "docid", delta, async_state)
+        self.assertEqual("dd", auhi.design_doc)
+        self.assertEqual("fn", auhi.update_handler)
+        self.assertEqual("docid", auhi.document_id)
+        self.assertTrue(auhi.delta is delta)
+        self.assertTrue(auhi.async_state is async_state)
+
+        auhi = AsyncUpdateHandlerInvoker("dd", "fn", "docid", delta)
+        self.assertIsNone(auhi.async_state)
+
+    def test_create_model_from_doc_not_implemented(self):
+        auhi = AsyncUpdateHandlerInvoker("dd", "fn", "docid", {})
+        with self.assertRaises(NotImplementedError):
+            auhi.create_model_from_doc({})
+
+    def test_happy_path(self):
+        the_id = uuid.uuid4().hex
+        the_new_rev = "2-%s" % uuid.uuid4().hex
+        delta = {"fruit": "pear"}
+
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            callback = mock.Mock()
+            auhi = MyAsyncUpdateHandlerInvoker("dd", "fn", the_id, delta)
+            auhi.invoke(callback)
+
+            request = fetch_patch.call_args[0][0]
+            self.assertEqual("PUT", request.method)
+            self.assertTrue(request.url.endswith("/_design/dd/_update/fn/%s" % the_id))
+            self.assertEqual(delta, json.loads(request.body))
+
+            response = create_response(
+                request,
+                httplib.CREATED,
+                {"_id": the_id, "_rev": "1-abc", "fruit": "pear"},
+                {"X-Couch-Update-NewRev": the_new_rev})
+            fetch_patch.call_args[1]["callback"](response)
+
+        self.assertEqual(1, callback.call_count)
+        (is_ok, is_conflict, model, the_auhi) = callback.call_args[0]
+        self.assertTrue(is_ok)
+        self.assertFalse(is_conflict)
+        self.assertTrue(the_auhi is auhi)
+        self.assertEqual(the_id, model._id)
+        self.assertEqual(the_new_rev, model._rev)
+
+    def test_conflict(self):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            callback = mock.Mock()
+            auhi = MyAsyncUpdateHandlerInvoker("dd", "fn", "docid", {})
+            auhi.invoke(callback)
+            request = fetch_patch.call_args[0][0]
+            fetch_patch.call_args[1]["callback"](create_response(request, httplib.CONFLICT, {}))
+
+        callback.assert_called_once_with(False, True, None, auhi)
+
+    def test_no_new_rev(self):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            callback = mock.Mock()
+            auhi = MyAsyncUpdateHandlerInvoker("dd", "fn", "docid", {})
+            auhi.invoke(callback)
+            request = fetch_patch.call_args[0][0]
+            fetch_patch.call_args[1]["callback"](create_response(request, httplib.CREATED, {}))
+
+        callback.assert_called_once_with(False, False, None, auhi)
+
+    def test_document_cache_invalidated(self):
+        with CouchDBAsyncHTTPClientPatcher(False, False, None, None, None):
+            the_document_cache = mock.Mock()
+            with mock.patch(__name__ + ".async_model_actions.document_cache", the_document_cache):
+                callback = mock.Mock()
+                auhi = MyAsyncUpdateHandlerInvoker("dd", "fn", "docid", {})
+                auhi.invoke(callback)
+
+        the_document_cache.remove.assert_called_once_with("docid")
+        callback.assert_called_once_with(False, False, None, auhi)
+
+    def test_tampering_signer_configured(self):
+        with mock.patch(__name__ + ".async_model_actions.tampering_signer", mock.Mock()):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                auhi = MyAsyncUpdateHandlerInvoker("dd", "fn", "docid", {})
+                with self.assertRaises(TamperingSignerConfiguredException):
+                    auhi.invoke(mock.Mock())
+                self.assertEqual(0, fetch_patch.call_count)
+
 
 class AsyncCouchDBHealthCheckCheckUnitTaseCase(unittest.TestCase):
     """A collection of unit tests for the AsyncCouchDBHealthCheck class."""
@@ -662,6 +2208,1291 @@ class AsyncCouchDBHealthCheckCheckUnitTaseCase(unittest.TestCase):
 
             callback.called_once_with(True, the_achc)
 
+    def test_check_against_endpoint(self):
+        pool = EndpointPool(["http://127.0.0.1:5984/a", "http://127.0.0.1:5985/a"])
+        the_endpoint = pool.endpoints[1]
+
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            the_achc = AsyncCouchDBHealthCheck(endpoint=the_endpoint)
+            the_achc.check(mock.Mock())
+
+            request = fetch_patch.call_args[0][0]
+            self.assertEqual(request.url, the_endpoint.database + "/")
+            self.assertTrue(request.endpoint is the_endpoint)
+
+
+class DeadlinePropagationUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests confirming async actions
+    pass their deadlines to their requests.
+    """
+
+    def _assert_deadline(self, expected_deadline, action, method_name):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            getattr(action, method_name)(mock.Mock())
+            self.assertEqual(1, fetch_patch.call_count)
+            self.assertEqual(expected_deadline, fetch_patch.call_args[0][0].deadline)
+
+    def test_action_default_deadline(self):
+        self.assertIsNone(AsyncCouchDBHealthCheck().deadline)
+
+    def test_actions(self):
+        the_deadline = 2000000000.0
+        model = MyModel()
+
+        actions = [
+            (MyModelRetrieverByDocumentID(uuid.uuid4().hex, None, the_deadline), "fetch"),
+            (AsyncModelRetriever("design_doc", "key", None, the_deadline), "fetch"),
+            (AsyncModelsRetriever("design_doc", deadline=the_deadline), "fetch"),
+            (AsyncModelsRetrieverByKeys("design_doc", ["key"], deadline=the_deadline), "fetch"),
+            (AsyncPersister(model, [], None, the_deadline), "persist"),
+            (AsyncCouchDBHealthCheck(deadline=the_deadline), "check"),
+            (AsyncViewMetricsRetriever("design_doc", deadline=the_deadline), "fetch"),
+        ]
+        for (action, method_name) in actions:
+            self.assertEqual(the_deadline, action.deadline)
+            self._assert_deadline(the_deadline, action, method_name)
+
+        model = MyModel(doc={"_id": uuid.uuid4().hex, "_rev": uuid.uuid4().hex})
+        self._assert_deadline(the_deadline, AsyncDeleter(model, deadline=the_deadline), "delete")
+
+    def test_database_metrics_retriever_splits_deadline(self):
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            self._assert_deadline(1001.0, AsyncDatabaseMetricsRetriever(deadline=1003.0), "fetch")
+            self._assert_deadline(1001.5, AsyncAllViewMetricsRetriever(deadline=1003.0), "fetch")
+
+
+class EndpointPoolUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the EndpointPool and Endpoint classes."""
+
+    def _create_pool(self, number_endpoints=3, **kwargs):
+        databases = ["http://127.0.0.1:%d/database" % (5984 + i) for i in range(0, number_endpoints)]
+        return EndpointPool(databases, **kwargs)
+
+    def test_ctr(self):
+        pool = self._create_pool(2, ewma_weight=0.5, max_consecutive_failures=5, probe_interval_in_ms=42)
+        self.assertEqual(0.5, pool.ewma_weight)
+        self.assertEqual(5, pool.max_consecutive_failures)
+        self.assertEqual(42, pool.probe_interval_in_ms)
+        self.assertEqual(
+            ["http://127.0.0.1:5984/database", "http://127.0.0.1:5985/database"],
+            [endpoint.database for endpoint in pool.endpoints])
+        for endpoint in pool.endpoints:
+            self.assertTrue(endpoint.pool is pool)
+            self.assertIsNone(endpoint.ewma_latency_in_ms)
+            self.assertEqual(0, endpoint.in_flight)
+            self.assertEqual(0, endpoint.consecutive_failures)
+            self.assertFalse(endpoint.is_ejected)
+
+    def test_ewma_latency(self):
+        pool = self._create_pool(1, ewma_weight=0.5)
+        endpoint = pool.endpoints[0]
+
+        endpoint.on_request_sent()
+        endpoint.on_response(httplib.OK, 100.0)
+        self.assertEqual(100.0, endpoint.ewma_latency_in_ms)
+
+        endpoint.on_request_sent()
+        endpoint.on_response(httplib.NOT_FOUND, 200.0)
+        self.assertEqual(150.0, endpoint.ewma_latency_in_ms)
+
+        endpoint.on_request_sent()
+        endpoint.on_response(httplib.OK, None)
+        self.assertEqual(150.0, endpoint.ewma_latency_in_ms)
+        self.assertEqual(0, endpoint.in_flight)
+
+    def test_select_least_latency_and_in_flight(self):
+        pool = self._create_pool(2)
+        (e0, e1) = pool.endpoints
+        e0.ewma_latency_in_ms = 10.0
+        e1.ewma_latency_in_ms = 25.0
+        self.assertTrue(pool.select() is e0)
+
+        # 3 requests in flight to e0 makes it look slower than e1
+        e0.in_flight = 3
+        self.assertTrue(pool.select() is e1)
+
+        # endpoints without a latency estimate are preferred
+        e1.ewma_latency_in_ms = None
+        e1.in_flight = 5
+        self.assertTrue(pool.select() is e1)
+
+    def test_eject_after_consecutive_failures_and_readmit(self):
+        pool = self._create_pool(2, max_consecutive_failures=2)
+        (e0, e1) = pool.endpoints
+        e0.ewma_latency_in_ms = 1.0
+        e1.ewma_latency_in_ms = 100.0
+
+        with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+            e0.on_response(599, 1.0)
+            e0.on_response(httplib.OK, 1.0)
+            e0.on_response(httplib.SERVICE_UNAVAILABLE, 1.0)
+            self.assertFalse(e0.is_ejected)
+
+            e0.on_response(599, 1.0)
+            self.assertTrue(e0.is_ejected)
+            self.assertTrue(pool.select() is e1)
+
+            add_timeout = ioloop_patch.return_value.add_timeout
+            self.assertEqual(1, add_timeout.call_count)
+            probe = add_timeout.call_args[0][1]
+
+            # failed probe schedules another probe
+            with CouchDBAsyncHTTPClientPatcher(False, False, None, None, None):
+                probe()
+            self.assertTrue(e0.is_ejected)
+            self.assertEqual(2, add_timeout.call_count)
+
+            with CouchDBAsyncHTTPClientPatcher(True, False, None, None, None):
+                add_timeout.call_args[0][1]()
+            self.assertFalse(e0.is_ejected)
+            self.assertEqual(0, e0.consecutive_failures)
+            self.assertEqual(100.0, e0.ewma_latency_in_ms)
+            self.assertTrue(pool.select() is e0)
+
+    def test_readmitted_endpoint_starts_with_average_latency(self):
+        pool = self._create_pool(3)
+        (e0, e1, e2) = pool.endpoints
+        e0.is_ejected = True
+        e1.ewma_latency_in_ms = 10.0
+        e2.ewma_latency_in_ms = 30.0
+
+        pool.readmit(e0)
+        self.assertEqual(20.0, e0.ewma_latency_in_ms)
+
+        # the readmitted endpoint gets its share of requests rather than all of them
+        selected = []
+        for i in range(0, 50):
+            endpoint = pool.select()
+            endpoint.on_request_sent()
+            selected.append(endpoint)
+        self.assertLess(selected.count(e0), 50)
+        self.assertGreater(selected.count(e1), 0)
+
+        # no other estimates to start from
+        pool = self._create_pool(2)
+        pool.readmit(pool.endpoints[0])
+        self.assertIsNone(pool.endpoints[0].ewma_latency_in_ms)
+
+    def test_select_when_all_endpoints_ejected(self):
+        pool = self._create_pool(2)
+        for endpoint in pool.endpoints:
+            endpoint.is_ejected = True
+        self.assertIn(pool.select(), pool.endpoints)
+
+    def test_select_with_exclude(self):
+        pool = self._create_pool(2)
+        (e0, e1) = pool.endpoints
+        self.assertTrue(pool.select(exclude=e0) is e1)
+
+        # an ejected endpoint is better than the excluded endpoint
+        e1.is_ejected = True
+        self.assertTrue(pool.select(exclude=e0) is e1)
+
+        pool = self._create_pool(1)
+        self.assertIsNone(pool.select(exclude=pool.endpoints[0]))
+
+    def test_requests_routed_and_tracked(self):
+        pool = self._create_pool(2)
+        (e0, e1) = pool.endpoints
+        e0.ewma_latency_in_ms = 100.0
+
+        with mock.patch(__name__ + ".async_model_actions.endpoint_pool", pool):
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+        self.assertTrue(request.endpoint is e1)
+        self.assertEqual(request.url, e1.database + "/doc")
+
+        response = create_response(request, request_time=0.05)
+
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+            cac.fetch(request, mock.Mock())
+            self.assertEqual(1, e1.in_flight)
+            fetch_patch.call_args[1]["callback"](response)
+
+        self.assertEqual(0, e1.in_flight)
+        self.assertAlmostEqual(50.0, e1.ewma_latency_in_ms)
+
+    def test_endpoint_selected_when_request_sent(self):
+        pool = self._create_pool(2)
+        (e0, e1) = pool.endpoints
+        e0.ewma_latency_in_ms = 10.0
+        e1.ewma_latency_in_ms = 100.0
+        aq = AdmissionQueue(max_in_flight=1)
+
+        with mock.patch(__name__ + ".async_model_actions.endpoint_pool", pool):
+            with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    requests = [CouchDBAsyncHTTPRequest("doc", "GET", None) for i in range(0, 2)]
+                    for request in requests:
+                        self.assertTrue(request.endpoint is e0)
+                        CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, mock.Mock())
+                    self.assertEqual(1, aq.queue_depth)
+
+                    # e0 is ejected while the second request waits
+                    e0.is_ejected = True
+                    aq.release(10.0)
+
+                    self.assertTrue(fetch_patch.call_args[0][0] is requests[1])
+                    self.assertTrue(requests[1].endpoint is e1)
+                    self.assertEqual(e1.database + "/doc", requests[1].url)
+                    self.assertEqual(1, e1.in_flight)
+
+    def test_endpoint_selected_when_request_sent_circuit_open(self):
+        pool = self._create_pool(2)
+        (e0, e1) = pool.endpoints
+        aq = AdmissionQueue(max_in_flight=1)
+        cbs = CircuitBreakers()
+
+        with mock.patch(__name__ + ".async_model_actions.endpoint_pool", pool):
+            with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+                with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        e0.ewma_latency_in_ms = 10.0
+                        e1.ewma_latency_in_ms = 100.0
+                        CouchDBAsyncHTTPClient(httplib.OK, None).fetch(
+                            CouchDBAsyncHTTPRequest("doc", "GET", None),
+                            mock.Mock())
+
+                        callback = mock.Mock()
+                        cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                        cac.fetch(CouchDBAsyncHTTPRequest("doc", "GET", None), callback)
+                        self.assertEqual(1, aq.queue_depth)
+
+                        # e0 is ejected and e1's circuit breaker opens while the request waits
+                        e0.is_ejected = True
+                        e1_request = CouchDBAsyncHTTPRequest("doc", "GET", None, endpoint=e1)
+                        e1_circuit_breaker = cbs.circuit_breaker_for(e1_request)
+                        e1_circuit_breaker.state = CircuitBreaker.STATE_OPEN
+                        e1_circuit_breaker._opened_at = time.time()
+
+                        aq.release(10.0)
+
+                        self.assertEqual(1, fetch_patch.call_count)
+                        self.assertTrue(cac.is_circuit_open)
+                        self.assertTrue(cac.circuit_breaker is e1_circuit_breaker)
+                        callback.assert_called_once_with(False, False, None, None, None, cac)
+                        self.assertEqual(0, aq.in_flight)
+
+
+class AdmissionQueueUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AdmissionQueue class."""
+
+    def test_ctr(self):
+        aq = AdmissionQueue(max_in_flight=5, max_wait_in_ms=100)
+        self.assertEqual(5, aq.max_in_flight)
+        self.assertEqual(100, aq.max_wait_in_ms)
+        self.assertEqual(0, aq.in_flight)
+        self.assertEqual(0, aq.queue_depth)
+        self.assertEqual(0, aq.number_admitted)
+        self.assertEqual(0, aq.number_shed)
+        self.assertEqual(0.0, aq.average_wait_in_ms)
+        self.assertEqual(0.0, aq.max_observed_wait_in_ms)
+
+    def test_admit_below_max_in_flight(self):
+        aq = AdmissionQueue(max_in_flight=2)
+        on_admitted = mock.Mock()
+        aq.admit(AdmissionQueue.PRIORITY_READ, on_admitted, mock.Mock())
+        aq.admit(AdmissionQueue.PRIORITY_READ, on_admitted, mock.Mock())
+        self.assertEqual(2, on_admitted.call_count)
+        self.assertEqual(2, aq.in_flight)
+        self.assertEqual(0, aq.queue_depth)
+
+    def test_queued_requests_admitted_in_priority_order(self):
+        aq = AdmissionQueue(max_in_flight=1)
+        admitted = []
+
+        aq.admit(AdmissionQueue.PRIORITY_READ, lambda: admitted.append("first"), mock.Mock())
+        for (priority, name) in [(AdmissionQueue.PRIORITY_BULK_READ, "bulk read"),
+                                 (AdmissionQueue.PRIORITY_READ, "read"),
+                                 (AdmissionQueue.PRIORITY_WRITE, "write 1"),
+                                 (AdmissionQueue.PRIORITY_HEALTH_CHECK, "health check"),
+                                 (AdmissionQueue.PRIORITY_WRITE, "write 2")]:
+            aq.admit(priority, functools.partial(admitted.append, name), mock.Mock())
+
+        self.assertEqual(["first"], admitted)
+        self.assertEqual(5, aq.queue_depth)
+
+        for i in range(0, 5):
+            aq.release(10.0)
+
+        self.assertEqual(
+            ["first", "health check", "write 1", "write 2", "read", "bulk read"],
+            admitted)
+        self.assertEqual(0, aq.queue_depth)
+        self.assertEqual(6, aq.number_admitted)
+
+    def test_shed_after_waiting_too_long(self):
+        aq = AdmissionQueue(max_in_flight=1, max_wait_in_ms=100)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+            on_admitted = mock.Mock()
+            on_shed = mock.Mock()
+            aq.admit(AdmissionQueue.PRIORITY_READ, on_admitted, on_shed)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.5):
+            aq.release(10.0)
+
+        self.assertEqual(0, on_admitted.call_count)
+        self.assertEqual(1, on_shed.call_count)
+        self.assertEqual(1, aq.number_shed)
+        self.assertEqual(0, aq.in_flight)
+
+    def test_wait_metrics(self):
+        aq = AdmissionQueue(max_in_flight=1, max_wait_in_ms=100)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+            aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.05):
+            aq.release(10.0)
+
+        self.assertEqual(2, aq.number_admitted)
+        self.assertAlmostEqual(25.0, aq.average_wait_in_ms, places=3)
+        self.assertAlmostEqual(50.0, aq.max_observed_wait_in_ms, places=3)
+
+    def test_shed_early_when_expected_wait_too_long(self):
+        aq = AdmissionQueue(max_in_flight=1, max_wait_in_ms=100)
+        aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+        aq.ewma_service_time_in_ms = 60.0
+
+        # 1 x 60 ms expected wait is ok
+        on_shed = mock.Mock()
+        aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), on_shed)
+        self.assertEqual(0, on_shed.call_count)
+
+        # 2 x 60 ms expected wait isn't
+        aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), on_shed)
+        self.assertEqual(1, on_shed.call_count)
+        self.assertEqual(1, aq.queue_depth)
+
+        # but a higher priority request jumps the queue
+        aq.admit(AdmissionQueue.PRIORITY_WRITE, mock.Mock(), on_shed)
+        self.assertEqual(1, on_shed.call_count)
+        self.assertEqual(2, aq.queue_depth)
+
+    def test_request_priorities(self):
+        self.assertEqual(
+            AdmissionQueue.PRIORITY_READ,
+            CouchDBAsyncHTTPRequest("doc", "GET", None).priority)
+        self.assertEqual(
+            AdmissionQueue.PRIORITY_WRITE,
+            CouchDBAsyncHTTPRequest("doc", "PUT", {}).priority)
+
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            AsyncCouchDBHealthCheck().check(mock.Mock())
+            self.assertEqual(AdmissionQueue.PRIORITY_HEALTH_CHECK, fetch_patch.call_args[0][0].priority)
+
+            AsyncModelsRetriever("design_doc").fetch(mock.Mock())
+            self.assertEqual(AdmissionQueue.PRIORITY_BULK_READ, fetch_patch.call_args[0][0].priority)
+
+    def test_cac_waits_for_admission(self):
+        aq = AdmissionQueue(max_in_flight=1)
+
+        with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                requests = [CouchDBAsyncHTTPRequest("doc%d" % i, "GET", None) for i in range(0, 2)]
+                callbacks = [mock.Mock() for request in requests]
+                for (request, callback) in zip(requests, callbacks):
+                    CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, callback)
+
+                self.assertEqual(1, fetch_patch.call_count)
+                self.assertEqual(1, aq.queue_depth)
+
+                fetch_patch.call_args[1]["callback"](create_response(requests[0], body={}))
+                self.assertEqual(1, callbacks[0].call_count)
+                self.assertEqual(2, fetch_patch.call_count)
+                self.assertTrue(fetch_patch.call_args[0][0] is requests[1])
+                self.assertEqual(1, aq.in_flight)
+
+                fetch_patch.call_args[1]["callback"](create_response(requests[1], body={}))
+                self.assertEqual(1, callbacks[1].call_count)
+                self.assertEqual(0, aq.in_flight)
+
+    def test_queued_request_timeout_recalculated_when_sent(self):
+        aq = AdmissionQueue(max_in_flight=1)
+
+        with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()):
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                        requests = [
+                            CouchDBAsyncHTTPRequest("doc%d" % i, "GET", None, deadline=1002.0)
+                            for i in range(0, 2)
+                        ]
+                        for request in requests:
+                            CouchDBAsyncHTTPClient(httplib.OK, None).fetch(request, mock.Mock())
+                        self.assertEqual(1, aq.queue_depth)
+                        self.assertAlmostEqual(2.0, requests[1].request_timeout)
+
+                    # the second request waited 1.5 seconds in the queue
+                    with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.5):
+                        fetch_patch.call_args[1]["callback"](create_response(requests[0], body={}))
+
+                    self.assertTrue(fetch_patch.call_args[0][0] is requests[1])
+                    self.assertAlmostEqual(0.5, requests[1].request_timeout)
+                    self.assertAlmostEqual(0.5, requests[1].connect_timeout)
+
+    def test_cac_shed(self):
+        aq = AdmissionQueue(max_in_flight=1, max_wait_in_ms=0)
+        aq.ewma_service_time_in_ms = 1.0
+
+        with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                CouchDBAsyncHTTPClient(httplib.OK, None).fetch(
+                    CouchDBAsyncHTTPRequest("doc", "GET", None),
+                    mock.Mock())
+
+                callback = mock.Mock()
+                cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                cac.fetch(CouchDBAsyncHTTPRequest("doc", "GET", None), callback)
+
+                self.assertEqual(1, fetch_patch.call_count)
+
+        self.assertTrue(cac.is_shed)
+        callback.assert_called_once_with(False, False, None, None, None, cac)
+
+    def test_expired_requests_not_sent(self):
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=1001.0)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.0):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                cac.fetch(request, callback)
+
+        self.assertEqual(0, fetch_patch.call_count)
+        self.assertTrue(cac.is_shed)
+        callback.assert_called_once_with(False, False, None, None, None, cac)
+
+    def test_queued_requests_shed_when_deadline_passes(self):
+        aq = AdmissionQueue(max_in_flight=1)
+
+        with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+            with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+                on_admitted = mock.Mock()
+                on_shed = mock.Mock()
+                aq.admit(AdmissionQueue.PRIORITY_READ, on_admitted, on_shed, 1000.1)
+                self.assertEqual(1, aq.queue_depth)
+
+            with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.2):
+                aq.release(10.0)
+
+            self.assertEqual(0, on_admitted.call_count)
+            self.assertEqual(1, on_shed.call_count)
+            ioloop_patch.return_value.remove_timeout.assert_called_once_with(
+                ioloop_patch.return_value.add_timeout.return_value)
+
+    def test_queued_requests_shed_without_waiting_for_release(self):
+        aq = AdmissionQueue(max_in_flight=1)
+
+        with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+            add_timeout = ioloop_patch.return_value.add_timeout
+
+            with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+                on_admitted = mock.Mock()
+                on_shed = mock.Mock()
+                aq.admit(AdmissionQueue.PRIORITY_READ, on_admitted, on_shed, 1000.04)
+                aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+                self.assertEqual(2, aq.queue_depth)
+
+            self.assertEqual(1, add_timeout.call_count)
+            self.assertAlmostEqual(0.04, add_timeout.call_args[0][0].total_seconds(), places=3)
+
+            # the deadline passes while every slot is still in use
+            add_timeout.call_args[0][1]()
+            self.assertEqual(1, on_shed.call_count)
+            self.assertEqual(1, aq.number_shed)
+            self.assertEqual(1, aq.queue_depth)
+
+            # the shed request is skipped when a slot is released
+            aq.release(10.0)
+            self.assertEqual(0, on_admitted.call_count)
+            self.assertEqual(1, on_shed.call_count)
+            self.assertEqual(0, aq.queue_depth)
+            self.assertEqual(1, aq.in_flight)
+            self.assertEqual(2, aq.number_admitted)
+
+    def test_shed_early_when_expected_wait_past_deadline(self):
+        aq = AdmissionQueue(max_in_flight=1)
+        aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), mock.Mock())
+        aq.ewma_service_time_in_ms = 60.0
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            on_shed = mock.Mock()
+            aq.admit(AdmissionQueue.PRIORITY_READ, mock.Mock(), on_shed, 1000.05)
+        self.assertEqual(1, on_shed.call_count)
+        self.assertEqual(0, aq.queue_depth)
+
+    def test_long_polls_bypass_admission_queue(self):
+        aq = AdmissionQueue(max_in_flight=0)
+
+        with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                AsyncChangesFollower().start()
+                self.assertEqual(1, fetch_patch.call_count)
+                self.assertEqual(0, aq.queue_depth)
+
+
+class CircuitBreakerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the CircuitBreaker
+    and CircuitBreakers classes.
+    """
+
+    def _create_circuit_breaker(self, on_state_change=None):
+        return CircuitBreaker(
+            "cb",
+            failure_rate_threshold=0.5,
+            min_number_responses=4,
+            window_size=4,
+            open_duration_in_ms=1000,
+            on_state_change=on_state_change)
+
+    def test_ctr(self):
+        cb = CircuitBreaker("cb")
+        self.assertEqual("cb", cb.name)
+        self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+        self.assertEqual(0, cb.number_rejected)
+        self.assertEqual(0.0, cb.failure_rate)
+
+    def test_opens_at_failure_rate_threshold(self):
+        on_state_change = mock.Mock()
+        cb = self._create_circuit_breaker(on_state_change)
+
+        # not enough responses to open
+        cb.on_response(True)
+        self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+        self.assertEqual(1.0, cb.failure_rate)
+
+        for is_failure in [False, False, False]:
+            self.assertTrue(cb.allow_request())
+            cb.on_response(is_failure)
+        self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+        self.assertEqual(0.25, cb.failure_rate)
+
+        # the first failure ages out of the window
+        cb.on_response(True)
+        self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+        self.assertEqual(0.25, cb.failure_rate)
+
+        cb.on_response(True)
+        self.assertEqual(CircuitBreaker.STATE_OPEN, cb.state)
+        on_state_change.assert_called_once_with(cb, CircuitBreaker.STATE_CLOSED, CircuitBreaker.STATE_OPEN)
+
+        self.assertFalse(cb.allow_request())
+        self.assertEqual(1, cb.number_rejected)
+
+    def test_half_open_then_closed(self):
+        on_state_change = mock.Mock()
+        cb = self._create_circuit_breaker(on_state_change)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            for i in range(0, 4):
+                cb.on_response(True)
+        self.assertEqual(CircuitBreaker.STATE_OPEN, cb.state)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.5):
+            self.assertFalse(cb.allow_request())
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.0):
+            # one trial request at a time
+            self.assertTrue(cb.allow_request())
+            self.assertEqual(CircuitBreaker.STATE_HALF_OPEN, cb.state)
+            self.assertFalse(cb.allow_request())
+
+            cb.on_response(False, is_trial=True)
+
+        self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+        self.assertEqual(0.0, cb.failure_rate)
+        self.assertTrue(cb.allow_request())
+        self.assertEqual(
+            [
+                mock.call(cb, CircuitBreaker.STATE_CLOSED, CircuitBreaker.STATE_OPEN),
+                mock.call(cb, CircuitBreaker.STATE_OPEN, CircuitBreaker.STATE_HALF_OPEN),
+                mock.call(cb, CircuitBreaker.STATE_HALF_OPEN, CircuitBreaker.STATE_CLOSED),
+            ],
+            on_state_change.call_args_list)
+
+    def test_half_open_then_open(self):
+        cb = self._create_circuit_breaker()
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            for i in range(0, 4):
+                cb.on_response(True)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.0):
+            self.assertTrue(cb.allow_request())
+            cb.on_response(True, is_trial=True)
+            self.assertEqual(CircuitBreaker.STATE_OPEN, cb.state)
+            self.assertFalse(cb.allow_request())
+
+    def test_abandoned_trial_request(self):
+        cb = self._create_circuit_breaker()
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            for i in range(0, 4):
+                cb.on_response(True)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.0):
+            self.assertTrue(cb.allow_request())
+            cb.on_abandoned(is_trial=True)
+            self.assertTrue(cb.allow_request())
+
+    def test_stale_responses_ignored_while_half_open(self):
+        cb = self._create_circuit_breaker()
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+            for i in range(0, 4):
+                cb.on_response(True)
+
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1001.0):
+            self.assertTrue(cb.allow_request())
+
+            # late responses to requests sent before the circuit breaker
+            # opened neither close it nor free the trial request's slot
+            cb.on_response(False)
+            cb.on_abandoned()
+            self.assertEqual(CircuitBreaker.STATE_HALF_OPEN, cb.state)
+            self.assertFalse(cb.allow_request())
+
+            cb.on_response(False, is_trial=True)
+            self.assertEqual(CircuitBreaker.STATE_CLOSED, cb.state)
+
+    def test_circuit_breakers_per_endpoint(self):
+        cbs = CircuitBreakers(min_number_responses=7)
+
+        with mock.patch(__name__ + ".async_model_actions.database", "http://127.0.0.1:5984/db"):
+            cb1 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("doc1", "GET", None))
+            cb2 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("_design/dd/_view/v", "GET", None))
+
+        self.assertTrue(cb1 is cb2)
+        self.assertEqual("http://127.0.0.1:5984/db", cb1.name)
+        self.assertEqual(7, cb1.min_number_responses)
+
+        endpoint = EndpointPool(["http://127.0.0.2:5984/db"]).endpoints[0]
+        cb3 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("doc1", "GET", None, endpoint=endpoint))
+        self.assertEqual("http://127.0.0.2:5984/db", cb3.name)
+
+    def test_circuit_breakers_per_design_doc(self):
+        cbs = CircuitBreakers(per_design_doc=True)
+
+        with mock.patch(__name__ + ".async_model_actions.database", "http://127.0.0.1:5984/db"):
+            cb1 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("doc1", "GET", None))
+            cb2 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("_design/dd/_view/v?key=1", "GET", None))
+            cb3 = cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("_design/dd", "GET", None))
+
+        self.assertEqual("http://127.0.0.1:5984/db", cb1.name)
+        self.assertEqual("http://127.0.0.1:5984/db/_design/dd", cb2.name)
+        self.assertTrue(cb2 is cb3)
+
+    def test_cac_fails_fast_while_open(self):
+        cbs = CircuitBreakers(min_number_responses=1, window_size=1)
+
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                cac.fetch(request, mock.Mock())
+                fetch_patch.call_args[1]["callback"](create_response(request, 599, body={}))
+                self.assertEqual(CircuitBreaker.STATE_OPEN, cac.circuit_breaker.state)
+
+                callback = mock.Mock()
+                cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                cac.fetch(CouchDBAsyncHTTPRequest("doc", "GET", None), callback)
+
+                self.assertEqual(1, fetch_patch.call_count)
+                self.assertTrue(cac.is_circuit_open)
+                self.assertFalse(cac.is_shed)
+                callback.assert_called_once_with(False, False, None, None, None, cac)
+
+    def test_cac_reports_trial_requests(self):
+        cbs = CircuitBreakers(min_number_responses=1, window_size=1)
+
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                    stale_request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                    CouchDBAsyncHTTPClient(httplib.OK, None).fetch(stale_request, mock.Mock())
+                    stale_callback = fetch_patch.call_args[1]["callback"]
+
+                    request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                    cac.fetch(request, mock.Mock())
+                    fetch_patch.call_args[1]["callback"](create_response(request, 599, body={}))
+                    self.assertEqual(CircuitBreaker.STATE_OPEN, cac.circuit_breaker.state)
+
+                with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1010.0):
+                    request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                    cac.fetch(request, mock.Mock())
+                    self.assertEqual(CircuitBreaker.STATE_HALF_OPEN, cac.circuit_breaker.state)
+                    trial_callback = fetch_patch.call_args[1]["callback"]
+
+                    stale_callback(create_response(stale_request, httplib.OK, body={}))
+                    self.assertEqual(CircuitBreaker.STATE_HALF_OPEN, cac.circuit_breaker.state)
+
+                    trial_callback(create_response(request, httplib.OK, body={}))
+                    self.assertEqual(CircuitBreaker.STATE_CLOSED, cac.circuit_breaker.state)
+
+    def test_cac_deadline_timeouts_are_not_failures(self):
+        cbs = CircuitBreakers(min_number_responses=1, window_size=1)
+        pool = EndpointPool(["http://127.0.0.2:5984/db"], max_consecutive_failures=1)
+
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+            with mock.patch(__name__ + ".async_model_actions.endpoint_pool", pool):
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=time.time() + 0.05)
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                    cac.fetch(request, mock.Mock())
+
+                    # the request timed out because of the caller's deadline
+                    with mock.patch(__name__ + ".async_model_actions.time.time", return_value=request.deadline):
+                        fetch_patch.call_args[1]["callback"](create_response(request, 599, body={}))
+
+                    self.assertEqual(CircuitBreaker.STATE_CLOSED, cac.circuit_breaker.state)
+                    self.assertFalse(pool.endpoints[0].is_ejected)
+                    self.assertEqual(0, pool.endpoints[0].in_flight)
+
+                    # a 599 well before the deadline is still a failure
+                    request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=time.time() + 10)
+                    cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                    cac.fetch(request, mock.Mock())
+                    with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()):
+                        fetch_patch.call_args[1]["callback"](create_response(request, 599, body={}))
+
+                    self.assertEqual(CircuitBreaker.STATE_OPEN, cac.circuit_breaker.state)
+                    self.assertTrue(pool.endpoints[0].is_ejected)
+
+    def test_cac_client_errors_are_not_failures(self):
+        cbs = CircuitBreakers(min_number_responses=1, window_size=1)
+
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                request = CouchDBAsyncHTTPRequest("doc", "GET", None)
+                cac = CouchDBAsyncHTTPClient(httplib.OK, None)
+                cac.fetch(request, mock.Mock())
+                fetch_patch.call_args[1]["callback"](create_response(request, httplib.NOT_FOUND, body={}))
+                self.assertEqual(CircuitBreaker.STATE_CLOSED, cac.circuit_breaker.state)
+
+    def test_health_check_exposes_circuit_breaker_state(self):
+        cbs = CircuitBreakers(min_number_responses=1, window_size=1)
+
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                acdbhc = AsyncCouchDBHealthCheck()
+                acdbhc.check(callback)
+                request = fetch_patch.call_args[0][0]
+                fetch_patch.call_args[1]["callback"](create_response(request, 599, body={}))
+                callback.assert_called_once_with(False, acdbhc)
+                self.assertEqual(CircuitBreaker.STATE_OPEN, acdbhc.circuit_breaker_state)
+
+                callback = mock.Mock()
+                acdbhc = AsyncCouchDBHealthCheck()
+                acdbhc.check(callback)
+                self.assertEqual(1, fetch_patch.call_count)
+                callback.assert_called_once_with(False, acdbhc)
+                self.assertEqual(CircuitBreaker.STATE_OPEN, acdbhc.circuit_breaker_state)
+
+        acdbhc = AsyncCouchDBHealthCheck()
+        self.assertIsNone(acdbhc.circuit_breaker_state)
+
+
+class AsyncActionUnsentRequestUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for async actions' ```is_shed```
+    and ```is_circuit_open``` attributes.
+    """
+
+    def _open_circuit_breakers(self):
+        cbs = CircuitBreakers()
+        cbs.circuit_breaker_for(CouchDBAsyncHTTPRequest("", "GET", None))._change_state(CircuitBreaker.STATE_OPEN)
+        return cbs
+
+    def test_ctr(self):
+        amr = MyModelRetrieverByDocumentID(uuid.uuid4().hex, None)
+        self.assertFalse(amr.is_shed)
+        self.assertFalse(amr.is_circuit_open)
+
+    def test_shed(self):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+            callback = mock.Mock()
+            amr = MyModelRetrieverByDocumentID(uuid.uuid4().hex, None, deadline=time.time() - 1)
+            amr.fetch(callback)
+            self.assertEqual(0, fetch_patch.call_count)
+
+        callback.assert_called_once_with(False, None, amr)
+        self.assertTrue(amr.is_shed)
+        self.assertFalse(amr.is_circuit_open)
+
+    def test_circuit_open(self):
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", self._open_circuit_breakers()):
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                callback = mock.Mock()
+                ap = AsyncPersister(MyModel(), [], None)
+                ap.persist(callback)
+                self.assertEqual(0, fetch_patch.call_count)
+
+                adr = AsyncDeleter(MyModel(doc={"_id": "doc", "_rev": "1-a"}), None)
+                adr.delete(mock.Mock())
+
+        callback.assert_called_once_with(False, False, ap)
+        self.assertTrue(ap.is_circuit_open)
+        self.assertFalse(ap.is_shed)
+        self.assertTrue(adr.is_circuit_open)
+
+    def test_not_set_when_couchdb_responds(self):
+        with CouchDBAsyncHTTPClientPatcher(False, False, None, None, None):
+            amr = MyModelRetrieverByDocumentID(uuid.uuid4().hex, None)
+            amr.fetch(mock.Mock())
+        self.assertFalse(amr.is_shed)
+        self.assertFalse(amr.is_circuit_open)
+
+    def test_view_retrievers(self):
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", self._open_circuit_breakers()):
+            amr = AsyncModelsRetrieverPagingUnitTaseCase.MyModelsRetriever(uuid.uuid4().hex)
+            amr.fetch(mock.Mock())
+            self.assertTrue(amr.is_circuit_open)
+
+            amr = AsyncModelsRetrieverPagingUnitTaseCase.MyModelsRetriever(uuid.uuid4().hex)
+            amr.fetch_page(mock.Mock())
+            self.assertTrue(amr.is_circuit_open)
+
+            amr = AsyncModelsRetrieverByDocumentIDs(["a", "b"])
+            amr.fetch(mock.Mock())
+            self.assertTrue(amr.is_circuit_open)
+
+    def test_batched_fetches_by_document_id(self):
+        with mock.patch(__name__ + ".async_model_actions.batch_fetches_by_document_id", True):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                amr = MyModelRetrieverByDocumentID(uuid.uuid4().hex, None, deadline=time.time() - 1)
+                amr.fetch(mock.Mock())
+                ioloop_patch.return_value.add_callback.call_args[0][0]()
+        self.assertTrue(amr.is_shed)
+
+    def test_composite_actions(self):
+        with mock.patch(__name__ + ".async_model_actions.circuit_breakers", self._open_circuit_breakers()):
+            callback = mock.Mock()
+            admr = AsyncDatabaseMetricsRetriever()
+            admr.fetch(callback)
+
+        callback.assert_called_once_with(False, None, admr)
+        self.assertTrue(admr.is_circuit_open)
+
+        aavmr = AsyncAllViewMetricsRetriever()
+        aavmr._callback = mock.Mock()
+        avmr = AsyncViewMetricsRetriever("fruit")
+        avmr.is_shed = True
+        aavmr._on_avmr_fetch_done(False, None, avmr)
+        self.assertTrue(aavmr.is_shed)
+
+
+class ReadHedgerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the ReadHedger class."""
+
+    def test_ctr(self):
+        rh = ReadHedger(max_hedge_ratio=0.1, percentile=99, min_number_samples=10)
+        self.assertEqual(0.1, rh.max_hedge_ratio)
+        self.assertEqual(99, rh.percentile)
+        self.assertEqual(10, rh.min_number_samples)
+        self.assertEqual(0, rh.number_requests)
+        self.assertEqual(0, rh.number_hedges)
+        self.assertEqual(0, rh.number_hedge_wins)
+
+    def test_no_hedge_delay_until_min_number_samples(self):
+        rh = ReadHedger(min_number_samples=10)
+        for i in range(0, 9):
+            rh.on_response(float(i))
+            self.assertIsNone(rh.hedge_delay_in_ms())
+        rh.on_response(9.0)
+        self.assertIsNotNone(rh.hedge_delay_in_ms())
+
+    def test_hedge_delay_is_percentile(self):
+        rh = ReadHedger(percentile=95, min_number_samples=100)
+        for i in range(100, 0, -1):
+            rh.on_response(float(i))
+        self.assertEqual(96.0, rh.hedge_delay_in_ms())
+
+        # only the most recent max_number_samples latencies are used
+        rh = ReadHedger(percentile=50, min_number_samples=2, max_number_samples=2)
+        for latency_in_ms in [1000.0, 1.0, 3.0]:
+            rh.on_response(latency_in_ms)
+        self.assertEqual(3.0, rh.hedge_delay_in_ms())
+
+    def test_hedge_delay_recalculation_interval(self):
+        rh = ReadHedger(percentile=50, min_number_samples=2, max_number_samples=2, recalculation_interval=3)
+        for latency_in_ms in [1.0, 1.0]:
+            rh.on_response(latency_in_ms)
+        self.assertEqual(1.0, rh.hedge_delay_in_ms())
+
+        # the hedge delay isn't recalculated on every response
+        for latency_in_ms in [5.0, 5.0]:
+            rh.on_response(latency_in_ms)
+            self.assertEqual(1.0, rh.hedge_delay_in_ms())
+
+        rh.on_response(5.0)
+        self.assertEqual(5.0, rh.hedge_delay_in_ms())
+
+    def test_hedge_budget(self):
+        rh = ReadHedger(max_hedge_ratio=0.25, max_hedge_tokens=1)
+
+        for i in range(0, 3):
+            rh.on_request()
+        self.assertFalse(rh.acquire_hedge())
+
+        rh.on_request()
+        self.assertTrue(rh.acquire_hedge())
+        self.assertFalse(rh.acquire_hedge())
+        self.assertEqual(1, rh.number_hedges)
+
+        # unused tokens are capped at max_hedge_tokens
+        for i in range(0, 100):
+            rh.on_request()
+        self.assertTrue(rh.acquire_hedge())
+        self.assertFalse(rh.acquire_hedge())
+        self.assertEqual(104, rh.number_requests)
+
+    _doc = {"_id": "doc", "_rev": "1-a"}
+
+    def _create_hedger(self):
+        rh = ReadHedger(max_hedge_ratio=1.0, min_number_samples=1)
+        rh.on_response(20.0)
+        return rh
+
+    def _fetch(self, hedge=True, method="GET"):
+        callback = mock.Mock()
+        cac = CouchDBAsyncHTTPClient(httplib.OK, None, hedge=hedge)
+        request = CouchDBAsyncHTTPRequest("doc", method, None if method == "GET" else {})
+        cac.fetch(request, callback)
+        return (cac, request, callback)
+
+    def test_hedge_sent_and_first_response_wins(self):
+        rh = self._create_hedger()
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    (cac, request, callback) = self._fetch()
+
+                    io_loop = ioloop_patch.return_value
+                    self.assertEqual(1, io_loop.add_timeout.call_count)
+                    self.assertEqual(20, io_loop.add_timeout.call_args[0][0].total_seconds() * 1000)
+                    primary_callback = fetch_patch.call_args[1]["callback"]
+
+                    # no response within the hedge delay so the hedge is sent
+                    io_loop.add_timeout.call_args[0][1]()
+                    self.assertEqual(2, fetch_patch.call_count)
+                    self.assertTrue(cac.is_hedge_sent)
+                    hedge_request = fetch_patch.call_args[0][0]
+                    self.assertFalse(hedge_request is request)
+                    self.assertEqual(request.url, hedge_request.url)
+
+                    # the hedge's response arrives first and wins
+                    fetch_patch.call_args[1]["callback"](create_response(hedge_request, body=self._doc))
+                    self.assertEqual(1, callback.call_count)
+                    self.assertTrue(callback.call_args[0][0])
+                    self.assertTrue(cac.is_hedge_winner)
+
+                    # the original request's response is ignored
+                    primary_callback(create_response(request, body=self._doc))
+                    self.assertEqual(1, callback.call_count)
+
+        self.assertEqual(1, rh.number_hedges)
+        self.assertEqual(1, rh.number_hedge_wins)
+
+    def test_failed_hedge_does_not_win(self):
+        rh = self._create_hedger()
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    (cac, request, callback) = self._fetch()
+                    primary_callback = fetch_patch.call_args[1]["callback"]
+
+                    ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                    self.assertTrue(cac.is_hedge_sent)
+                    hedge_request = fetch_patch.call_args[0][0]
+
+                    # the hedge fails fast so the original request's response is used
+                    fetch_patch.call_args[1]["callback"](create_response(hedge_request, 599))
+                    self.assertEqual(0, callback.call_count)
+
+                    primary_callback(create_response(request, body=self._doc))
+                    self.assertEqual(1, callback.call_count)
+                    self.assertTrue(callback.call_args[0][0])
+                    self.assertFalse(cac.is_hedge_winner)
+
+        self.assertEqual(0, rh.number_hedge_wins)
+
+    def test_hedge_counted_by_admission_queue(self):
+        rh = self._create_hedger()
+
+        # no room for the hedge so it's not sent and no hedge token is spent
+        aq = AdmissionQueue(max_in_flight=1)
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        (cac, request, callback) = self._fetch()
+                        ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                        self.assertEqual(1, fetch_patch.call_count)
+                        self.assertFalse(cac.is_hedge_sent)
+                        self.assertEqual(0, rh.number_hedges)
+
+        aq = AdmissionQueue(max_in_flight=2)
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch(__name__ + ".async_model_actions.admission_queue", aq):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        (cac, request, callback) = self._fetch()
+                        primary_callback = fetch_patch.call_args[1]["callback"]
+                        ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                        self.assertTrue(cac.is_hedge_sent)
+                        self.assertEqual(2, aq.in_flight)
+                        hedge_request = fetch_patch.call_args[0][0]
+
+                        fetch_patch.call_args[1]["callback"](create_response(hedge_request, body=self._doc))
+                        self.assertEqual(1, aq.in_flight)
+
+                        primary_callback(create_response(request, body=self._doc))
+                        self.assertEqual(0, aq.in_flight)
+
+    def test_hedge_not_sent_when_circuit_breaker_open(self):
+        rh = self._create_hedger()
+        cbs = CircuitBreakers()
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch(__name__ + ".async_model_actions.circuit_breakers", cbs):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        (cac, request, callback) = self._fetch()
+                        cac.circuit_breaker._change_state(CircuitBreaker.STATE_OPEN)
+
+                        ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                        self.assertEqual(1, fetch_patch.call_count)
+                        self.assertFalse(cac.is_hedge_sent)
+                        self.assertEqual(0, rh.number_hedges)
+
+    def test_hedge_sent_to_different_endpoint(self):
+        rh = self._create_hedger()
+        pool = EndpointPool(["http://127.0.0.1:5984/db", "http://127.0.0.2:5984/db"])
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch(__name__ + ".async_model_actions.endpoint_pool", pool):
+                with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                    with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                        (cac, request, callback) = self._fetch()
+                        self.assertTrue(request.endpoint is pool.endpoints[0])
+
+                        ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                        hedge_request = fetch_patch.call_args[0][0]
+                        self.assertTrue(hedge_request.endpoint is pool.endpoints[1])
+                        self.assertEqual("http://127.0.0.2:5984/db/doc", hedge_request.url)
+                        self.assertEqual("http://127.0.0.1:5984/db/doc", request.url)
+                        self.assertEqual([1, 1], [endpoint.in_flight for endpoint in pool.endpoints])
+
+                        fetch_patch.call_args[1]["callback"](create_response(hedge_request, body=self._doc))
+                        self.assertEqual([1, 0], [endpoint.in_flight for endpoint in pool.endpoints])
+
+    def test_hedge_timeout_recalculated_from_deadline(self):
+        rh = self._create_hedger()
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.0):
+                        request = CouchDBAsyncHTTPRequest("doc", "GET", None, deadline=1001.0)
+                        CouchDBAsyncHTTPClient(httplib.OK, None, hedge=True).fetch(request, mock.Mock())
+
+                    with mock.patch(__name__ + ".async_model_actions.time.time", return_value=1000.75):
+                        ioloop_patch.return_value.add_timeout.call_args[0][1]()
+
+                    hedge_request = fetch_patch.call_args[0][0]
+                    self.assertFalse(hedge_request is request)
+                    self.assertAlmostEqual(0.25, hedge_request.request_timeout)
+                    self.assertAlmostEqual(0.25, hedge_request.connect_timeout)
+                    self.assertAlmostEqual(1.0, request.request_timeout)
+
+    def test_hedge_timer_removed_on_response(self):
+        rh = self._create_hedger()
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    (cac, request, callback) = self._fetch()
+                    fetch_patch.call_args[1]["callback"](create_response(request, body=self._doc))
+
+                    io_loop = ioloop_patch.return_value
+                    io_loop.remove_timeout.assert_called_once_with(io_loop.add_timeout.return_value)
+
+                    self.assertEqual(1, fetch_patch.call_count)
+                    self.assertEqual(1, callback.call_count)
+                    self.assertFalse(cac.is_hedge_sent)
+                    self.assertFalse(cac.is_hedge_winner)
+
+        self.assertEqual(0, rh.number_hedges)
+        self.assertEqual(2, len(rh._latencies_in_ms))
+
+    def test_no_hedge_without_budget(self):
+        rh = self._create_hedger()
+        rh.max_hedge_ratio = 0.0
+
+        with mock.patch(__name__ + ".async_model_actions.read_hedger", rh):
+            with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+                with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch") as fetch_patch:
+                    (cac, request, callback) = self._fetch()
+                    ioloop_patch.return_value.add_timeout.call_args[0][1]()
+                    self.assertEqual(1, fetch_patch.call_count)
+                    self.assertFalse(cac.is_hedge_sent)
+
+    def test_no_hedge_timer(self):
+        with mock.patch("tornado.ioloop.IOLoop.current", return_value=mock.Mock()) as ioloop_patch:
+            with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch"):
+                # no hedger
+                self._fetch()
+
+                # not enough samples
+                with mock.patch(__name__ + ".async_model_actions.read_hedger", ReadHedger()):
+                    self._fetch()
+
+                with mock.patch(__name__ + ".async_model_actions.read_hedger", self._create_hedger()):
+                    # hedging not requested
+                    self._fetch(hedge=False)
+
+                    # only GETs are hedged
+                    self._fetch(method="PUT")
+
+        self.assertEqual(0, ioloop_patch.return_value.add_timeout.call_count)
+
+    def test_retrievers_hedge(self):
+        with mock.patch("tornado.httpclient.AsyncHTTPClient.fetch"):
+            with mock.patch(__name__ + ".async_model_actions.CouchDBAsyncHTTPClient") as cac_patch:
+                AsyncModelRetrieverByDocumentID("doc", None).fetch(mock.Mock())
+                self.assertTrue(cac_patch.call_args[1]["hedge"])
+
+                AsyncModelRetriever("design_doc", "key", None).fetch(mock.Mock())
+                self.assertTrue(cac_patch.call_args[1]["hedge"])
+
+                AsyncModelsRetriever("design_doc").fetch(mock.Mock())
+                self.assertFalse(cac_patch.call_args[1]["hedge"])
+
+
+class AsyncChangesFollowerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncChangesFollower class."""
+
+    def setUp(self):
+        self.io_loop = mock.Mock()
+        self._io_loop_patcher = mock.patch("tornado.ioloop.IOLoop.current", return_value=self.io_loop)
+        self._io_loop_patcher.start()
+
+        self.dir_name = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir_name, ignore_errors=True)
+        self._io_loop_patcher.stop()
+
+    def test_ctr(self):
+        the_async_state = mock.Mock()
+        acf = AsyncChangesFollower(async_state=the_async_state)
+        self.assertEqual("now", acf.since)
+        self.assertIsNone(acf.checkpoint_filename)
+        self.assertFalse(acf.is_running)
+        self.assertTrue(acf.async_state is the_async_state)
+
+    def test_changes_published_to_listeners(self):
+        the_doc_id_1 = uuid.uuid4().hex
+        the_rev_1 = uuid.uuid4().hex
+        the_doc_id_2 = uuid.uuid4().hex
+        the_rev_2 = uuid.uuid4().hex
+        the_response_body = {
+            "results": [
+                {"seq": 10, "id": the_doc_id_1, "changes": [{"rev": the_rev_1}]},
+                {"seq": 11, "id": the_doc_id_2, "changes": [{"rev": the_rev_2}], "deleted": True},
+            ],
+            "last_seq": 11,
+        }
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]) as patcher:
+            listener = mock.Mock()
+            acf = AsyncChangesFollower(since=9)
+            acf.add_listener(listener)
+            acf.start()
+
+            self.assertEqual(
+                listener.call_args_list,
+                [
+                    mock.call(the_doc_id_1, the_rev_1, False),
+                    mock.call(the_doc_id_2, the_rev_2, True),
+                ])
+            self.assertEqual(11, acf.since)
+
+            self.assertEqual(2, len(patcher.requests))
+            self.assertIn("feed=longpoll", patcher.requests[0].url)
+            self.assertIn("since=9", patcher.requests[0].url)
+            self.assertIn("since=11", patcher.requests[1].url)
+
+            acf.stop()
+            self.assertFalse(acf.is_running)
+
+    def test_failing_listener_does_not_stop_publishing(self):
+        the_response_body = {
+            "results": [
+                {"seq": 10, "id": uuid.uuid4().hex, "changes": [{"rev": uuid.uuid4().hex}]},
+            ],
+            "last_seq": 10,
+        }
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]):
+            bad_listener = mock.Mock(side_effect=Exception())
+            good_listener = mock.Mock()
+            acf = AsyncChangesFollower()
+            acf.add_listener(bad_listener)
+            acf.add_listener(good_listener)
+            acf.start()
+
+            self.assertEqual(1, bad_listener.call_count)
+            self.assertEqual(1, good_listener.call_count)
+
+    def test_reconnect_with_backoff(self):
+        with CouchDBAsyncHTTPClientSequencePatcher([(False, False, None)]):
+            acf = AsyncChangesFollower()
+            acf.start()
+
+            self.assertEqual(1, self.io_loop.add_timeout.call_count)
+            self.assertEqual(
+                type(acf).min_reconnect_delay_in_ms,
+                acf._reconnect_delay_in_ms)
+
+        with CouchDBAsyncHTTPClientSequencePatcher([(False, False, None)]):
+            # simulate the reconnect timeout firing
+            acf._poll()
+
+            self.assertEqual(2, self.io_loop.add_timeout.call_count)
+            self.assertEqual(
+                2 * type(acf).min_reconnect_delay_in_ms,
+                acf._reconnect_delay_in_ms)
+
+            acf.stop()
+            self.assertEqual(1, self.io_loop.remove_timeout.call_count)
+
+    def test_checkpoint(self):
+        the_checkpoint_filename = os.path.join(self.dir_name, "checkpoint")
+        the_response_body = {
+            "results": [],
+            "last_seq": "42-abc",
+        }
+        with CouchDBAsyncHTTPClientSequencePatcher([(True, False, the_response_body)]):
+            acf = AsyncChangesFollower(checkpoint_filename=the_checkpoint_filename)
+            acf.start()
+            acf.stop()
+
+        with CouchDBAsyncHTTPClientSequencePatcher([]) as patcher:
+            acf = AsyncChangesFollower(checkpoint_filename=the_checkpoint_filename)
+            acf.start()
+            self.assertEqual("42-abc", acf.since)
+            self.assertIn("since=42-abc", patcher.requests[0].url)
+
 
 class ViewMetricsUnitTaseCase(unittest.TestCase):
     """A collection of unit tests for the ViewMetrics class."""
@@ -965,6 +3796,83 @@ class AsyncAllViewMetricsRetrieverUnitTaseCase(unittest.TestCase):
                 callback.assert_called_once_with(True, view_metrics, aavmr)
                 self.assertEqual(type(aavmr).FFD_OK, aavmr.fetch_failure_detail)
 
+    def _design_docs_response_body(self, design_docs):
+        return {'rows': [{'key': '_design/%s' % design_doc} for design_doc in design_docs]}
+
+    def test_max_concurrency(self):
+        design_docs = ["dd%d" % i for i in range(0, 5)]
+        with CouchDBAsyncHTTPClientPatcher(True, False, self._design_docs_response_body(design_docs), None, None):
+            fetches = []
+
+            def fetch_patch(avmr, callback):
+                fetches.append((avmr, callback))
+
+            with mock.patch(__name__ + ".async_model_actions.AsyncViewMetricsRetriever.fetch", fetch_patch):
+                callback = mock.Mock()
+
+                aavmr = AsyncAllViewMetricsRetriever(max_concurrency=2)
+                aavmr.fetch(callback)
+
+                self.assertEqual(2, len(fetches))
+
+                view_metrics = []
+                for i in range(0, len(design_docs)):
+                    (avmr, avmr_callback) = fetches[i]
+                    self.assertEqual(design_docs[i], avmr.design_doc)
+                    view_metrics.append(ViewMetrics(avmr.design_doc, 1, 2))
+                    avmr_callback(True, view_metrics[-1], avmr)
+                    self.assertEqual(min(len(design_docs), i + 3), len(fetches))
+
+                callback.assert_called_once_with(True, view_metrics, aavmr)
+                self.assertEqual(type(aavmr).FFD_OK, aavmr.fetch_failure_detail)
+
+    def test_error_stops_requesting_view_metrics(self):
+        design_docs = ["dd%d" % i for i in range(0, 5)]
+        with CouchDBAsyncHTTPClientPatcher(True, False, self._design_docs_response_body(design_docs), None, None):
+            is_oks = [True, False, True]
+            view_metrics = [ViewMetrics("dd0", 1, 2), None, ViewMetrics("dd2", 1, 2)]
+            with AsyncViewMetricsRetrieverPatcher(is_oks, view_metrics) as avmr_patcher:
+                callback = mock.Mock()
+
+                aavmr = AsyncAllViewMetricsRetriever(max_concurrency=1)
+                aavmr.fetch(callback)
+
+                callback.assert_called_once_with(False, None, aavmr)
+                self.assertEqual(type(aavmr).FFD_ERROR_FETCHING_VIEW_METRICS, aavmr.fetch_failure_detail)
+                self.assertEqual(["dd1"], aavmr.failed_design_docs)
+                self.assertEqual(2, avmr_patcher._i)
+
+    def test_partial_results(self):
+        design_docs = ["dd0", "dd1", "dd2"]
+        with CouchDBAsyncHTTPClientPatcher(True, False, self._design_docs_response_body(design_docs), None, None):
+            is_oks = [True, False, True]
+            view_metrics = [ViewMetrics("dd0", 1, 2), None, ViewMetrics("dd2", 1, 2)]
+            with AsyncViewMetricsRetrieverPatcher(is_oks, view_metrics):
+                callback = mock.Mock()
+
+                aavmr = AsyncAllViewMetricsRetriever(partial_results=True)
+                aavmr.fetch(callback)
+
+                callback.assert_called_once_with(True, [view_metrics[0], view_metrics[2]], aavmr)
+                self.assertEqual(type(aavmr).FFD_SOME_VIEW_METRICS_NOT_FETCHED, aavmr.fetch_failure_detail)
+                self.assertEqual(["dd1"], aavmr.failed_design_docs)
+
+    def test_partial_results_all_failed(self):
+        design_docs = ["dd%d" % i for i in range(0, 5000)]
+        with CouchDBAsyncHTTPClientPatcher(True, False, self._design_docs_response_body(design_docs), None, None):
+            # view metrics retrievers which call back synchronously
+            # mustn't cause recursion proportional to the number of
+            # design docs
+            with AsyncViewMetricsRetrieverPatcher([False] * len(design_docs), [None] * len(design_docs)):
+                callback = mock.Mock()
+
+                aavmr = AsyncAllViewMetricsRetriever(max_concurrency=10, partial_results=True)
+                aavmr.fetch(callback)
+
+                callback.assert_called_once_with(False, None, aavmr)
+                self.assertEqual(type(aavmr).FFD_ERROR_FETCHING_VIEW_METRICS, aavmr.fetch_failure_detail)
+                self.assertEqual(design_docs, aavmr.failed_design_docs)
+
 
 class AsyncAllViewMetricsRetrieverPatcher(object):
 
@@ -1059,3 +3967,411 @@ class AsyncDatabaseMetricsRetrieverUnitTaseCase(unittest.TestCase):
                 self.assertIsNotNone(database_metrics.view_metrics is the_view_metrics)
                 self.assertTrue(callback.call_args[0][2] is admr)
                 self.assertEqual(type(admr).FFD_OK, admr.fetch_failure_detail)
+
+
+class CachedDatabaseMetricsProviderUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the CachedDatabaseMetricsProvider class."""
+
+    def setUp(self):
+        self.fetch_callbacks = []
+
+        def fetch_patch(adbmr, callback):
+            self.fetch_callbacks.append(functools.partial(callback, adbmr=adbmr))
+
+        self._patcher = mock.patch(
+            __name__ + ".async_model_actions.AsyncDatabaseMetricsRetriever.fetch",
+            fetch_patch)
+        self._patcher.start()
+
+    def tearDown(self):
+        self._patcher.stop()
+
+    def test_ctr(self):
+        cdmp = CachedDatabaseMetricsProvider()
+        self.assertIsNone(cdmp.database_metrics)
+        self.assertIsNone(cdmp.snapshot_age_in_ms)
+        self.assertFalse(cdmp.is_refreshing)
+
+    def test_start_and_stop(self):
+        with mock.patch("tornado.ioloop.PeriodicCallback") as periodic_callback_patch:
+            cdmp = CachedDatabaseMetricsProvider(refresh_interval_in_ms=500)
+            cdmp.start()
+            periodic_callback_patch.assert_called_once_with(cdmp.refresh, 500)
+            periodic_callback_patch.return_value.start.assert_called_once_with()
+            self.assertTrue(cdmp.is_refreshing)
+
+            cdmp.stop()
+            periodic_callback_patch.return_value.stop.assert_called_once_with()
+
+    def test_concurrent_fetches_share_refresh(self):
+        cdmp = CachedDatabaseMetricsProvider()
+
+        callbacks = [mock.Mock(), mock.Mock()]
+        for callback in callbacks:
+            cdmp.fetch(callback)
+        cdmp.refresh()
+        self.assertEqual(1, len(self.fetch_callbacks))
+        self.assertEqual(1, cdmp.number_refreshes)
+
+        the_database_metrics = mock.Mock()
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=100.0):
+            self.fetch_callbacks[0](True, the_database_metrics)
+
+        for callback in callbacks:
+            callback.assert_called_once_with(True, the_database_metrics, cdmp)
+        self.assertFalse(cdmp.is_refreshing)
+
+        # snapshot is now served without a refresh
+        callback = mock.Mock()
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=100.25):
+            cdmp.fetch(callback)
+            self.assertEqual(250, cdmp.snapshot_age_in_ms)
+        callback.assert_called_once_with(True, the_database_metrics, cdmp)
+        self.assertEqual(1, len(self.fetch_callbacks))
+
+    def test_failed_refresh_retains_snapshot(self):
+        cdmp = CachedDatabaseMetricsProvider()
+
+        the_database_metrics = mock.Mock()
+        cdmp.refresh()
+        self.fetch_callbacks[0](True, the_database_metrics)
+
+        callback = mock.Mock()
+        cdmp.refresh(callback)
+        self.fetch_callbacks[1](False, None)
+        callback.assert_called_once_with(False, None, cdmp)
+        self.assertEqual(1, cdmp.number_refresh_failures)
+
+        callback = mock.Mock()
+        cdmp.fetch(callback)
+        callback.assert_called_once_with(True, the_database_metrics, cdmp)
+
+    def test_refresh_timeout(self):
+        with mock.patch(__name__ + ".async_model_actions.time.time", return_value=100.0):
+            with mock.patch(__name__ + ".async_model_actions.AsyncDatabaseMetricsRetriever.__init__",
+                            return_value=None) as ctr_patch:
+                cdmp = CachedDatabaseMetricsProvider(refresh_timeout_in_ms=1500)
+                cdmp.refresh()
+                ctr_patch.assert_called_once_with(
+                    deadline=101.5,
+                    max_view_concurrency=None,
+                    partial_view_results=False)
+
+
+class AsyncCompactionSchedulerUnitTaseCase(unittest.TestCase):
+    """A collection of unit tests for the AsyncCompactionScheduler class."""
+
+    def setUp(self):
+        self.database_metrics = []
+
+        def fetch_patch(adbmr, callback):
+            database_metrics = self.database_metrics.pop(0)
+            callback(database_metrics is not None, database_metrics, adbmr)
+
+        self._patchers = [
+            mock.patch(
+                __name__ + ".async_model_actions.AsyncDatabaseMetricsRetriever.fetch",
+                fetch_patch),
+            mock.patch(
+                __name__ + ".async_model_actions.database",
+                "http://127.0.0.1:5984/fruit"),
+            mock.patch(
+                "tornado.ioloop.IOLoop.current",
+                return_value=mock.Mock()),
+        ]
+        for patcher in self._patchers:
+            patcher.start()
+
+    def tearDown(self):
+        for patcher in self._patchers:
+            patcher.stop()
+
+    def _database_metrics(self, data_size=90, disk_size=100, view_metrics=None):
+        return DatabaseMetrics("fruit", 10, data_size, disk_size, view_metrics or [])
+
+    def _create_acs(self, **kwargs):
+        """Create an AsyncCompactionScheduler which, unless told otherwise,
+        compacts the tiny databases and views these tests use.
+        """
+        kwargs.setdefault("min_database_size", 0)
+        kwargs.setdefault("min_view_size", 0)
+        return AsyncCompactionScheduler(**kwargs)
+
+    def test_ctr(self):
+        acs = AsyncCompactionScheduler()
+        self.assertFalse(acs.is_compacting)
+        self.assertIsNone(acs.compaction_path)
+        self.assertIsNone(acs.compaction_progress)
+
+    def test_start_and_stop(self):
+        with mock.patch("tornado.ioloop.PeriodicCallback") as periodic_callback_patch:
+            acs = AsyncCompactionScheduler(evaluation_interval_in_ms=500)
+            acs.start()
+            periodic_callback_patch.assert_called_once_with(acs.evaluate, 500)
+            periodic_callback_patch.return_value.start.assert_called_once_with()
+
+            acs.stop()
+            periodic_callback_patch.return_value.stop.assert_called_once_with()
+
+    def test_is_in_allowed_window(self):
+        acs = AsyncCompactionScheduler()
+        self.assertTrue(acs.is_in_allowed_window(datetime.time(12, 0)))
+
+        acs = AsyncCompactionScheduler(allowed_windows=[
+            (datetime.time(1, 0), datetime.time(5, 0)),
+            (datetime.time(22, 0), datetime.time(0, 30)),
+        ])
+        self.assertTrue(acs.is_in_allowed_window(datetime.time(1, 0)))
+        self.assertTrue(acs.is_in_allowed_window(datetime.time(4, 59)))
+        self.assertFalse(acs.is_in_allowed_window(datetime.time(5, 0)))
+        self.assertFalse(acs.is_in_allowed_window(datetime.time(12, 0)))
+        self.assertTrue(acs.is_in_allowed_window(datetime.time(23, 0)))
+        self.assertTrue(acs.is_in_allowed_window(datetime.time(0, 15)))
+        self.assertFalse(acs.is_in_allowed_window(datetime.time(0, 30)))
+
+    def test_not_evaluated_outside_allowed_window(self):
+        acs = AsyncCompactionScheduler(allowed_windows=[])
+        acs.evaluate()
+        self.assertEqual(0, acs.number_evaluations)
+
+    def test_error_retrieving_database_metrics(self):
+        self.database_metrics = [None]
+        with CouchDBAsyncHTTPClientSequencePatcher([]) as cac_patcher:
+            acs = self._create_acs()
+            acs.evaluate()
+            self.assertEqual(1, acs.number_evaluations)
+            self.assertEqual([], cac_patcher.requests)
+            self.assertFalse(acs.is_compacting)
+
+    def test_nothing_to_compact(self):
+        self.database_metrics = [
+            self._database_metrics(view_metrics=[ViewMetrics("fruit_by_fruit", None, None)]),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher([]) as cac_patcher:
+            acs = self._create_acs()
+            acs.evaluate()
+            self.assertEqual([], cac_patcher.requests)
+            self.assertFalse(acs.is_compacting)
+
+    def test_small_database_and_views_not_compacted(self):
+        # the samples/metrics README's 4 document database
+        self.database_metrics = [
+            DatabaseMetrics("fruit", 4, 1265, 4197, [
+                ViewMetrics("fruit_by_fruit", 0, 51),
+                ViewMetrics("fruit_by_fruit_id", 0, 51),
+            ]),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher([]) as cac_patcher:
+            acs = AsyncCompactionScheduler()
+            acs.evaluate()
+            self.assertEqual([], cac_patcher.requests)
+            self.assertFalse(acs.is_compacting)
+
+    def test_each_target_compacted_once_per_cycle(self):
+        # neither the database nor its view drop below their thresholds
+        view_metrics = [ViewMetrics("fruit_by_fruit", 10, 100)]
+        self.database_metrics = [
+            self._database_metrics(data_size=20, view_metrics=view_metrics)
+            for i in range(4)
+        ]
+        compaction_responses = [
+            (True, False, []),              # GET _active_tasks
+            (True, False, {"ok": True}),    # POST _compact...
+            (True, False, []),              # GET _active_tasks = complete
+        ]
+        responses = compaction_responses * 3
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as cac_patcher:
+            acs = self._create_acs()
+            add_timeout = tornado.ioloop.IOLoop.current().add_timeout
+
+            compaction_paths = []
+            for i in range(4):
+                acs.evaluate()
+                if acs.is_compacting:
+                    compaction_paths.append(acs.compaction_path)
+                    # the next evaluation rather than the completed
+                    # compaction starts the next compaction
+                    add_timeout.call_args[0][1]()
+                    self.assertFalse(acs.is_compacting)
+
+            self.assertEqual(
+                ["_compact", "_compact/fruit_by_fruit", "_compact"],
+                compaction_paths)
+            self.assertEqual(4, acs.number_evaluations)
+            self.assertEqual(len(responses), len(cac_patcher.requests))
+
+    def test_database_compacted_before_views(self):
+        self.database_metrics = [
+            self._database_metrics(data_size=20, view_metrics=[ViewMetrics("fruit_by_fruit", 10, 100)]),
+        ]
+        responses = [
+            (True, False, []),
+            (True, False, {"ok": True}),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as cac_patcher:
+            acs = self._create_acs()
+            acs.evaluate()
+            self.assertEqual("http://127.0.0.1:5984/fruit/_compact", cac_patcher.requests[1].url)
+            self.assertEqual("_compact", acs.compaction_path)
+
+    def test_compaction_already_running(self):
+        self.database_metrics = [
+            self._database_metrics(data_size=20),
+        ]
+        active_tasks = [
+            {"type": "replication", "database": "fruit"},
+            {"type": "database_compaction", "database": "shards/00000000-1fffffff/fruit.1452882946", "progress": 5},
+        ]
+        responses = [
+            (True, False, active_tasks),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as cac_patcher:
+            acs = self._create_acs()
+            acs.evaluate()
+            self.assertEqual(1, len(cac_patcher.requests))
+            self.assertEqual("http://127.0.0.1:5984/_active_tasks", cac_patcher.requests[0].url)
+            self.assertFalse(acs.is_compacting)
+            self.assertEqual(0, acs.number_compactions)
+
+    def test_error_starting_compaction(self):
+        self.database_metrics = [
+            self._database_metrics(data_size=20),
+        ]
+        responses = [
+            (True, False, []),
+            (False, False, None),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses):
+            acs = self._create_acs()
+            acs.evaluate()
+            self.assertFalse(acs.is_compacting)
+            self.assertEqual(1, acs.number_compaction_failures)
+
+    def test_compact_most_fragmented_view_and_poll_progress(self):
+        view_metrics = [
+            ViewMetrics("fruit_by_fruit", 50, 100),
+            ViewMetrics("fruit_by_fruit_id", 20, 100),
+            ViewMetrics("fruit_by_color", 90, 100),
+        ]
+        self.database_metrics = [
+            self._database_metrics(view_metrics=view_metrics),
+            self._database_metrics(),
+        ]
+        active_tasks = [
+            {
+                "type": "view_compaction",
+                "database": "fruit",
+                "design_document": "_design/fruit_by_fruit_id",
+                "progress": 40,
+            },
+            {"type": "view_compaction", "database": "vegetables", "progress": 90},
+        ]
+        responses = [
+            (True, False, []),
+            (True, False, {"ok": True}),
+            (False, False, None),
+            (True, False, active_tasks),
+            (True, False, []),
+        ]
+        with CouchDBAsyncHTTPClientSequencePatcher(responses) as cac_patcher:
+            acs = self._create_acs(view_fragmentation_threshold=60)
+            acs.evaluate()
+
+            request = cac_patcher.requests[1]
+            self.assertEqual("POST", request.method)
+            self.assertEqual("http://127.0.0.1:5984/fruit/_compact/fruit_by_fruit_id", request.url)
+            self.assertEqual("_compact/fruit_by_fruit_id", acs.compaction_path)
+            self.assertEqual(1, acs.number_compactions)
+
+            add_timeout = tornado.ioloop.IOLoop.current().add_timeout
+            self.assertEqual(1, add_timeout.call_count)
+            self.assertEqual(datetime.timedelta(milliseconds=10 * 1000), add_timeout.call_args[0][0])
+
+            # while compacting evaluations do nothing
+            acs.evaluate()
+            self.assertEqual(1, acs.number_evaluations)
+
+            # error polling progress
+            add_timeout.call_args[0][1]()
+            self.assertEqual(2, add_timeout.call_count)
+            self.assertEqual(0, acs.compaction_progress)
+
+            add_timeout.call_args[0][1]()
+            self.assertEqual(3, add_timeout.call_count)
+            self.assertEqual(40, acs.compaction_progress)
+
+            # compaction complete but metrics are only evaluated again
+            # at the next evaluation
+            add_timeout.call_args[0][1]()
+            self.assertFalse(acs.is_compacting)
+            self.assertIsNone(acs.compaction_progress)
+            self.assertEqual(1, acs.number_evaluations)
+            self.assertEqual(5, len(cac_patcher.requests))
+
+    def _in_flight_fetches(self):
+        """Patch CouchDBAsyncHTTPClient.fetch so that requests stay in
+        flight until the test calls the returned list's callbacks.
+        """
+        callbacks = []
+
+        def fetch_patch(cac, request, callback):
+            callbacks.append(callback)
+
+        patcher = mock.patch(
+            __name__ + ".async_model_actions.CouchDBAsyncHTTPClient.fetch",
+            fetch_patch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        return callbacks
+
+    def test_stop_while_starting_compaction(self):
+        self.database_metrics = [
+            self._database_metrics(data_size=20),
+        ]
+        callbacks = self._in_flight_fetches()
+
+        acs = self._create_acs()
+        acs.evaluate()
+        self.assertEqual(1, len(callbacks))
+        callbacks[0](True, False, [], None, None, None)
+        self.assertEqual(2, len(callbacks))
+
+        acs.stop()
+        callbacks[1](True, False, {"ok": True}, None, None, None)
+        self.assertFalse(acs.is_compacting)
+        self.assertEqual(0, acs.number_compactions)
+        self.assertEqual(0, tornado.ioloop.IOLoop.current().add_timeout.call_count)
+
+    def test_stop_while_polling_progress(self):
+        self.database_metrics = [
+            self._database_metrics(data_size=20),
+            self._database_metrics(data_size=20),
+        ]
+        callbacks = self._in_flight_fetches()
+
+        acs = self._create_acs()
+        acs.evaluate()
+        callbacks[0](True, False, [], None, None, None)
+        callbacks[1](True, False, {"ok": True}, None, None, None)
+        self.assertEqual("_compact", acs.compaction_path)
+
+        add_timeout = tornado.ioloop.IOLoop.current().add_timeout
+        add_timeout.call_args[0][1]()
+        self.assertEqual(3, len(callbacks))
+
+        acs.stop()
+        self.assertFalse(acs.is_compacting)
+        self.assertIsNone(acs.compaction_progress)
+
+        # the in flight poll neither re-arms the poll nor evaluates again
+        callbacks[2](True, False, [], None, None, None)
+        self.assertEqual(1, add_timeout.call_count)
+        self.assertEqual(1, acs.number_evaluations)
+
+        # and once restarted compaction is evaluated again
+        with mock.patch("tornado.ioloop.PeriodicCallback"):
+            acs.start()
+        acs.evaluate()
+        self.assertEqual(2, acs.number_evaluations)
+        self.assertEqual(4, len(callbacks))
@@ -0,0 +1,131 @@
+"""This module contains the cache module's unit tests."""
+
+import unittest
+import uuid
+
+from ..cache import DocumentCache
+
+
+def _create_doc():
+    return {
+        "_id": uuid.uuid4().hex,
+        "_rev": uuid.uuid4().hex,
+    }
+
+
+class DocumentCacheTestCase(unittest.TestCase):
+    """A collection of unit tests for the DocumentCache class."""
+
+    def test_ctr(self):
+        the_max_size_in_bytes = 42
+        dc = DocumentCache(the_max_size_in_bytes)
+        self.assertEqual(dc.max_size_in_bytes, the_max_size_in_bytes)
+        self.assertEqual(0, dc.size_in_bytes)
+        self.assertEqual(0, len(dc))
+        self.assertEqual(0, dc.hits)
+        self.assertEqual(0, dc.misses)
+        self.assertEqual(0, dc.revalidations)
+        self.assertEqual(0, dc.evictions)
+
+    def test_get_miss(self):
+        dc = DocumentCache()
+        self.assertIsNone(dc.get(uuid.uuid4().hex))
+        self.assertEqual(1, dc.misses)
+        self.assertEqual(0, dc.revalidations)
+
+    def test_put_get_and_not_modified(self):
+        dc = DocumentCache()
+        doc = _create_doc()
+        dc.put(doc, 10)
+        self.assertEqual(10, dc.size_in_bytes)
+        self.assertTrue(doc["_id"] in dc)
+
+        self.assertTrue(dc.get(doc["_id"]) is doc)
+        self.assertEqual(0, dc.misses)
+        self.assertEqual(1, dc.revalidations)
+
+        dc.not_modified(doc["_id"])
+        self.assertEqual(1, dc.hits)
+
+    def test_put_replaces_existing(self):
+        dc = DocumentCache()
+        doc = _create_doc()
+        dc.put(doc, 10)
+
+        new_doc = dict(doc)
+        new_doc["_rev"] = uuid.uuid4().hex
+        dc.put(new_doc, 15)
+
+        self.assertEqual(1, len(dc))
+        self.assertEqual(15, dc.size_in_bytes)
+        self.assertTrue(dc.get(doc["_id"]) is new_doc)
+
+    def test_put_ignores_docs_without_id_or_rev(self):
+        dc = DocumentCache()
+        dc.put({"_id": uuid.uuid4().hex}, 10)
+        dc.put({"_rev": uuid.uuid4().hex}, 10)
+        self.assertEqual(0, len(dc))
+        self.assertEqual(0, dc.size_in_bytes)
+
+    def test_put_ignores_docs_larger_than_cache(self):
+        dc = DocumentCache(10)
+        dc.put(_create_doc(), 11)
+        self.assertEqual(0, len(dc))
+        self.assertEqual(0, dc.size_in_bytes)
+        self.assertEqual(0, dc.evictions)
+
+    def test_lru_eviction(self):
+        dc = DocumentCache(30)
+        docs = [_create_doc() for i in range(0, 3)]
+        for doc in docs:
+            dc.put(doc, 10)
+        self.assertEqual(30, dc.size_in_bytes)
+
+        # make docs[0] most recently used
+        dc.get(docs[0]["_id"])
+
+        dc.put(_create_doc(), 10)
+        self.assertEqual(1, dc.evictions)
+        self.assertEqual(30, dc.size_in_bytes)
+        self.assertTrue(docs[0]["_id"] in dc)
+        self.assertFalse(docs[1]["_id"] in dc)
+        self.assertTrue(docs[2]["_id"] in dc)
+
+    def test_remove(self):
+        dc = DocumentCache()
+        doc = _create_doc()
+        dc.put(doc, 10)
+        dc.remove(doc["_id"])
+        self.assertEqual(0, len(dc))
+        self.assertEqual(0, dc.size_in_bytes)
+
+        # removing a doc that's not in the cache is ok
+        dc.remove(doc["_id"])
+
+    def test_on_change(self):
+        dc = DocumentCache()
+        doc = _create_doc()
+        dc.put(doc, 10)
+
+        # change to a doc that's not in the cache
+        dc.on_change(uuid.uuid4().hex, uuid.uuid4().hex, False)
+        self.assertEqual(1, len(dc))
+
+        # change that's already reflected in the cache
+        dc.on_change(doc["_id"], doc["_rev"], False)
+        self.assertTrue(doc["_id"] in dc)
+
+        dc.on_change(doc["_id"], uuid.uuid4().hex, False)
+        self.assertFalse(doc["_id"] in dc)
+
+        dc.put(doc, 10)
+        dc.on_change(doc["_id"], doc["_rev"], True)
+        self.assertFalse(doc["_id"] in dc)
+
+    def test_clear(self):
+        dc = DocumentCache()
+        dc.put(_create_doc(), 10)
+        dc.put(_create_doc(), 10)
+        dc.clear()
+        self.assertEqual(0, len(dc))
+        self.assertEqual(0, dc.size_in_bytes)
@@ -0,0 +1,136 @@
+"""This module contains the json_codec module's unit tests."""
+
+import json
+import sys
+import unittest
+import uuid
+
+import mock
+
+from ..json_codec import JSONCodec
+from ..json_codec import SimpleJSONCodec
+from ..json_codec import UJSONCodec
+from .. import tamper
+
+
+def _create_doc():
+    return {
+        "_id": uuid.uuid4().hex,
+        "_rev": uuid.uuid4().hex,
+        "dave": u"was here \u2014 today",
+        "numbers": [1, 2.5, None, True],
+        "nested": {"z": 1, "a": {"y": 2, "b": 3}},
+    }
+
+
+class JSONCodecTestCase(unittest.TestCase):
+    """A collection of unit tests for the JSONCodec class."""
+
+    def test_dumps_and_loads(self):
+        codec = JSONCodec()
+        doc = _create_doc()
+        self.assertEqual(doc, codec.loads(codec.dumps(doc)))
+
+    def test_dumps_canonical(self):
+        codec = JSONCodec()
+        doc = _create_doc()
+        self.assertEqual(
+            codec.dumps_canonical(doc),
+            json.dumps(doc, encoding="utf-8", sort_keys=True))
+
+
+class SimpleJSONCodecTestCase(unittest.TestCase):
+    """A collection of unit tests for the SimpleJSONCodec class."""
+
+    def test_simplejson_not_installed(self):
+        with mock.patch.dict(sys.modules, {"simplejson": None}):
+            with self.assertRaises(ImportError):
+                SimpleJSONCodec()
+
+    def test_delegates_to_simplejson(self):
+        the_simplejson = mock.Mock()
+        with mock.patch.dict(sys.modules, {"simplejson": the_simplejson}):
+            codec = SimpleJSONCodec()
+
+        doc = _create_doc()
+
+        codec.dumps(doc)
+        the_simplejson.dumps.assert_called_once_with(doc)
+
+        codec.loads("{}")
+        the_simplejson.loads.assert_called_once_with("{}")
+
+        the_simplejson.dumps.reset_mock()
+        codec.dumps_canonical(doc)
+        the_simplejson.dumps.assert_called_once_with(doc, encoding="utf-8", sort_keys=True)
+
+
+class UJSONCodecTestCase(unittest.TestCase):
+    """A collection of unit tests for the UJSONCodec class."""
+
+    def test_ujson_not_installed(self):
+        with mock.patch.dict(sys.modules, {"ujson": None}):
+            with self.assertRaises(ImportError):
+                UJSONCodec()
+
+    def test_delegates_to_ujson(self):
+        the_ujson = mock.Mock()
+        with mock.patch.dict(sys.modules, {"ujson": the_ujson}):
+            codec = UJSONCodec()
+
+        doc = _create_doc()
+
+        codec.loads("{}")
+        the_ujson.loads.assert_called_once_with("{}", precise_float=True)
+
+        # ujson can't round-trip floats so encoding never uses ujson
+        self.assertEqual(codec.dumps(doc), JSONCodec().dumps(doc))
+        self.assertEqual(
+            codec.dumps_canonical(doc),
+            JSONCodec().dumps_canonical(doc))
+        self.assertEqual(0, the_ujson.dumps.call_count)
+
+    def test_signed_floats_round_trip(self):
+        try:
+            codec = UJSONCodec()
+        except ImportError:
+            raise unittest.SkipTest("ujson not installed")
+
+        signer = tamper.HMACSigner({"1": "secret"}, "1")
+
+        doc = _create_doc()
+        doc["floats"] = [1.23456789012345, 0.1 + 0.2, 1.0 / 3.0, 6.02214076e23, -2.5e-300]
+        tamper.sign(signer, doc, codec)
+
+        read_back_doc = codec.loads(codec.dumps(doc))
+        self.assertEqual(doc["floats"], read_back_doc["floats"])
+        self.assertTrue(tamper.verify(signer, read_back_doc, codec))
+
+
+class TamperWithJSONCodecTestCase(unittest.TestCase):
+    """A collection of unit tests for the tamper module's use of codecs."""
+
+    def test_sign_and_verify_use_canonical_encoding(self):
+        the_canonical_doc = uuid.uuid4().hex
+        the_sig = uuid.uuid4().hex
+
+        codec = mock.Mock()
+        codec.dumps_canonical.return_value = the_canonical_doc
+
+        signer = mock.Mock()
+        signer.Sign.return_value = the_sig
+        signer.Verify.return_value = True
+
+        doc = _create_doc()
+        tamper.sign(signer, doc, codec)
+        signer.Sign.assert_called_once_with(the_canonical_doc)
+        self.assertEqual(the_sig, doc[tamper._tampering_sig_prop_name])
+
+        # _id, _rev and the signature aren't part of the canonical doc
+        canonical_doc = codec.dumps_canonical.call_args[0][0]
+        self.assertNotIn("_id", canonical_doc)
+        self.assertNotIn("_rev", canonical_doc)
+        self.assertNotIn(tamper._tampering_sig_prop_name, canonical_doc)
+
+        self.assertTrue(tamper.verify(signer, doc, codec))
+        signer.Verify.assert_called_once_with(the_canonical_doc, the_sig)
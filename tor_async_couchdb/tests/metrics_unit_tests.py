@@ -0,0 +1,105 @@
+"""This module contains the metrics module's unit tests."""
+
+import unittest
+
+from ..metrics import Histogram
+from ..metrics import MetricsRegistry
+from ..metrics import log_bucket_bounds
+from ..metrics import operation_for_path
+
+
+class LogBucketBoundsTestCase(unittest.TestCase):
+    """A collection of unit tests for the log_bucket_bounds function."""
+
+    def test_defaults(self):
+        bounds = log_bucket_bounds()
+        self.assertEqual(18, len(bounds))
+        self.assertAlmostEqual(0.0005, bounds[0])
+        self.assertAlmostEqual(65.536, bounds[-1])
+
+    def test_bounds(self):
+        self.assertEqual([1.0, 10.0, 100.0], log_bucket_bounds(1.0, 10.0, 3))
+
+
+class HistogramTestCase(unittest.TestCase):
+    """A collection of unit tests for the Histogram class."""
+
+    def test_observe(self):
+        histogram = Histogram([1.0, 2.0, 4.0])
+        for value in [0.5, 1.0, 1.5, 3.0, 100.0]:
+            histogram.observe(value)
+
+        self.assertEqual(5, histogram.count)
+        self.assertEqual(106.0, histogram.sum)
+        self.assertEqual([2, 1, 1, 1], histogram.bucket_counts)
+        self.assertEqual(
+            [(1.0, 2), (2.0, 3), (4.0, 4), (None, 5)],
+            histogram.cumulative_bucket_counts())
+
+
+class OperationForPathTestCase(unittest.TestCase):
+    """A collection of unit tests for the operation_for_path function."""
+
+    def test_operations(self):
+        self.assertEqual("view:fruit", operation_for_path("GET", "_design/fruit/_view/fruit?limit=10"))
+        self.assertEqual("view:fruit", operation_for_path("POST", "_design/fruit/_view/fruit"))
+        self.assertEqual("update:fruit/change", operation_for_path("PUT", "_design/fruit/_update/change/123"))
+        self.assertEqual("view_info", operation_for_path("GET", "_design/fruit/_info"))
+        self.assertEqual("design_doc", operation_for_path("GET", "_design/fruit"))
+        self.assertEqual("all_docs", operation_for_path("POST", "_all_docs?include_docs=true"))
+        self.assertEqual("bulk_docs", operation_for_path("POST", "_bulk_docs"))
+        self.assertEqual("changes", operation_for_path("GET", "_changes?feed=longpoll"))
+        self.assertEqual("compact", operation_for_path("POST", "_compact"))
+        self.assertEqual("compact", operation_for_path("POST", "_compact/fruit"))
+        self.assertEqual("database", operation_for_path("GET", ""))
+        self.assertEqual("persist", operation_for_path("POST", ""))
+        self.assertEqual("get_by_id", operation_for_path("GET", "123"))
+        self.assertEqual("persist", operation_for_path("PUT", "123"))
+        self.assertEqual("delete", operation_for_path("DELETE", "123?rev=1-a"))
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    """A collection of unit tests for the MetricsRegistry class."""
+
+    def test_observe_response(self):
+        mr = MetricsRegistry(bucket_bounds=[0.01, 0.1])
+
+        mr.observe_response("get_by_id", "GET", 200, 0.05, {"queue": 0.001, "total": 0.04})
+        mr.observe_response("get_by_id", "GET", 201, 0.5, {})
+        mr.observe_response("get_by_id", "GET", 599, 20.0, {})
+
+        self.assertEqual(
+            set([
+                ("request", "GET", "2xx", "get_by_id"),
+                ("queue", "GET", "2xx", "get_by_id"),
+                ("total", "GET", "2xx", "get_by_id"),
+                ("request", "GET", "5xx", "get_by_id"),
+            ]),
+            set(mr.histograms.keys()))
+        self.assertEqual(2, mr.histograms[("request", "GET", "2xx", "get_by_id")].count)
+        self.assertEqual(1, mr.histograms[("queue", "GET", "2xx", "get_by_id")].count)
+
+    def test_render_text(self):
+        mr = MetricsRegistry(bucket_bounds=[0.01, 0.1])
+        self.assertEqual(
+            "# HELP couchdb_request_duration_seconds Time CouchDB took to respond by request phase.\n"
+            "# TYPE couchdb_request_duration_seconds histogram\n",
+            mr.render_text())
+
+        mr.observe_response("view:fruit", "GET", 200, 0.05, {})
+        mr.observe_response("view:fruit", "GET", 200, 0.005, {})
+
+        labels = 'phase="request",method="GET",status_class="2xx",operation="view:fruit"'
+        expected_lines = [
+            'couchdb_request_duration_seconds_bucket{%s,le="0.01"} 1' % labels,
+            'couchdb_request_duration_seconds_bucket{%s,le="0.1"} 2' % labels,
+            'couchdb_request_duration_seconds_bucket{%s,le="+Inf"} 2' % labels,
+            'couchdb_request_duration_seconds_sum{%s} 0.055' % labels,
+            'couchdb_request_duration_seconds_count{%s} 2' % labels,
+        ]
+        self.assertEqual(expected_lines, mr.render_text().splitlines()[2:])
+
+    def test_render_text_escapes_label_values(self):
+        mr = MetricsRegistry()
+        mr.observe_response('view:"x"', "GET", 200, 0.05, {})
+        self.assertIn('operation="view:\\"x\\""', mr.render_text())
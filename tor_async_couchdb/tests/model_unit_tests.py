@@ -28,6 +28,14 @@ class ModelTaseCase(unittest.TestCase):
         self.assertEqual(model._id, doc["_id"])
         self.assertEqual(model._rev, doc["_rev"])
 
+    def test_ctr_original_doc(self):
+        doc = {
+            "_id": uuid.uuid4().hex,
+            "_rev": uuid.uuid4().hex,
+        }
+        self.assertTrue(Model(doc=doc)._original_doc is doc)
+        self.assertIsNone(Model()._original_doc)
+
     def test_ctr_with_id_and_rev_args(self):
         _id = uuid.uuid4().hex
         _rev = uuid.uuid4().hex
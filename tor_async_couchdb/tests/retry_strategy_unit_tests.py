@@ -29,6 +29,26 @@ class RetryStrategyTestCase(unittest.TestCase):
         self.assertEqual(1, rs.num_retries)
         self.assertTrue(0 < rs.max_num_retries)
 
+    def test_next_attempt_after_deadline(self):
+        rs = retry_strategy.RetryStrategy(deadline=1000.0)
+        with mock.patch("time.time", return_value=999.0):
+            self.assertTrue(rs.next_attempt())
+        with mock.patch("time.time", return_value=1000.0):
+            self.assertFalse(rs.next_attempt())
+
+    def test_attempt_deadline(self):
+        rs = retry_strategy.RetryStrategy(max_num_retries=3)
+        self.assertIsNone(rs.attempt_deadline())
+
+        rs = retry_strategy.RetryStrategy(max_num_retries=3, deadline=1000.0)
+        with mock.patch("time.time", return_value=990.0):
+            self.assertEqual(995.0, rs.attempt_deadline())
+            rs.next_attempt()
+            self.assertEqual(995.0, rs.attempt_deadline())
+            rs.next_attempt()
+            # last attempt gets all the remaining time
+            self.assertEqual(1000.0, rs.attempt_deadline())
+
     def test_wait_must_be_implemented(self):
         rs = retry_strategy.RetryStrategy()
         callback = mock.Mock()
@@ -60,3 +80,157 @@ class ExponentialBackoffRetryStrategyTestCase(unittest.TestCase):
                     return
 
         self.assertTure(False)
+
+    def test_wait_past_deadline(self):
+        rs = retry_strategy.ExponentialBackoffRetryStrategy(deadline=1000.0)
+        add_timeout_patch = mock.Mock()
+        with mock.patch("tornado.ioloop.IOLoop.add_timeout", add_timeout_patch):
+            with mock.patch("time.time", return_value=999.99):
+                wait_callback = mock.Mock()
+                delay_in_ms = rs.wait(wait_callback)
+        self.assertIsNone(delay_in_ms)
+        self.assertEqual(0, add_timeout_patch.call_count)
+        wait_callback.assert_called_once_with(0)
+
+
+class BackoffRetryStrategyTestCase(unittest.TestCase):
+    """A collection of unit tests for the BackoffRetryStrategy class."""
+
+    def test_delay_in_ms_must_be_implemented(self):
+        rs = retry_strategy.BackoffRetryStrategy()
+        with self.assertRaises(NotImplementedError):
+            rs.wait(mock.Mock())
+
+
+class CappedExponentialBackoffRetryStrategyTestCase(unittest.TestCase):
+    """A collection of unit tests for the
+    CappedExponentialBackoffRetryStrategy class.
+    """
+
+    def test_delay_is_capped(self):
+        rs = retry_strategy.CappedExponentialBackoffRetryStrategy(
+            max_num_retries=100,
+            base_delay_in_ms=10,
+            max_delay_in_ms=1000)
+        delays_in_ms = []
+        for i in range(0, 99):
+            rs.next_attempt()
+            delays_in_ms.append(rs.delay_in_ms())
+        self.assertEqual([20, 40, 80, 160, 320, 640, 1000, 1000], delays_in_ms[:8])
+        self.assertEqual(1000, delays_in_ms[-1])
+
+    def test_wait(self):
+        rs = retry_strategy.CappedExponentialBackoffRetryStrategy(base_delay_in_ms=10)
+        add_timeout_patch = mock.Mock()
+        with mock.patch("tornado.ioloop.IOLoop.add_timeout", add_timeout_patch):
+            wait_callback = mock.Mock()
+            self.assertEqual(20, rs.wait(wait_callback, "dave"))
+        self.assertEqual(1, add_timeout_patch.call_count)
+        self.assertEqual((wait_callback, 20, "dave"), add_timeout_patch.call_args[0][1:])
+
+
+class FullJitterBackoffRetryStrategyTestCase(unittest.TestCase):
+    """A collection of unit tests for the
+    FullJitterBackoffRetryStrategy class.
+    """
+
+    def test_delay_in_ms(self):
+        rs = retry_strategy.FullJitterBackoffRetryStrategy(
+            max_num_retries=100,
+            base_delay_in_ms=10,
+            max_delay_in_ms=1000)
+        for i in range(0, 99):
+            rs.next_attempt()
+            delay_in_ms = rs.delay_in_ms()
+            self.assertTrue(0 <= delay_in_ms <= min(1000, 10 * 2 ** rs.num_retries))
+
+    def test_delay_uses_entire_interval(self):
+        rs = retry_strategy.FullJitterBackoffRetryStrategy(base_delay_in_ms=10)
+        rs.next_attempt()
+        with mock.patch("random.uniform", return_value=3.5) as uniform_patch:
+            self.assertEqual(3.5, rs.delay_in_ms())
+        uniform_patch.assert_called_once_with(0, 20)
+
+
+class DecorrelatedJitterBackoffRetryStrategyTestCase(unittest.TestCase):
+    """A collection of unit tests for the
+    DecorrelatedJitterBackoffRetryStrategy class.
+    """
+
+    def test_delay_in_ms(self):
+        rs = retry_strategy.DecorrelatedJitterBackoffRetryStrategy(
+            max_num_retries=100,
+            base_delay_in_ms=10,
+            max_delay_in_ms=1000)
+        previous_delay_in_ms = 10
+        for i in range(0, 99):
+            rs.next_attempt()
+            delay_in_ms = rs.delay_in_ms()
+            self.assertTrue(10 <= delay_in_ms <= min(1000, previous_delay_in_ms * 3))
+            previous_delay_in_ms = delay_in_ms
+
+    def test_delay_derived_from_previous_delay(self):
+        rs = retry_strategy.DecorrelatedJitterBackoffRetryStrategy(base_delay_in_ms=10, max_delay_in_ms=100)
+        with mock.patch("random.uniform", side_effect=[25, 70, 500]) as uniform_patch:
+            self.assertEqual(25, rs.delay_in_ms())
+            self.assertEqual(70, rs.delay_in_ms())
+            self.assertEqual(100, rs.delay_in_ms())
+        self.assertEqual(
+            [mock.call(10, 30), mock.call(10, 75), mock.call(10, 210)],
+            uniform_patch.call_args_list)
+
+
+class RetryBudgetTestCase(unittest.TestCase):
+    """A collection of unit tests for the RetryBudget class."""
+
+    def test_ctr(self):
+        rb = retry_strategy.RetryBudget(retry_ratio=0.2, max_tokens=5)
+        self.assertEqual(0.2, rb.retry_ratio)
+        self.assertEqual(5, rb.max_tokens)
+        self.assertEqual(0, rb.number_requests)
+        self.assertEqual(0, rb.number_retries)
+        self.assertEqual(0, rb.number_retries_refused)
+
+    def test_budget(self):
+        rb = retry_strategy.RetryBudget(retry_ratio=0.5, max_tokens=2)
+
+        # starts full
+        self.assertTrue(rb.acquire_retry())
+        self.assertTrue(rb.acquire_retry())
+        self.assertFalse(rb.acquire_retry())
+
+        rb.on_request()
+        self.assertFalse(rb.acquire_retry())
+        rb.on_request()
+        self.assertTrue(rb.acquire_retry())
+
+        # never more than max_tokens
+        for i in range(0, 100):
+            rb.on_request()
+        self.assertTrue(rb.acquire_retry())
+        self.assertTrue(rb.acquire_retry())
+        self.assertFalse(rb.acquire_retry())
+
+        self.assertEqual(102, rb.number_requests)
+        self.assertEqual(5, rb.number_retries)
+        self.assertEqual(3, rb.number_retries_refused)
+
+    def test_shared_by_strategies(self):
+        rb = retry_strategy.RetryBudget(retry_ratio=0.5, max_tokens=1)
+        with mock.patch(__name__ + ".retry_strategy.retry_budget", rb):
+            rs1 = retry_strategy.ExponentialBackoffRetryStrategy()
+            rs2 = retry_strategy.FullJitterBackoffRetryStrategy()
+
+        self.assertEqual(2, rb.number_requests)
+        self.assertTrue(rs1.next_attempt())
+        self.assertFalse(rs2.next_attempt())
+        self.assertEqual(1, rb.number_retries)
+        self.assertEqual(1, rb.number_retries_refused)
+
+    def test_budget_not_spent_when_out_of_retries(self):
+        rb = retry_strategy.RetryBudget()
+        with mock.patch(__name__ + ".retry_strategy.retry_budget", rb):
+            rs = retry_strategy.RetryStrategy(max_num_retries=1)
+        self.assertFalse(rs.next_attempt())
+        self.assertEqual(0, rb.number_retries)
+        self.assertEqual(0, rb.number_retries_refused)
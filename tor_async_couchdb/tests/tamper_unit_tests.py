@@ -1,11 +1,16 @@
 """This module contains the tamper module's unit tests."""
 
+import base64
+import json
+import os
 import shutil
 import tempfile
 import unittest
+import uuid
 
 from keyczar import keyczar
 from keyczar import keyczart
+import mock
 
 from .. import tamper
 
@@ -129,3 +134,233 @@ class TamperTestCase(unittest.TestCase):
             doc[tamper._tampering_sig_prop_name] = "dave"
 
             self.assertFalse(tamper.verify(signer, doc))
+
+
+class HMACSignerTestCase(unittest.TestCase):
+    """A collection of unit tests for the HMACSigner class."""
+
+    def _create_keys(self):
+        return {
+            "1": os.urandom(32),
+            "2": os.urandom(32),
+        }
+
+    def test_happy_path(self):
+        signer = tamper.HMACSigner(self._create_keys(), "2")
+
+        doc = {
+            "dave": "was",
+            "here": u"today \u2014 and yesterday",
+        }
+        tamper.sign(signer, doc)
+        self.assertTrue(doc[tamper._tampering_sig_prop_name].startswith("hs256:2:"))
+        self.assertTrue(tamper.verify(signer, doc))
+
+    def test_verify_fails_when_doc_tampered_with(self):
+        signer = tamper.HMACSigner(self._create_keys(), "1")
+
+        doc = {
+            "dave": "was",
+            "here": "today",
+        }
+        tamper.sign(signer, doc)
+
+        doc["bindle"] = "berry"
+
+        self.assertFalse(tamper.verify(signer, doc))
+
+    def test_verify_fails_when_sig_tampered_with(self):
+        signer = tamper.HMACSigner(self._create_keys(), "1")
+
+        doc = {
+            "dave": "was",
+            "here": "today",
+        }
+        tamper.sign(signer, doc)
+
+        sig = doc[tamper._tampering_sig_prop_name]
+        for bad_sig in ["dave", "hs256:1:dave", "hs256:1:", "hs256:", sig[:-2], u"hs256:1:\u2014", 42]:
+            doc[tamper._tampering_sig_prop_name] = bad_sig
+            self.assertFalse(tamper.verify(signer, doc))
+
+    def test_key_rotation(self):
+        keys = self._create_keys()
+
+        old_signer = tamper.HMACSigner({"1": keys["1"]}, "1")
+        doc = {
+            "dave": "was",
+            "here": "today",
+        }
+        tamper.sign(old_signer, doc)
+
+        new_signer = tamper.HMACSigner(keys, "2")
+        self.assertTrue(tamper.verify(new_signer, doc))
+
+        retired_signer = tamper.HMACSigner({"2": keys["2"]}, "2")
+        self.assertFalse(tamper.verify(retired_signer, doc))
+
+    def test_verify_legacy_keyczar_sig(self):
+
+        with TempDirectory() as dir_name:
+            keyczart.Create(
+                dir_name,
+                "some purpose",
+                keyczart.keyinfo.SIGN_AND_VERIFY)
+
+            keyczart.AddKey(
+                dir_name,
+                keyczart.keyinfo.PRIMARY)
+
+            keyczar_signer = keyczar.Signer.Read(dir_name)
+
+            doc = {
+                "dave": "was",
+                "here": "today",
+            }
+            tamper.sign(keyczar_signer, doc)
+
+            signer = tamper.HMACSigner(self._create_keys(), "1")
+            self.assertFalse(tamper.verify(signer, doc))
+
+            signer = tamper.HMACSigner(self._create_keys(), "1", keyczar_signer)
+            self.assertTrue(tamper.verify(signer, doc))
+
+            doc["bindle"] = "berry"
+            self.assertFalse(tamper.verify(signer, doc))
+
+    def test_read(self):
+        keys = self._create_keys()
+
+        with TempDirectory() as dir_name:
+            filename = os.path.join(dir_name, "keyset.json")
+            with open(filename, "w") as fd:
+                keyset = {
+                    "primary_key_id": "2",
+                    "keys": {key_id: base64.b64encode(key) for (key_id, key) in keys.items()},
+                }
+                json.dump(keyset, fd)
+
+            the_legacy_signer = mock.Mock()
+            signer = tamper.HMACSigner.Read(filename, the_legacy_signer)
+
+        self.assertEqual(signer.keys, keys)
+        self.assertEqual(signer.primary_key_id, "2")
+        self.assertTrue(signer.legacy_signer is the_legacy_signer)
+
+
+def _create_signed_doc():
+    return {
+        "_id": uuid.uuid4().hex,
+        "_rev": uuid.uuid4().hex,
+        "dave": "was here",
+        tamper._tampering_sig_prop_name: uuid.uuid4().hex,
+    }
+
+
+class VerificationCacheTestCase(unittest.TestCase):
+    """A collection of unit tests for the VerificationCache class."""
+
+    def test_ctr(self):
+        the_max_size = 42
+        vc = tamper.VerificationCache(the_max_size)
+        self.assertEqual(vc.max_size, the_max_size)
+        self.assertEqual(0, len(vc))
+        self.assertEqual(0, vc.hits)
+        self.assertEqual(0, vc.misses)
+
+    def test_passed_verification_is_cached(self):
+        signer = mock.Mock()
+        doc = _create_signed_doc()
+        vc = tamper.VerificationCache()
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=True) as verify_patch:
+            self.assertTrue(vc.verify(signer, doc))
+            self.assertTrue(vc.verify(signer, doc))
+            verify_patch.assert_called_once_with(signer, doc, None)
+
+        self.assertEqual(1, vc.hits)
+        self.assertEqual(1, vc.misses)
+        self.assertEqual(1, len(vc))
+
+    def test_failed_verification_is_not_cached(self):
+        signer = mock.Mock()
+        doc = _create_signed_doc()
+        vc = tamper.VerificationCache()
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=False) as verify_patch:
+            self.assertFalse(vc.verify(signer, doc))
+            self.assertFalse(vc.verify(signer, doc))
+            self.assertEqual(2, verify_patch.call_count)
+
+        self.assertEqual(0, len(vc))
+
+    def test_different_signature_is_verified(self):
+        signer = mock.Mock()
+        doc = _create_signed_doc()
+        vc = tamper.VerificationCache()
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=True):
+            vc.verify(signer, doc)
+
+        tampered_doc = dict(doc)
+        tampered_doc[tamper._tampering_sig_prop_name] = uuid.uuid4().hex
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=False) as verify_patch:
+            self.assertFalse(vc.verify(signer, tampered_doc))
+            verify_patch.assert_called_once_with(signer, tampered_doc, None)
+
+    def test_docs_without_id_rev_or_sig_are_not_cached(self):
+        signer = mock.Mock()
+        vc = tamper.VerificationCache()
+
+        for prop_name in ["_id", "_rev", tamper._tampering_sig_prop_name]:
+            doc = _create_signed_doc()
+            del doc[prop_name]
+
+            with mock.patch(__name__ + ".tamper.verify", return_value=True) as verify_patch:
+                self.assertTrue(vc.verify(signer, doc))
+                self.assertTrue(vc.verify(signer, doc))
+                self.assertEqual(2, verify_patch.call_count)
+
+        self.assertEqual(0, len(vc))
+
+    def test_new_signer_clears_cache(self):
+        doc = _create_signed_doc()
+        vc = tamper.VerificationCache()
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=True) as verify_patch:
+            vc.verify(mock.Mock(), doc)
+            vc.verify(mock.Mock(), doc)
+            self.assertEqual(2, verify_patch.call_count)
+
+        self.assertEqual(1, len(vc))
+
+    def test_lru_eviction(self):
+        signer = mock.Mock()
+        docs = [_create_signed_doc() for i in range(0, 3)]
+        vc = tamper.VerificationCache(2)
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=True) as verify_patch:
+            vc.verify(signer, docs[0])
+            vc.verify(signer, docs[1])
+            # make docs[0] most recently used
+            vc.verify(signer, docs[0])
+            vc.verify(signer, docs[2])
+            self.assertEqual(2, len(vc))
+            self.assertEqual(3, verify_patch.call_count)
+
+            vc.verify(signer, docs[0])
+            self.assertEqual(3, verify_patch.call_count)
+
+            vc.verify(signer, docs[1])
+            self.assertEqual(4, verify_patch.call_count)
+
+    def test_clear(self):
+        signer = mock.Mock()
+        vc = tamper.VerificationCache()
+
+        with mock.patch(__name__ + ".tamper.verify", return_value=True):
+            vc.verify(signer, _create_signed_doc())
+
+        vc.clear()
+        self.assertEqual(0, len(vc))